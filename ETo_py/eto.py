@@ -1,5 +1,8 @@
 import math
-from datetime import datetime, timedelta
+import numbers
+from datetime import datetime, timedelta, timezone
+
+from ETo_py.solar_events import solar_day_events, sun_rise_set
 
 
 class EToEstimator:
@@ -19,10 +22,17 @@ class EToEstimator:
         self.pressure = kwargs['pressure']
         self.period_length = kwargs['period_length']  # in minutes
         self.utc_offset = kwargs['utc_offset']
-        self.time_now = None
+        self.elevation = kwargs.get('elevation', 976)  # in meters
+        self.albedo = kwargs.get('albedo', 0.23)
+        self.a_s = kwargs.get('a_s', 0.25)
+        self.b_s = kwargs.get('b_s', 0.5)
+        self.time_now = kwargs.get('time_now')  # unix timestamp of the observation, defaults to now
+        # Given an observation time every time-dependent term is taken from it, otherwise from the wall clock.
+        self.observed_at = int(self.time_now) if isinstance(self.time_now, numbers.Integral) else None
         self.clock_at_midpoint = None
         self.clock_at_beginning = None
         self.clock_at_end = None
+        self.day_of_year = None
         self.todays_sunrise = None
         self.todays_sunset = None
         self.sbconst = 5.678E-8  # J s^-1 m^-2 K^-4
@@ -44,13 +54,15 @@ class EToEstimator:
         This function will grab the current time and return a midpoint for a given period in terms of hours as a float.
         If the period length is thirty minutes and the current time is 12:04 then the function will return 12.25 which
         is equal to 12:15 or the midpoint of a thirty minute period from 12:00 to 12:30. This value is necessary to
-        estimate solar radiation for the given period length.
+        estimate solar radiation for the given period length. The day of year of the period is kept for the solar
+        radiation terms.
 
         :return: midpoint in terms of hours as float (0-24)
         """
 
-        if isinstance(self.time_now, int):
-            self.time_now = datetime.fromtimestamp(self.time_now)
+        if isinstance(self.time_now, numbers.Integral):
+            self.time_now = datetime.fromtimestamp(int(self.time_now), timezone.utc) - timedelta(hours=self.utc_offset)
+            self.time_now = self.time_now.timetuple()
 
         if not self.time_now:
             self.time_now = datetime.now()-timedelta(hours=self.utc_offset)
@@ -69,6 +81,7 @@ class EToEstimator:
         self.clock_at_midpoint = clock_at_midpoint
         self.clock_at_beginning = clock_at_beginning
         self.clock_at_end = clock_at_end
+        self.day_of_year = self.time_now.tm_yday
 
         if self.print_switch:
             print('[INFO] Period beginning: {0}'.format(self.clock_at_beginning))
@@ -76,73 +89,21 @@ class EToEstimator:
             print('[INFO] Period end: {0}'.format(self.clock_at_end))
 
     def sun_rise_set(self):
-        """ This is a function that will calculate sunrise and sunset from a given latitude and current time. The method
-        for deriving sunrise and sunset from geolocation and Julian date was taken from the following Wikipedia page:
-
-        https://en.wikipedia.org/wiki/Sunrise_equation
+        """ This is a function that will calculate sunrise and sunset from a given latitude and current time. The
+        sunrise equation itself is evaluated and cached by ETo_py.solar_events.
 
         :return: sunrise and sunset times
         """
 
-        # The calculation below simply finds the difference between now and Jan 1, 2000 12:00 an adds leap seconds.
-        j_yr_2000 = 2451545.0
-
-        origin = datetime.strptime("2000-01-01 12:00:00", '%Y-%m-%d %H:%M:%S')
-        time_now = datetime.now()  # Server in UTC so subtract 5 hrs for Lubbock TX
-
-        # Difference between now and Jan 1, 2000 12:00.
-        time_diff = time_now - origin
-
-        n = time_diff.days
-
-        # Calculate mean solar noon.
-        l_w = self.longitude
-
-        j_approx = n - (l_w / 360)
-
-        # Calculate solar mean anomaly
-        m = (357.5291 + 0.98560028 * j_approx) % 360
-
-        m = math.radians(m)
-
-        # Calculate the Equation of the center
-        c = (math.radians(1.9148) * math.sin(m)) + (math.radians(0.0200) * math.sin(2 * m)) + (
-                math.radians(0.0003) * math.sin(3 * m))
-
-        c = math.degrees(c)
-        m = math.degrees(m)
+        if self.observed_at is not None:
+            # The day of the observation at the site, as naive UTC datetimes.
+            sunrise, sunset = solar_day_events([self.observed_at], self.latitude, self.longitude)
+            todays_sunrise = datetime.fromtimestamp(sunrise[0], timezone.utc).replace(tzinfo=None)
+            todays_sunset = datetime.fromtimestamp(sunset[0], timezone.utc).replace(tzinfo=None)
 
-        # Calculate the ecliptic longitude
-        eclipt_long = (m + c + 180 + 102.9372) % 360
-
-        # Calculate solar transit
-        eclipt_long = math.radians(eclipt_long)
-        m = math.radians(m)
-
-        j_transit = j_yr_2000 + j_approx + (math.radians(0.0053) * math.sin(m)) - (
-                math.radians(0.0069) * math.sin(2 * eclipt_long))
-
-        # Calculate the declination of the sun.
-        little_delta = math.asin((math.sin(eclipt_long) * math.sin(math.radians(23.44))))
-
-        # Calculate the hour angle
-        phi = self.latitude
-
-        w_naught = math.acos(
-            (math.sin(math.radians(-0.83)) - (math.sin(math.radians(phi)) * math.sin(little_delta))) / (
-                    math.cos(math.radians(math.radians(phi))) * math.cos(little_delta)))
-
-        # Calculate sunrise and sunset
-        w_naught = math.degrees(w_naught)
-
-        j_rise = j_transit - (w_naught / 360)
-        j_set = j_transit + (w_naught / 360)
-
-        sunrise = j_rise - 2451545.0
-        sunset = j_set - 2451545.0
-
-        todays_sunrise = (origin + timedelta(days=sunrise)) - timedelta(hours=self.utc_offset)
-        todays_sunset = (origin + timedelta(days=sunset)) - timedelta(hours=self.utc_offset)
+        else:
+            todays_sunrise, todays_sunset = sun_rise_set(latitude=self.latitude, longitude=self.longitude,
+                                                         UTC_offset=self.utc_offset)
 
         self.todays_sunrise = todays_sunrise
         self.todays_sunset = todays_sunset
@@ -151,7 +112,7 @@ class EToEstimator:
             print('[INFO] Today\'s Sunrise: {0}'.format(self.todays_sunrise))
             print('[INFO] Today\'s Sunset: {0}'.format(self.todays_sunset))
 
-    def et_solar_rad(self, latitude=33.576698, day_of_year=None):
+    def et_solar_rad(self, latitude=33.576698, day_of_year=None, longitude=None, utc_offset=None):
         """
         Estimate extraterrestrial solar radiation. Extraterrestrial radiation is the radiation that strikes a plane
         perpendicular to the Sun's rays at the top of the Earth's atmosphere. This is the major energy source driving
@@ -159,6 +120,8 @@ class EToEstimator:
 
         :param latitude: latitude for location where [decimal degrees]
         :param day_of_year: day of year [integer]
+        :param longitude: longitude for location, east positive [decimal degrees], defaults to the estimator's
+        :param utc_offset: hours the period clock is behind UTC, defaults to the estimator's
         :return: extraterrestrial radiation for the given period [MJ m^-2 hour^-1]
         """
 
@@ -178,10 +141,12 @@ class EToEstimator:
 
         t = self.clock_at_midpoint
 
-        # Solar time angle at midpoint of period
-        l_z = -97.138451
-        l_m = -101.855072
-        little_omega = (math.pi / 12) * (t + (0.06667 * (l_z - l_m) + s_c) - 12)
+        # Solar time angle at midpoint of period. FAO-56 takes longitudes in degrees west, with east positive ones the
+        # correction is 0.06667 * (l_m - l_z). The clock is UTC minus utc_offset hours, which centres its time zone
+        # on -15 * utc_offset degrees.
+        l_z = -15 * (self.utc_offset if utc_offset is None else utc_offset)
+        l_m = self.longitude if longitude is None else longitude
+        little_omega = (math.pi / 12) * (t + (0.06667 * (l_m - l_z) + s_c) - 12)
 
         # Solar time angle at the beginning and end of the period
         t_1 = 0.5  # This is the length of the calculation period 1 for hour 0.5 for thirty minutes
@@ -368,7 +333,11 @@ class EToEstimator:
         :return: soil heat flux for the given hourly or shorter period [MJ m^-2 given_time_period^-1]
         """
 
-        current_time = datetime.now()
+        if self.observed_at is not None:
+            current_time = datetime.fromtimestamp(self.observed_at, timezone.utc).replace(tzinfo=None)
+
+        else:
+            current_time = datetime.now()
 
         if self.todays_sunrise < current_time < self.todays_sunset:
             g = 0.1 * self.r_n
@@ -395,10 +364,10 @@ class EToEstimator:
 
         self.get_midpoint_period()
         self.sun_rise_set()
-        self.et_solar_rad()
-        self.solar_radiation()
-        self.clear_sky_radiation()
-        self.net_shortwave_radiation()
+        self.et_solar_rad(latitude=self.latitude, day_of_year=self.day_of_year)
+        self.solar_radiation(a_s=self.a_s, b_s=self.b_s)
+        self.clear_sky_radiation(z=self.elevation)
+        self.net_shortwave_radiation(albedo=self.albedo)
         self.saturated_vap_pressure()
         self.slope_sat_vap_pressure()
         self.actual_vap_pressure()
@@ -0,0 +1,287 @@
+import hashlib
+import numpy as np
+
+from ETo_py.eto import EToEstimator
+from ETo_py.solar_events import solar_day_events
+
+
+def extraterrestrial_radiation(latitude, day_of_year, clock_at_midpoint, longitude, utc_offset=0):
+    """
+    Vectorized extraterrestrial solar radiation, see EToEstimator.et_solar_rad. Any of the arguments may be arrays as
+    long as they broadcast against each other.
+
+    :param latitude: latitude for location where [decimal degrees]
+    :param day_of_year: day of year [integer]
+    :param clock_at_midpoint: midpoint of the period in hours (0-24)
+    :param longitude: longitude for location, east positive [decimal degrees]
+    :param utc_offset: hours the period clock is behind UTC
+    :return: extraterrestrial radiation for each period [MJ m^-2 hour^-1]
+    """
+
+    # Calculate inverse relative distance Earth-Sun
+    j = np.radians(latitude)
+    d_r = 1 + 0.033 * np.cos(((2 * np.pi) / 365) * j)
+
+    # Calculate solar declination
+    little_delta = 0.409 * np.sin((((2 * np.pi) / 365) * j) - 1.39)
+
+    # Seasonal correction for solar time
+    b = ((2 * np.pi) * (np.asarray(day_of_year) - 81)) / 364
+    s_c = 0.1645 * np.sin(2 * b) - 0.1255 * np.cos(b) - 0.025 * np.sin(b)
+
+    t = clock_at_midpoint
+
+    # Solar time angle at midpoint of period, the centre of the clock's time zone is at -15 * utc_offset degrees.
+    l_z = -15 * np.asarray(utc_offset)
+    l_m = np.asarray(longitude)
+    little_omega = (np.pi / 12) * (t + (0.06667 * (l_m - l_z) + s_c) - 12)
+
+    # Solar time angle at the beginning and end of the period
+    t_1 = 0.5  # This is the length of the calculation period 1 for hour 0.5 for thirty minutes
+    little_omega_1 = little_omega - ((np.pi * t_1) / 24)
+    little_omega_2 = little_omega + ((np.pi * t_1) / 24)
+
+    # Extraterrestrial radiation for hourly or shorter period
+    g_sc = 0.0820  # MJ * m^-2 * min^-1
+    r_a = ((12 * 60) / np.pi) * g_sc * d_r * (
+            (little_omega_2 - little_omega_1) * (np.sin(j) * np.sin(little_delta)) + (
+                np.cos(j) * np.cos(little_delta) * (np.sin(little_omega_2) - np.sin(little_omega_1))))
+
+    return r_a
+
+
+def day_of_year(seconds):
+    """
+    Day of year of unix timestamps, vectorized.
+
+    :param seconds: unix timestamps, shifted to local time by the caller [integer array]
+    :return: day of year (1-366) [integer array]
+    """
+
+    days = np.asarray(seconds, dtype=np.int64).astype('datetime64[s]').astype('datetime64[D]')
+
+    return (days - days.astype('datetime64[Y]')).astype(np.int64) + 1
+
+
+class EToBatch(EToEstimator):
+    """
+    A vectorized version of EToEstimator for a series of observations at a single site. Each step of the FAO-56 ETo
+    model is evaluated over NumPy column arrays in one pass instead of building one estimator per observation. The
+    attribute names and intermediate values match the scalar class, they are simply arrays here.
+
+    Every time-dependent term, the period clock, the day of year and the day or night split, is taken from the
+    observation timestamps and never from the wall clock, so the result is a pure function of the inputs.
+    """
+
+    def __init__(self, **kwargs):
+        self.latitude = kwargs['latitude']
+        self.longitude = kwargs['longitude']
+        self.elevation = kwargs.get('elevation', 976)  # in meters
+        self.albedo = kwargs.get('albedo', 0.23)
+        self.a_s = kwargs.get('a_s', 0.25)
+        self.b_s = kwargs.get('b_s', 0.5)
+        self.radiation_table = kwargs.get('radiation_table')  # see ETo_py.radiation_tables
+        self.period_length = kwargs.get('period_length', 30)  # in minutes
+        self.utc_offset = kwargs.get('utc_offset', 0)
+        self.print_switch = kwargs.get('print_switch', False)
+        self.air_temp = None
+        self.air_temp_min = None
+        self.air_temp_max = None
+        self.wind_speed = None
+        self.relative_humidity = None
+        self.pressure = None
+        self.timestamps = None
+        self.day_of_year = None
+        self.clock_at_midpoint = None
+        self.clock_at_beginning = None
+        self.clock_at_end = None
+        self.sunrise = None
+        self.sunset = None
+        self.todays_sunrise = None
+        self.todays_sunset = None
+        self.sbconst = 5.678E-8  # J s^-1 m^-2 K^-4
+        self.r_a = None
+        self.r_s = None
+        self.r_so = None
+        self.r_ns = None
+        self.e_deg_t = None
+        self.d = None
+        self.e_a = None
+        self.y = None
+        self.r_n = None
+        self.g = None
+        self.eto = None
+
+    def get_midpoint_period(self):
+        """
+        Vectorized period midpoint. The clock values are derived from the unix timestamp of each observation rather
+        than the current time, so every observation is placed in its own period on its own day.
+
+        :return: midpoint, beginning and end of each period in terms of hours as float arrays (0-24), and the day of
+            year of each observation
+        """
+
+        seconds = self.timestamps - (self.utc_offset * 3600)
+        self.day_of_year = day_of_year(seconds)
+        hours = (seconds // 3600) % 24
+        minutes = (seconds // 60) % 60
+
+        first_half = minutes < self.period_length
+
+        self.clock_at_beginning = np.where(first_half, hours, hours + 0.5)
+        self.clock_at_midpoint = self.clock_at_beginning + 0.25
+        self.clock_at_end = self.clock_at_beginning + 0.5
+
+    def et_solar_rad(self, latitude=33.576698, day_of_year=None, longitude=None, utc_offset=None):
+        """
+        Vectorized extraterrestrial solar radiation, see EToEstimator.et_solar_rad. When a radiation table has been
+        supplied for the site the values are looked up by day of year and period slot instead of being recomputed.
+        The table must have been built for the same longitude and utc_offset.
+
+        :param latitude: latitude for location where [decimal degrees]
+        :param day_of_year: day of year [integer or integer array], defaults to the day of each observation
+        :param longitude: longitude for location, east positive [decimal degrees], defaults to the engine's
+        :param utc_offset: hours the period clock is behind UTC, defaults to the engine's
+        :return: extraterrestrial radiation for each period [MJ m^-2 hour^-1]
+        """
+
+        if day_of_year is None:
+            day_of_year = self.day_of_year
+
+        if self.radiation_table is not None:
+            slots = (self.clock_at_beginning * 2).astype(int)
+            self.r_a = self.radiation_table[0][np.asarray(day_of_year) - 1, slots]
+
+        else:
+            self.r_a = extraterrestrial_radiation(latitude, day_of_year, self.clock_at_midpoint,
+                                                  self.longitude if longitude is None else longitude,
+                                                  self.utc_offset if utc_offset is None else utc_offset)
+
+    def clear_sky_radiation(self, a_s=0.75, b_s=2E-5, z=976):
+        """
+        Clear-sky radiation, see EToEstimator.clear_sky_radiation. Looked up from the radiation table when one has
+        been supplied for the site.
+
+        :param a_s: regression constant, the fraction of R_a that reaches Earth on overcast day (n=0)
+        :param b_s: fraction of R_a that reaches Earth on clear days (n=N)
+        :param z: location elevation in meters, 976 for Lubbock, TX
+        :return: clear-sky radiation (R_so) [MJ m^2 given_time_period^-1]
+        """
+
+        if self.radiation_table is not None:
+            slots = (self.clock_at_beginning * 2).astype(int)
+            self.r_so = self.radiation_table[1][self.day_of_year - 1, slots]
+
+        else:
+            super().clear_sky_radiation(a_s=a_s, b_s=b_s, z=z)
+
+    def saturated_vap_pressure(self):
+        """
+        Vectorized saturation vapor pressure, see EToEstimator.saturated_vap_pressure.
+
+        :return: saturation vapor pressure at each temperature [kPa]
+        """
+
+        self.e_deg_t = 0.6018 * np.exp((17.27 * self.air_temp) / (self.air_temp + 237.3))
+
+    def net_longwave_radiation(self):
+        """
+        Vectorized net outgoing longwave radiation, see EToEstimator.net_longwave_radiation.
+
+        :return: net outgoing long wave radiation [MJ m^-2 given_time_period^-1]
+        """
+
+        time_period_seconds = self.period_length * 60
+        sbc = self.sbconst * .0001 * time_period_seconds
+
+        self.r_n = sbc * (((self.air_temp_min ** 4) + (self.air_temp_max ** 4)) / 2) * \
+            (0.34 - (0.14 * (np.sqrt(self.e_a)))) * (1.35 * (self.r_s / self.r_so) - 0.35)
+
+    def sun_rise_set(self):
+        """
+        Sunrise and sunset of each observation's own day at the site as unix timestamps, see
+        ETo_py.solar_events.solar_day_events. Values passed to estimate, such as those stored at ingest, are used as
+        they are and only the missing ones are computed.
+        """
+
+        self.todays_sunrise = np.full(self.timestamps.shape, np.nan) if self.sunrise is None else self.sunrise.copy()
+        self.todays_sunset = np.full(self.timestamps.shape, np.nan) if self.sunset is None else self.sunset.copy()
+
+        missing = np.isnan(self.todays_sunrise) | np.isnan(self.todays_sunset)
+        if missing.any():
+            sunrise, sunset = solar_day_events(self.timestamps[missing], self.latitude, self.longitude)
+            self.todays_sunrise[missing] = sunrise
+            self.todays_sunset[missing] = sunset
+
+    def soil_heat_flux(self):
+        """
+        Vectorized soil heat flux, see EToEstimator.soil_heat_flux. Each period is day or night depending on its own
+        observation time and the sunrise and sunset of its day.
+
+        :return: soil heat flux for each period [MJ m^-2 given_time_period^-1]
+        """
+
+        daytime = (self.todays_sunrise < self.timestamps) & (self.timestamps < self.todays_sunset)
+
+        self.g = np.where(daytime, 0.1, 0.5) * self.r_n
+
+    def model_key(self):
+        """
+        Everything besides the observations that an estimate depends on: the site, the model parameters and the
+        radiation table, which is identified by a digest of its contents. See ETo_py.eto_cache.
+
+        :return: hashable tuple
+        """
+
+        table = None
+        if self.radiation_table is not None:
+            table = hashlib.sha1(np.ascontiguousarray(self.radiation_table)).hexdigest()
+
+        return (self.latitude, self.longitude, self.elevation, self.albedo, self.a_s, self.b_s, self.period_length,
+                self.utc_offset, table)
+
+    def estimate(self, air_temp, wind_speed, relative_humidity, pressure, timestamps, air_temp_min=None,
+                 air_temp_max=None, sunrise=None, sunset=None):
+        """
+        Estimate ETo for every observation in the given column arrays in a single vectorized pass.
+
+        :param air_temp: air temperature [C]
+        :param wind_speed: wind speed [m s^-1]
+        :param relative_humidity: relative humidity as a fraction (0-1)
+        :param pressure: atmospheric pressure [kPa]
+        :param timestamps: unix timestamps of the observations
+        :param air_temp_min: period minimum air temperature [C], defaults to air_temp
+        :param air_temp_max: period maximum air temperature [C], defaults to air_temp
+        :param sunrise: sunrise of each observation's day as unix timestamps, computed where missing or NaN
+        :param sunset: sunset of each observation's day as unix timestamps, computed where missing or NaN
+        :return: dictionary of intermediate and final arrays keyed like the EToEstimator attributes
+        """
+
+        self.air_temp = np.asarray(air_temp, dtype=float)
+        self.air_temp_min = self.air_temp if air_temp_min is None else np.asarray(air_temp_min, dtype=float)
+        self.air_temp_max = self.air_temp if air_temp_max is None else np.asarray(air_temp_max, dtype=float)
+        self.wind_speed = np.asarray(wind_speed, dtype=float)
+        self.relative_humidity = np.asarray(relative_humidity, dtype=float)
+        self.pressure = np.asarray(pressure, dtype=float)
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.sunrise = None if sunrise is None else np.asarray(sunrise, dtype=float)
+        self.sunset = None if sunset is None else np.asarray(sunset, dtype=float)
+
+        self.estimate_eto()
+
+        if self.print_switch:
+            print('[INFO] Estimated ETo for {0} periods'.format(self.eto.size))
+
+        return {
+            'r_a': self.r_a,
+            'r_s': self.r_s,
+            'r_so': self.r_so,
+            'r_ns': self.r_ns,
+            'e_deg_t': self.e_deg_t,
+            'd': self.d,
+            'e_a': self.e_a,
+            'y': self.y,
+            'r_n': self.r_n,
+            'g': self.g,
+            'eto': self.eto,
+        }
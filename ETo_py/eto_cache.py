@@ -0,0 +1,151 @@
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+
+# Intermediate and final values of an estimate.
+RESULT_FIELDS = ('r_a', 'r_s', 'r_so', 'r_ns', 'e_deg_t', 'd', 'e_a', 'y', 'r_n', 'g', 'eto')
+
+
+def content_key(model_key, inputs):
+    """
+    Digest of an evaluation: the model key of the engine and the bytes of every input column.
+
+    :param model_key: EToBatch.model_key()
+    :param inputs: input arrays in a fixed order
+    :return: hex digest
+    """
+
+    digest = hashlib.sha1(repr(model_key).encode())
+    for values in inputs:
+        digest.update(values.dtype.str.encode())
+        digest.update(np.ascontiguousarray(values).tobytes())
+
+    return digest.hexdigest()
+
+
+class EToResultCache:
+    """
+    With every time-dependent term taken from the observation timestamps, an EToBatch estimate is a pure function of
+    its input columns and the model key of the engine. Results are held in a bounded LRU cache addressed by a digest of
+    that content, so evaluating the same history again, for a repeated export or a recompute after a parameter change
+    is reverted, skips the model. The bound is on the total number of observations held.
+
+    Observations are cached in blocks of consecutive rows that fall in the same UTC day rather than one by one:
+    looking up rows one at a time costs more than evaluating them over arrays. Requests over overlapping ranges share
+    the days they have in common, only the days at their edges are evaluated again.
+    """
+
+    def __init__(self, maxsize=262144, block_seconds=86400):
+        self.maxsize = maxsize
+        self.block_seconds = block_seconds
+        self.cache = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def blocks(self, timestamps):
+        """ Slices of the runs of consecutive observations that fall in the same block. """
+
+        block_ids = timestamps // self.block_seconds
+        bounds = [0] + (np.flatnonzero(np.diff(block_ids)) + 1).tolist() + [len(timestamps)]
+
+        return [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+    def estimate(self, eto_batch, air_temp, wind_speed, relative_humidity, pressure, timestamps, air_temp_min=None,
+                 air_temp_max=None, sunrise=None, sunset=None):
+        """
+        Estimate ETo for every observation like EToBatch.estimate. Blocks whose inputs have been evaluated before are
+        served from the cache, the rest are evaluated together in one call.
+
+        :param eto_batch: EToBatch for the site, runs the evaluation on a miss
+        :param air_temp: air temperature [C]
+        :param wind_speed: wind speed [m s^-1]
+        :param relative_humidity: relative humidity as a fraction (0-1)
+        :param pressure: atmospheric pressure [kPa]
+        :param timestamps: unix timestamps of the observations
+        :param air_temp_min: period minimum air temperature [C], defaults to air_temp
+        :param air_temp_max: period maximum air temperature [C], defaults to air_temp
+        :param sunrise: sunrise of each observation's day as unix timestamps, computed where missing or NaN
+        :param sunset: sunset of each observation's day as unix timestamps, computed where missing or NaN
+        :return: dictionary of arrays keyed by RESULT_FIELDS
+        """
+
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+
+        def column(values, default=np.nan):
+            return np.broadcast_to(np.asarray(default if values is None else values, dtype=float), timestamps.shape)
+
+        # Missing optional inputs are evaluated the same as columns of their defaults, so they share a key.
+        air_temp = column(air_temp)
+        inputs = (air_temp, column(air_temp_min, air_temp), column(air_temp_max, air_temp), column(wind_speed),
+                  column(relative_humidity), column(pressure), timestamps, column(sunrise), column(sunset))
+        model_key = eto_batch.model_key()
+
+        blocks = self.blocks(timestamps)
+        keys = [content_key(model_key, [values[block] for values in inputs]) for block in blocks]
+        found = {}
+
+        with self.lock:
+            for key in keys:
+                results = self.cache.get(key)
+
+                if results is not None:
+                    self.cache.move_to_end(key)
+                    found[key] = results
+                    self.hits += 1
+
+                else:
+                    self.misses += 1
+
+        missing = [(block, key) for block, key in zip(blocks, keys) if key not in found]
+
+        if missing:
+            rows = np.concatenate([np.arange(timestamps.size)[block] for block, _ in missing])
+            columns = eto_batch.estimate(air_temp=inputs[0][rows], air_temp_min=inputs[1][rows],
+                                         air_temp_max=inputs[2][rows], wind_speed=inputs[3][rows],
+                                         relative_humidity=inputs[4][rows], pressure=inputs[5][rows],
+                                         timestamps=inputs[6][rows], sunrise=inputs[7][rows], sunset=inputs[8][rows])
+            columns = {field: np.broadcast_to(columns[field], rows.shape) for field in RESULT_FIELDS}
+
+            start = 0
+            for block, key in missing:
+                stop = start + block.stop - block.start
+                results = {}
+                for field in RESULT_FIELDS:
+                    results[field] = np.array(columns[field][start:stop], dtype=float)
+                    results[field].flags.writeable = False
+
+                found[key] = results
+                start = stop
+
+            with self.lock:
+                for block, key in missing:
+                    if key not in self.cache:
+                        self.cache[key] = found[key]
+                        self.size += block.stop - block.start
+
+                while self.size > self.maxsize:
+                    _, evicted = self.cache.popitem(last=False)
+                    self.size -= evicted['eto'].size
+
+        if not keys:
+            return {field: np.empty(0) for field in RESULT_FIELDS}
+
+        return {field: np.concatenate([found[key][field] for key in keys]) for field in RESULT_FIELDS}
+
+    def info(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.cache), 'size': self.size,
+                    'maxsize': self.maxsize, 'hit_rate': self.hits / lookups if lookups else None}
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+            self.size = 0
+
+
+# Shared by every caller of the ETo model in this process.
+eto_result_cache = EToResultCache()
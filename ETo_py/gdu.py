@@ -0,0 +1,18 @@
+import numpy as np
+
+
+def gdu_calc(temp_c, gdu_base=15.6, gdu_max=38.0, day_fraction=(1/48)):
+    """
+    Growing degree units accumulated over a period. Temperatures above gdu_max are capped and periods below gdu_base
+    accumulate nothing.
+
+    :param temp_c: air temperature [C], a scalar or an array
+    :param gdu_base: base temperature for growth [C]
+    :param gdu_max: temperature above which growth does not increase [C]
+    :param day_fraction: length of the period as a fraction of a day, 1/48 for thirty minutes
+    :return: heat units for each period [C day]
+    """
+
+    heat_units = np.minimum(np.asarray(temp_c, dtype=float), gdu_max) - gdu_base
+
+    return np.maximum(heat_units, 0) * day_fraction
@@ -0,0 +1,68 @@
+import os
+import numpy as np
+
+from ETo_py.eto_batch import extraterrestrial_radiation
+
+DAYS_PER_YEAR = 366
+PERIODS_PER_DAY = 48
+
+# Raised whenever the table contents change for the same site, so that tables stored before are rebuilt.
+# 2: solar time taken from the site longitude and the UTC clock of the periods.
+TABLE_VERSION = 2
+
+
+def build_radiation_table(latitude, longitude, elevation=976, a_s=0.75, b_s=2E-5, utc_offset=0):
+    """
+    Extraterrestrial radiation only depends on position, day of year and the time of day, so for a given site it can
+    be evaluated once for every thirty minute period of the year. The table holds R_a in the first plane and the
+    clear-sky radiation R_so = (a_s + b_s * z) * R_a in the second, each indexed by [day_of_year - 1, period slot].
+    Periods are slotted on a clock utc_offset hours behind UTC.
+
+    :param latitude: site latitude [decimal degrees]
+    :param longitude: site longitude, east positive [decimal degrees]
+    :param elevation: site elevation [meters]
+    :param a_s: clear-sky regression constant, see EToEstimator.clear_sky_radiation
+    :param b_s: clear-sky elevation coefficient, see EToEstimator.clear_sky_radiation
+    :param utc_offset: hours the period clock is behind UTC
+    :return: radiation table with shape (2, 366, 48) [MJ m^-2 given_time_period^-1]
+    """
+
+    day_of_year = np.arange(1, DAYS_PER_YEAR + 1)[:, np.newaxis]
+    clock_at_midpoint = (np.arange(PERIODS_PER_DAY) * 0.5 + 0.25)[np.newaxis, :]
+
+    r_a = extraterrestrial_radiation(latitude, day_of_year, clock_at_midpoint, longitude, utc_offset)
+    r_so = (a_s + (b_s * elevation)) * r_a
+
+    return np.stack([r_a, r_so])
+
+
+def save_radiation_table(path, table):
+    """
+    Write a radiation table to disk as a .npy file so that it can be memory-mapped on load. The file is written to a
+    temporary name first so that readers never see a partial table.
+
+    :param path: destination file path
+    :param table: table from build_radiation_table
+    """
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, table)
+
+    os.replace(tmp_path, path)
+
+
+def load_radiation_table(path):
+    """
+    Memory-map a radiation table written by save_radiation_table.
+
+    :param path: table file path
+    :return: read only radiation table, or None if the file does not exist
+    """
+
+    if not os.path.exists(path):
+        return None
+
+    return np.load(path, mmap_mode='r')
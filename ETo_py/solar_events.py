@@ -0,0 +1,185 @@
+import threading
+import numpy as np
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+# Julian date and unix timestamp for Jan 1, 2000 12:00, the epoch of the sunrise equation.
+J_YR_2000 = 2451545.0
+ORIGIN = datetime(2000, 1, 1, 12)
+ORIGIN_STAMP = 946728000
+
+
+def solar_events(n, latitude, longitude):
+    """ Vectorized sunrise equation. The method for deriving sunrise and sunset from geolocation and Julian date was
+    taken from the following Wikipedia page:
+
+    https://en.wikipedia.org/wiki/Sunrise_equation
+
+    :param n: whole days since Jan 1, 2000 12:00 [integer array]
+    :param latitude: latitude in decimal degrees [float array]
+    :param longitude: longitude in decimal degrees [float array]
+    :return: sunrise and sunset as fractional days since Jan 1, 2000 12:00 [float arrays]
+    """
+
+    n = np.asarray(n, dtype=float)
+
+    # Calculate mean solar noon.
+    l_w = np.asarray(longitude, dtype=float)
+
+    j_approx = n - (l_w / 360)
+
+    # Calculate solar mean anomaly
+    m = np.radians((357.5291 + 0.98560028 * j_approx) % 360)
+
+    # Calculate the Equation of the center
+    c = (np.radians(1.9148) * np.sin(m)) + (np.radians(0.0200) * np.sin(2 * m)) + (
+            np.radians(0.0003) * np.sin(3 * m))
+
+    c = np.degrees(c)
+    m = np.degrees(m)
+
+    # Calculate the ecliptic longitude
+    eclipt_long = (m + c + 180 + 102.9372) % 360
+
+    # Calculate solar transit
+    eclipt_long = np.radians(eclipt_long)
+    m = np.radians(m)
+
+    j_transit = J_YR_2000 + j_approx + (np.radians(0.0053) * np.sin(m)) - (
+            np.radians(0.0069) * np.sin(2 * eclipt_long))
+
+    # Calculate the declination of the sun.
+    little_delta = np.arcsin((np.sin(eclipt_long) * np.sin(np.radians(23.44))))
+
+    # Calculate the hour angle
+    phi = np.asarray(latitude, dtype=float)
+
+    w_naught = np.arccos(
+        (np.sin(np.radians(-0.83)) - (np.sin(np.radians(phi)) * np.sin(little_delta))) / (
+                np.cos(np.radians(np.radians(phi))) * np.cos(little_delta)))
+
+    # Calculate sunrise and sunset
+    w_naught = np.degrees(w_naught)
+
+    j_rise = j_transit - (w_naught / 360)
+    j_set = j_transit + (w_naught / 360)
+
+    return j_rise - J_YR_2000, j_set - J_YR_2000
+
+
+class SolarEventService:
+    """
+    Sunrise and sunset only change once per day for a given site, so results are held in a bounded LRU cache keyed by
+    (day number, latitude, longitude, UTC offset). Lookups are vectorized over dates and sites and only the keys
+    missing from the cache are sent through the sunrise equation.
+    """
+
+    def __init__(self, maxsize=32768):
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def events(self, timestamps, latitude, longitude, utc_offset=0):
+        """
+        Sunrise and sunset for the day of each timestamp at each site.
+
+        :param timestamps: unix timestamps in UTC [integer array]
+        :param latitude: site latitudes in decimal degrees, a scalar or an array matching timestamps
+        :param longitude: site longitudes in decimal degrees, a scalar or an array matching timestamps
+        :param utc_offset: offset in hours from UTC for the site
+        :return: sunrise and sunset as unix timestamps [float arrays]
+        """
+
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        n = (timestamps - ORIGIN_STAMP) // 86400
+        latitude, longitude, utc_offset = (
+            np.broadcast_to(np.asarray(v, dtype=float), n.shape) for v in (latitude, longitude, utc_offset))
+
+        keys = np.stack([n.astype(float), latitude, longitude, utc_offset], axis=-1).reshape(-1, 4)
+        unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+
+        with self.lock:
+            events = np.empty((len(unique_keys), 2))
+            missing = []
+            for i, key in enumerate(map(tuple, unique_keys)):
+                cached = self.cache.get(key)
+
+                if cached is None:
+                    missing.append(i)
+
+                else:
+                    self.cache.move_to_end(key)
+                    events[i] = cached
+
+            self.hits += len(unique_keys) - len(missing)
+            self.misses += len(missing)
+
+            if missing:
+                new_keys = unique_keys[missing]
+                sunrise, sunset = solar_events(new_keys[:, 0], new_keys[:, 1], new_keys[:, 2])
+                offset = new_keys[:, 3] * 3600
+                events[missing, 0] = ORIGIN_STAMP + sunrise * 86400 - offset
+                events[missing, 1] = ORIGIN_STAMP + sunset * 86400 - offset
+
+                for key, event in zip(map(tuple, new_keys), events[missing]):
+                    self.cache[key] = (event[0], event[1])
+
+                while len(self.cache) > self.maxsize:
+                    self.cache.popitem(last=False)
+
+        events = events[inverse.reshape(-1)]
+
+        return events[:, 0].reshape(n.shape), events[:, 1].reshape(n.shape)
+
+    def info(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.cache), 'maxsize': self.maxsize}
+
+
+# Shared by the ETo engines and the observation ingest path.
+solar_event_service = SolarEventService()
+
+
+def sun_rise_set(latitude=33.576698, longitude=-101.855072, UTC_offset=5, time_now=None):
+    """ Sunrise and sunset for a single site and day, served from the shared solar event cache.
+
+    :param latitude: Latitude in decimal degrees with default for Lubbock, TX
+    :param longitude: Longitude in decimal degrees with default for Lubbock, TX
+    :param UTC_offset: Offset for location from UTC
+    :param time_now: naive UTC datetime for the day of interest, defaults to now
+    :return: sunrise and sunset times as naive datetimes
+    """
+
+    if time_now is None:
+        time_now = datetime.now()  # Server in UTC
+
+    stamp = int((time_now - ORIGIN).total_seconds()) + ORIGIN_STAMP
+
+    sunrise, sunset = solar_event_service.events([stamp], latitude, longitude, UTC_offset)
+
+    todays_sunrise = datetime.fromtimestamp(sunrise[0], timezone.utc).replace(tzinfo=None)
+    todays_sunset = datetime.fromtimestamp(sunset[0], timezone.utc).replace(tzinfo=None)
+
+    return todays_sunrise, todays_sunset
+
+
+def solar_day_events(timestamps, latitude, longitude):
+    """ Sunrise and sunset of the local solar day each observation falls in, for one or many sites in one vectorized
+    call served from the shared cache.
+
+    Days are split at local mean solar midnight rather than at a fixed UTC hour, so an evening observation is compared
+    with that evening's sunset wherever the station is.
+
+    :param timestamps: unix timestamps of the observations [integer array]
+    :param latitude: site latitudes in decimal degrees, a scalar or an array matching timestamps
+    :param longitude: site longitudes in decimal degrees, a scalar or an array matching timestamps
+    :return: sunrise and sunset as unix timestamps [float arrays], NaN where the position is unknown
+    """
+
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+
+    # Day numbers of the sunrise equation change at noon UTC, shift them to change at local solar midnight.
+    shift = np.nan_to_num(43200 + np.asarray(longitude, dtype=float) / 360 * 86400).astype(np.int64)
+
+    return solar_event_service.events(timestamps + shift, latitude, longitude)
@@ -16,7 +16,7 @@
 # u_2: average wind speed for the given time period
 
 from ETo_py import solar_rad_per_unit_time as sol_rad
-from ETo_py import sunrise_sunset as ss
+from ETo_py import solar_events as ss
 
 def estimate_eto(R_n, G, T_period, D, y, e_deg_T, e_a, u_2):
 
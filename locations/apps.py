@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class LocationsConfig(AppConfig):
     name = 'locations'
+
+    def ready(self):
+        from locations import radiation  # noqa: F401, connects the radiation table signal handlers
@@ -0,0 +1,88 @@
+import functools
+import hashlib
+import threading
+import time
+from django.core.cache import caches
+
+CACHE_ALIAS = 'locations'
+
+# Hit and miss counts of this process, see cache_info.
+stats = {'hits': 0, 'misses': 0}
+stats_lock = threading.Lock()
+
+
+def generation_key(location):
+    # Location names may hold spaces and commas, which memcached does not accept in a key.
+    return 'generation:' + hashlib.sha1(str(location).encode()).hexdigest()
+
+
+def context_key(location, generation, params):
+    raw = '{0}:{1}:{2}'.format(location, generation, ':'.join(str(params.get(key)) for key in sorted(params)))
+
+    return 'context:' + hashlib.sha1(raw.encode()).hexdigest()
+
+
+def location_generation(location):
+    """
+    The current generation of a location, it changes whenever invalidate_locations is called for it. A generation
+    culled from the cache comes back as a new one, never as a value that older contexts were stored under.
+    """
+
+    return caches[CACHE_ALIAS].get_or_set(generation_key(location), time.time_ns, timeout=None)
+
+
+def count(outcome):
+    with stats_lock:
+        stats[outcome] += 1
+
+
+def cached_context(func):
+    """
+    Cache the context built by a view function such as single_location, keyed on the location, the date range and the
+    GDU parameters. Each location has a generation number in the cache that is part of the key, bumping it with
+    invalidate_locations makes every cached context of that location unreachable. Stale entries are culled by the
+    cache backend as newer ones are added.
+    """
+
+    @functools.wraps(func)
+    def wrapper(**kwargs):
+        cache = caches[CACHE_ALIAS]
+        location = kwargs['location']
+        generation = location_generation(location)
+        key = context_key(location, generation, {k: v for k, v in kwargs.items() if k != 'location'})
+
+        context = cache.get(key)
+        if context is not None:
+            count('hits')
+            return context
+
+        count('misses')
+        context = func(**kwargs)
+        cache.set(key, context)
+
+        return context
+
+    wrapper.uncached = func
+
+    return wrapper
+
+
+def invalidate_locations(locations):
+    """
+    Drop the cached contexts of the given locations, called once new observations for them are committed.
+
+    :param locations: Location names
+    """
+
+    generation = time.time_ns()
+    caches[CACHE_ALIAS].set_many({generation_key(location): generation for location in set(locations)}, timeout=None)
+
+
+def cache_info():
+    with stats_lock:
+        info = dict(stats)
+
+    lookups = info['hits'] + info['misses']
+    info['hit_rate'] = info['hits'] / lookups if lookups else None
+
+    return info
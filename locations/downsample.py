@@ -0,0 +1,70 @@
+import numpy as np
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling of a continuous series. The first and last points are always kept,
+    every bucket in between keeps the point that forms the largest triangle with the point kept in the previous
+    bucket and the mean of the next bucket.
+
+    https://skemman.is/bitstream/1946/15343/3/SS_MSthesis.pdf
+
+    :param x: x values, e.g. unix timestamps [float array]
+    :param y: y values [float array], NaN values are never chosen unless a bucket holds nothing else
+    :param threshold: maximum number of points to keep
+    :return: indices of the kept points [integer array]
+    """
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Buckets for the interior points, the first and last points are buckets of their own.
+    edges = np.floor(np.linspace(1, n - 1, threshold - 1)).astype(int)
+    indices = np.empty(threshold, dtype=int)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+
+        if i + 2 < len(edges):
+            next_x = x[edges[i + 1]:edges[i + 2]]
+            next_y = y[edges[i + 1]:edges[i + 2]]
+            avg_x, avg_y = next_x.mean(), np.nanmean(next_y) if np.any(~np.isnan(next_y)) else 0.0
+
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        areas = np.where(np.isnan(areas), -1, areas)
+
+        a = start + int(np.argmax(areas))
+        indices[i + 1] = a
+
+    return indices
+
+
+def bucket_sums(values, threshold):
+    """
+    Downsample a series of per-period increments, such as rain or ETo, by summing equal-size buckets so that the
+    total over the range is unchanged. NaN values count as zero.
+
+    :param values: per-period values [float array]
+    :param threshold: maximum number of buckets
+    :return: index of the first point of each bucket and the bucket sums [integer array, float array]
+    """
+
+    values = np.nan_to_num(np.asarray(values, dtype=float))
+    n = len(values)
+
+    if threshold >= n or threshold < 1:
+        return np.arange(n), values
+
+    starts = np.floor(np.linspace(0, n, threshold, endpoint=False)).astype(int)
+
+    return starts, np.add.reduceat(values, starts)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='elevation',
+            field=models.FloatField(default=976, null=True),
+        ),
+    ]
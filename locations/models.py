@@ -8,6 +8,7 @@ class Location(models.Model):
     description = models.TextField(max_length=500, null=True)
     latitude = models.FloatField(default=33.88, blank=False, null=True)
     longitude = models.FloatField(default=-101.22, blank=False, null=True)
+    elevation = models.FloatField(default=976, blank=False, null=True)  # meters
     is_published = models.BooleanField(default=False, null=True)
     post_date = models.DateTimeField(default=datetime.now, null=True)
 
@@ -0,0 +1,61 @@
+import os
+from django.conf import settings
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+from locations.models import Location
+from ETo_py.radiation_tables import TABLE_VERSION, build_radiation_table, save_radiation_table, load_radiation_table
+
+
+def radiation_table_path(location_id):
+    return os.path.join(settings.RADIATION_TABLE_DIR, 'location_{0}.v{1}.npy'.format(location_id, TABLE_VERSION))
+
+
+def rebuild_radiation_table(location):
+    """
+    Build and store the extraterrestrial radiation table for a location.
+
+    :param location: Location instance
+    :return: the new radiation table
+    """
+
+    table = build_radiation_table(latitude=location.latitude, longitude=location.longitude,
+                                  elevation=location.elevation)
+    save_radiation_table(radiation_table_path(location.pk), table)
+
+    return table
+
+
+def get_radiation_table(location):
+    """
+    Memory-map the radiation table for a location, building it first if it has not been stored yet.
+
+    :param location: Location instance
+    :return: radiation table with shape (2, 366, 48), or None if the location has no coordinates
+    """
+
+    if location.latitude is None or location.longitude is None:
+        return None
+
+    table = load_radiation_table(radiation_table_path(location.pk))
+
+    if table is None:
+        table = rebuild_radiation_table(location)
+
+    return table
+
+
+@receiver(pre_save, sender=Location)
+def location_coordinates_changed(sender, instance, **kwargs):
+    if instance.pk is None:
+        instance._radiation_table_stale = True
+        return
+
+    previous = sender.objects.filter(pk=instance.pk).values('latitude', 'longitude', 'elevation').first()
+    instance._radiation_table_stale = previous != {'latitude': instance.latitude, 'longitude': instance.longitude,
+                                                   'elevation': instance.elevation}
+
+
+@receiver(post_save, sender=Location)
+def location_saved(sender, instance, raw=False, **kwargs):
+    if not raw and instance.latitude is not None and instance.longitude is not None and getattr(instance, '_radiation_table_stale', True):
+        rebuild_radiation_table(instance)
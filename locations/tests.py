@@ -1,3 +1,308 @@
-from django.test import TestCase
+import copy
+import json
+import math
+import tempfile
+import time
+from unittest import mock
+import numpy as np
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from locations.cache import CACHE_ALIAS, cached_context, generation_key, invalidate_locations
+from locations.downsample import bucket_sums, lttb
+from locations.models import Location
+from metload import ingest
+from metload.fakeowm import load_sample
+from metload.ingest import load_observations
+from metload.owm_parse import parse_stations
 
-# Create your tests here.
+
+class LttbTests(SimpleTestCase):
+
+    def setUp(self):
+        self.x = np.arange(1000) * 1800.0
+        self.y = np.sin(np.arange(1000) / 25) + np.random.default_rng(0).normal(0, 0.1, 1000)
+
+    def test_keeps_endpoints(self):
+        indices = lttb(self.x, self.y, 100)
+
+        self.assertEqual(len(indices), 100)
+        self.assertEqual((indices[0], indices[-1]), (0, 999))
+        self.assertTrue(np.all(np.diff(indices) > 0))
+
+    def test_keeps_the_extremes(self):
+        y = np.zeros(1000)
+        y[500] = 10
+        y[700] = -10
+
+        indices = lttb(self.x, y, 50)
+
+        self.assertIn(500, indices)
+        self.assertIn(700, indices)
+
+    def test_small_threshold_keeps_everything(self):
+        for threshold in (0, 1, 2):
+            np.testing.assert_array_equal(lttb(self.x, self.y, threshold), np.arange(1000))
+
+    def test_short_input_is_unchanged(self):
+        np.testing.assert_array_equal(lttb(self.x[:10], self.y[:10], 100), np.arange(10))
+        np.testing.assert_array_equal(lttb(self.x[:10], self.y[:10], 10), np.arange(10))
+        self.assertEqual(len(lttb([], [], 10)), 0)
+
+    def test_nan_values_are_skipped(self):
+        y = self.y.copy()
+        y[1::3] = np.nan
+
+        indices = lttb(self.x, y, 100)
+
+        self.assertEqual((indices[0], indices[-1]), (0, 999))
+        # Every bucket holds numbers, so no NaN is kept.
+        self.assertFalse(np.any(np.isnan(y[indices])))
+
+    def test_all_nan_span(self):
+        y = self.y.copy()
+        y[100:400] = np.nan
+
+        indices = lttb(self.x, y, 100)
+
+        self.assertEqual(len(indices), 100)
+        self.assertEqual((indices[0], indices[-1]), (0, 999))
+        self.assertTrue(np.all(np.diff(indices) > 0))
+
+
+class BucketSumsTests(SimpleTestCase):
+
+    def test_total_is_unchanged(self):
+        values = np.random.default_rng(0).uniform(0, 1, 1000)
+
+        starts, sums = bucket_sums(values, 48)
+
+        self.assertEqual(len(sums), 48)
+        self.assertEqual(starts[0], 0)
+        self.assertAlmostEqual(sums.sum(), values.sum())
+        self.assertAlmostEqual(sums[1], values[starts[1]:starts[2]].sum())
+
+    def test_small_threshold(self):
+        values = np.arange(10.0)
+
+        starts, sums = bucket_sums(values, 1)
+        np.testing.assert_array_equal(starts, [0])
+        np.testing.assert_array_equal(sums, [45])
+
+        starts, sums = bucket_sums(values, 2)
+        np.testing.assert_array_equal(starts, [0, 5])
+        np.testing.assert_array_equal(sums, [10, 35])
+
+        starts, sums = bucket_sums(values, 0)
+        np.testing.assert_array_equal(sums, values)
+
+    def test_short_input_is_unchanged(self):
+        values = np.arange(5.0)
+
+        starts, sums = bucket_sums(values, 10)
+
+        np.testing.assert_array_equal(starts, np.arange(5))
+        np.testing.assert_array_equal(sums, values)
+
+    def test_nan_counts_as_zero(self):
+        values = np.array([1.0, np.nan, 2.0, np.nan, 3.0, 4.0])
+
+        starts, sums = bucket_sums(values, 3)
+
+        np.testing.assert_array_equal(sums, [1, 2, 7])
+        np.testing.assert_array_equal(bucket_sums(values, 10)[1], [1, 0, 2, 0, 3, 4])
+
+
+class CachedContextTests(SimpleTestCase):
+
+    def setUp(self):
+        scratch = tempfile.TemporaryDirectory()
+        self.addCleanup(scratch.cleanup)
+        settings_override = override_settings(CACHES={CACHE_ALIAS: {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': scratch.name}})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.builds = 0
+
+        @cached_context
+        def build(**kwargs):
+            self.builds += 1
+            return {'location': kwargs['location'], 'build': self.builds}
+
+        self.build = build
+
+    def test_invalidation(self):
+        self.assertEqual(self.build(location='Earth, TX', days=10)['build'], 1)
+        self.assertEqual(self.build(location='Earth, TX', days=10)['build'], 1)
+
+        invalidate_locations(['Earth, TX'])
+
+        self.assertEqual(self.build(location='Earth, TX', days=10)['build'], 2)
+
+    def test_culled_generation_does_not_revive_old_contexts(self):
+        self.build(location='Lubbock')
+        invalidate_locations(['Lubbock'])
+        self.build(location='Lubbock')
+
+        caches[CACHE_ALIAS].delete(generation_key('Lubbock'))
+
+        self.assertEqual(self.build(location='Lubbock')['build'], 3)
+
+    def test_generation_key_is_safe_for_memcached(self):
+        key = generation_key('Earth, TX')
+
+        self.assertLessEqual(len(key), 250)
+        self.assertFalse(any(c.isspace() or c == ',' for c in key))
+
+
+class LocationPageTests(TestCase):
+    """ The location page is a shell whose charts load their series from the series API. """
+
+    missing_cycle = 30
+
+    def setUp(self):
+        scratch = tempfile.TemporaryDirectory()
+        self.addCleanup(scratch.cleanup)
+        settings_override = override_settings(
+            RADIATION_TABLE_DIR=scratch.name, CHART_MAX_POINTS=20,
+            CACHES={CACHE_ALIAS: {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                  'LOCATION': scratch.name}})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        ingest.last_seen.clear()
+        self.addCleanup(ingest.last_seen.clear)
+
+        self.station = station = copy.deepcopy(load_sample()['list'][0])
+        self.location = Location.objects.create(name=station['name'], site_id=str(station['id']),
+                                                latitude=station['coord']['lat'], longitude=station['coord']['lon'])
+        # One cycle in the middle of the range is missing its temperature and humidity readings.
+        now = int(time.time())
+        for k in reversed(range(60)):
+            cycle = copy.deepcopy(station)
+            cycle['dt'] = now - k * 1800
+            if k == self.missing_cycle:
+                del cycle['main']['temp'], cycle['main']['humidity']
+            response = {'message': 'accurate', 'cod': '200', 'count': 1, 'list': [cycle]}
+            load_observations(parse_stations(response).values(), units='imperial')
+
+    def test_page_does_not_embed_the_series(self):
+        response = self.client.get('/locations/', {'location': self.location.name})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'id="temphist"')
+        self.assertEqual(response.context['series_params'],
+                         {'url': '/locations/api/series', 'query': {'site': self.location.name, 'max_points': 20}})
+
+    def test_chart_series_from_the_api(self):
+        page = self.client.get('/locations/', {'location': self.location.name}).context
+        query = dict(page['series_params']['query'], fields='temphist,etohist')
+
+        data = self.client.get(page['series_params']['url'], query).json()
+
+        for field in ('temphist', 'etohist'):
+            self.assertEqual(len(data['series'][field]['values']), 20)
+            self.assertEqual(len(data['series'][field]['timestamps']), 20)
+        self.assertEqual(data['series']['temphist']['timestamps'][-1], page['timestamps'][-1])
+        self.assertAlmostEqual(sum(data['series']['etohist']['values']), np.nansum(page['etohist']), places=6)
+
+    def test_missing_reading_counts_as_zero_in_totals(self):
+        context = self.client.get('/locations/', {'location': self.location.name, 'gdu_base': '10',
+                                                  'gdu_max': '30'}).context
+
+        self.assertEqual(sum(math.isnan(value) for value in context['temphist']), 1)
+        self.assertFalse(any(math.isnan(value) for value in context['accum_etohist'] + context['accum_gduhist']))
+        # The charted values are rounded to 3 decimals each.
+        tolerance = 0.0005 * len(context['etohist'])
+        self.assertAlmostEqual(context['accum_etohist'][-1], context['current_eto_sum'], delta=tolerance)
+        self.assertAlmostEqual(context['accum_gduhist'][-1], context['current_gdu_sum'], delta=tolerance)
+
+    def test_etag(self):
+        params = {'location': self.location.name}
+        etag = self.client.get('/locations/', params)['ETag']
+
+        self.assertEqual(self.client.get('/locations/', params, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # A model change, values recomputed for the location, and a new observation each give a new page.
+        with mock.patch('locations.views.MODEL_VERSION', -1):
+            self.assertEqual(self.client.get('/locations/', params, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        invalidate_locations([self.location.name])
+        recomputed = self.client.get('/locations/', params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(recomputed.status_code, 200)
+
+        self.station['dt'] = int(time.time()) + 60
+        response = {'message': 'accurate', 'cod': '200', 'count': 1, 'list': [self.station]}
+        load_observations(parse_stations(response).values(), units='imperial')
+        ingested = self.client.get('/locations/', params, HTTP_IF_NONE_MATCH=recomputed['ETag'])
+        self.assertEqual(ingested.status_code, 200)
+        self.assertNotIn(ingested['ETag'], (etag, recomputed['ETag']))
+
+    def test_missing_reading_is_sent_as_null(self):
+        def reject(constant):
+            raise ValueError('{0} is not valid JSON'.format(constant))
+
+        for max_points in ('', '100'):
+            response = self.client.get('/locations/api/series', {'site': self.location.name, 'max_points': max_points})
+            data = json.loads(response.content, parse_constant=reject)
+
+            self.assertEqual(response.status_code, 200)
+            series = data['series']['temphist']
+            values = series if isinstance(series, list) else series['values']
+            self.assertEqual(values.count(None), 1)
+
+
+class MultiSiteTests(TestCase):
+    """ Several sites over one range from the sites API, read with a single query whatever the number of sites. """
+
+    missing_cycle = 2
+
+    def setUp(self):
+        scratch = tempfile.TemporaryDirectory()
+        self.addCleanup(scratch.cleanup)
+        settings_override = override_settings(RADIATION_TABLE_DIR=scratch.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        ingest.last_seen.clear()
+        self.addCleanup(ingest.last_seen.clear)
+
+        stations = copy.deepcopy(load_sample()['list'][:3])
+        self.locations = [Location.objects.create(name=st['name'], site_id=str(st['id']), latitude=st['coord']['lat'],
+                                                  longitude=st['coord']['lon']) for st in stations]
+        # The last station misses one whole polling cycle.
+        now = int(time.time()) // 1800 * 1800
+        for k in reversed(range(6)):
+            cycle = copy.deepcopy(stations)
+            for station in cycle:
+                station['dt'] = now - k * 1800
+            if k == self.missing_cycle:
+                cycle.pop()
+            response = {'message': 'accurate', 'cod': '200', 'count': len(cycle), 'list': cycle}
+            load_observations(parse_stations(response).values(), units='imperial')
+
+    def get(self, locations, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get('/locations/api/sites', {'site': ','.join(location.site_id
+                                                                                 for location in locations)})
+
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_one_query_for_the_observations(self):
+        # The locations, the check for underived observations and the observations themselves.
+        one = self.get(self.locations[:1], 3)
+        several = self.get(self.locations, 3)
+
+        self.assertEqual(len(several['sites']), 3)
+        self.assertEqual(several['timestamps'], one['timestamps'])
+        self.assertEqual(len(several['series']['eto']), 3)
+
+    def test_missing_period_is_null(self):
+        data = self.get(self.locations, 3)
+        row = data['site_ids'].index(self.locations[-1].site_id)
+
+        for field, values in data['series'].items():
+            self.assertEqual(values[row].count(None), 1, field)
+            self.assertIsNone(values[row][len(data['timestamps']) - 1 - self.missing_cycle], field)
+            self.assertFalse(any(None in site for i, site in enumerate(values) if i != row), field)
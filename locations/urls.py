@@ -4,4 +4,8 @@ from . import views
 app_name = 'locations'
 urlpatterns = [
     path('', views.index, name='index'),
+    path('api/series', views.series, name='series'),
+    path('api/sites', views.multi_site, name='multi_site'),
+    path('api/export', views.export, name='export'),
+    path('api/cache', views.cache_stats, name='cache_stats'),
 ]
@@ -1,26 +1,47 @@
+import calendar
+import hashlib
+import json
 import time
-from itertools import accumulate
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.urls import reverse
+from django.views.decorators.http import condition
 from locations.models import Location
-from metload.models import Obsset
-from datetime import datetime, timedelta
-from ETo_py.eto import EToEstimator
+from metload.models import LatestObservation
+from datetime import datetime, timedelta, timezone
+from metload.derived import DERIVED_FIELDS, MODEL_VERSION, model_parameters
+from metload.rollups import range_totals
+from metload.series import OBS_FIELDS, check_underived, fetch_matrix, fetch_series
+from metload.export import FORMATS, day_range, export_rows
+from locations.downsample import bucket_sums, lttb
+from locations.cache import cache_info, cached_context, location_generation
+from ETo_py.gdu import gdu_calc
+from ETo_py.eto_cache import eto_result_cache
+
+
+def date_range(selectstartdate, selectenddate):
+    """
+    Unix timestamps of a mm/dd/yyyy date range from the page, defaulting to the last ten days. Dates are UTC days,
+    the same days as the daily rollups, so the whole days of a range are read from the rollups.
+    """
 
+    if selectstartdate and selectenddate:
+        selectstartdate_tup = datetime.strptime(selectstartdate, "%m/%d/%Y").timetuple()
+        selectenddate_tup = datetime.strptime(selectenddate, "%m/%d/%Y").timetuple()
+        start_stamp = calendar.timegm(selectstartdate_tup)
+        end_stamp = calendar.timegm(selectenddate_tup)
 
-def gdu_calc(temp_c, gdu_base=15.6, gdu_max=38.0, day_fraction=(1/48)):
-    if temp_c > gdu_max:
-        temp_c = gdu_max
-
-    heat_units = temp_c - gdu_base
-
-    if heat_units < 0:
-        heat_units = 0
-
-    heat_units = heat_units * day_fraction
+    else:
+        end_stamp = time.time()
+        start_stamp = end_stamp - (10 * 24 * 60 * 60)
 
-    return heat_units
+    return start_stamp, end_stamp
 
 
+@cached_context
 def single_location(**kwargs):
 
     location = kwargs['location']
@@ -29,96 +50,82 @@ def single_location(**kwargs):
     gdu_base = kwargs['gdu_base']
     gdu_max = kwargs['gdu_max']
 
-    if selectstartdate and selectenddate:
-        selectstartdate_tup = datetime.strptime(selectstartdate, "%m/%d/%Y").timetuple()
-        selectenddate_tup = datetime.strptime(selectenddate, "%m/%d/%Y").timetuple()
-        start_stamp = time.mktime(selectstartdate_tup)
-        end_stamp = time.mktime(selectenddate_tup)
+    start_stamp, end_stamp = date_range(selectstartdate, selectenddate)
 
-        obsn_set = list(Obsset.objects.filter(site_name=location)
-                                      .filter(datetime__gte=start_stamp)
-                                      .filter(datetime__lte=end_stamp).order_by('datetime'))
+    # Observations ingested before derived values were stored at ingest are shown without ETo/GDU until
+    # recompute_derived has derived them.
+    location_id = Location.objects.filter(name=location).values_list('pk', flat=True).first()
+    check_underived([location_id], start_stamp, end_stamp)
 
-    else:
-        ten_days_ago = time.time() - (10 * 24 * 60 * 60)
-        obsn_set = list(Obsset.objects.filter(site_name=location)
-                                      .filter(datetime__gte=ten_days_ago).order_by('datetime'))
+    series = fetch_series(location, start_stamp, end_stamp, derived_fields=DERIVED_FIELDS + ('gdu',))
 
-    timestamps = [ob.datetime for ob in obsn_set]
-    dtme = [datetime.fromtimestamp(ob.datetime) for ob in obsn_set]
-    dtme = [datetime.strftime(dt, '%m-%d %H:%M') for dt in dtme]
-    temps = [float(ob.temperature) for ob in obsn_set]
-    temps_c = [(temp - 32) * (5 / 9) for temp in temps]
+    timestamps = series['datetime']
+    dtme = [datetime.strftime(datetime.fromtimestamp(stamp, timezone.utc), '%m-%d %H:%M')
+            for stamp in timestamps.tolist()]
+    # Observations are stored in metric units and shown in F and mph.
+    temps_c = series['temperature']
+    temps = temps_c * (9 / 5) + 32
 
     if gdu_base and gdu_max:
         gdu_base = float(gdu_base)
         gdu_max = float(gdu_max)
-        gdus = [gdu_calc(t, gdu_base=gdu_base, gdu_max=gdu_max) for t in temps_c]
+        gdus = gdu_calc(temps_c, gdu_base=gdu_base, gdu_max=gdu_max)
 
     else:
-        gdus = [gdu_calc(t) for t in temps_c]
-
-    current_gdu_sum = sum(gdus)
-    winds = [float(ob.wind_speed) for ob in obsn_set]
-    humiditys = [float(ob.humidity) for ob in obsn_set]
-    pressures = [float(ob.pressure) for ob in obsn_set]
-    rains_1h = [float(ob.rain_1h) for ob in obsn_set]
-    latitude = obsn_set[0].latitude
-    longitude = obsn_set[0].longitude
-    current_temp = temps[-1]
-    current_temp_c = temps_c[-1]
-    current_wind_speed = winds[-1]
-    current_humidity = humiditys[-1]
-    current_pressure = pressures[-1]
-
-    eto_estimate_instances = []
-    for (temp, wind, press, rh, tstmp) in zip(temps_c, winds, pressures, humiditys, timestamps):
-        current_obs = {
-            'latitude': float(latitude),
-            'longitude': float(longitude),
-            'air_temp': temp,
-            'air_temp_min': temp,
-            'air_temp_max': temp,
-            'wind_speed': wind * 0.44704,  # convert to meters per seconds
-            'relative_humidity': rh / 100,  # convert to a percentage
-            'pressure': press * .1,  # convert millibars to kPa
-            'period_length': 30,
-            'utc_offset': 0,
-            'print_switch': False,
-            'crop_height': 50,
-        }
+        gdus = series['gdu']
 
-        hist_eto_estimate = EToEstimator(**current_obs)
-        hist_eto_estimate.estimate_eto()
-        eto_estimate_instances.append(hist_eto_estimate)
+    # Whole days of the range come from the daily rollups, only the partial days at the edges are summed here.
+    totals = range_totals(location_id, start_stamp, end_stamp, series)
 
-    eto_estimate = eto_estimate_instances[-1]
+    if gdu_base and gdu_max:
+        current_gdu_sum = float(np.nansum(gdus))
+
+    else:
+        current_gdu_sum = totals['gdu']
+    winds = series['wind_speed'] / 0.44704
+    humiditys = series['humidity']
+    pressures = series['pressure']
+    rains_1h = series['rain_1h']
+    current_temp = float(temps[-1])
+    current_temp_c = float(temps_c[-1])
+    current_wind_speed = float(winds[-1])
+    current_humidity = float(humiditys[-1])
+    current_pressure = float(pressures[-1])
+
+    eto_hist = {field: series[field] for field in DERIVED_FIELDS}
+    etos = np.round(eto_hist['eto'], 3)
+    gdus = np.round(gdus, 3)
+
+    # Beginning and end of the latest thirty minute period in hours (0-24).
+    current_period_begin = (int(timestamps[-1]) % 86400) // 1800 / 2
 
     # Historical data
     context = dict()
     context['current_location'] = location
     context['selectstartdate'] = selectstartdate
     context['selectenddate'] = selectenddate
+    context['timestamps'] = timestamps.tolist()
     context['datetimehist'] = dtme
-    context['temphist'] = temps
-    context['temphist_c'] = temps_c
-    context['windhist'] = winds
-    context['presshist'] = pressures
-    context['rains_1hhist'] = rains_1h
-    context['gdushist'] = [round(n,3) for n in gdus]
-    context['etohist'] = [round(eto.eto,3) for eto in eto_estimate_instances]
-    context['etsolarradhist'] = [eto.r_a for eto in eto_estimate_instances]
-    context['solradhist'] = [eto.r_s for eto in eto_estimate_instances]
-    context['clearskyhist'] = [eto.r_so for eto in eto_estimate_instances]
-    context['shortwavehist'] = [eto.r_ns for eto in eto_estimate_instances]
-    context['satvaphist'] = [eto.e_deg_t for eto in eto_estimate_instances]
-    context['slopesatvaphist'] = [eto.d for eto in eto_estimate_instances]
-    context['actvaphist'] = [eto.e_a for eto in eto_estimate_instances]
-    context['psychroconsthist'] = [eto.y for eto in eto_estimate_instances]
-    context['netlonwavehist'] = [eto.r_n for eto in eto_estimate_instances]
-    context['soilheatfluxhist'] = [eto.g for eto in eto_estimate_instances]
-    context['accum_etohist'] = [round(i, 3) for i in accumulate(context['etohist'])]
-    context['accum_gduhist'] = [round(i, 3) for i in accumulate(context['gdushist'])]
+    context['temphist'] = temps.tolist()
+    context['temphist_c'] = temps_c.tolist()
+    context['windhist'] = winds.tolist()
+    context['presshist'] = pressures.tolist()
+    context['rains_1hhist'] = rains_1h.tolist()
+    context['gdushist'] = gdus.tolist()
+    context['etohist'] = etos.tolist()
+    context['etsolarradhist'] = eto_hist['r_a'].tolist()
+    context['solradhist'] = eto_hist['r_s'].tolist()
+    context['clearskyhist'] = eto_hist['r_so'].tolist()
+    context['shortwavehist'] = eto_hist['r_ns'].tolist()
+    context['satvaphist'] = eto_hist['e_deg_t'].tolist()
+    context['slopesatvaphist'] = eto_hist['d'].tolist()
+    context['actvaphist'] = eto_hist['e_a'].tolist()
+    context['psychroconsthist'] = eto_hist['y'].tolist()
+    context['netlonwavehist'] = eto_hist['r_n'].tolist()
+    context['soilheatfluxhist'] = eto_hist['g'].tolist()
+    # Missing values add nothing to the running totals, the same as in the daily rollups.
+    context['accum_etohist'] = np.round(np.nancumsum(etos), 3).tolist()
+    context['accum_gduhist'] = np.round(np.nancumsum(gdus), 3).tolist()
 
     # Current obs
     context['current_wind_speed'] = current_wind_speed
@@ -126,22 +133,22 @@ def single_location(**kwargs):
     context['current_temp_c'] = current_temp_c
     context['current_humidity'] = current_humidity
     context['current_pressure'] = current_pressure
-    context['current_period_begin'] = "{0:.1f}".format(eto_estimate.clock_at_beginning)
-    context['current_period_end'] = "{0:.1f}".format(eto_estimate.clock_at_end)
-    context['current_eto'] = round(eto_estimate.eto, 3)
-    context['current_et_solar_rad'] = round(eto_estimate.r_a, 3)
-    context['current_solar_rad'] = round(eto_estimate.r_s, 3)
-    context['current_clear_sky_rad'] = round(eto_estimate.r_so, 3)
-    context['current_shortwave_rad'] = round(eto_estimate.r_ns, 3)
-    context['current_sat_vap_pressure'] = round(eto_estimate.e_deg_t, 3)
-    context['current_slope_sat_vap_pressure'] = round(eto_estimate.d, 3)
-    context['current_actual_vapor_pressure'] = round(eto_estimate.e_a, 3)
-    context['psychrometric_constant'] = round(eto_estimate.y, 3)
-    context['net_longwave_radiation'] = round(eto_estimate.r_n, 3)
-    context['soil_heat_flux'] = round(eto_estimate.g, 3)
+    context['current_period_begin'] = "{0:.1f}".format(current_period_begin)
+    context['current_period_end'] = "{0:.1f}".format(current_period_begin + 0.5)
+    context['current_eto'] = round(float(eto_hist['eto'][-1]), 3)
+    context['current_et_solar_rad'] = round(float(eto_hist['r_a'][-1]), 3)
+    context['current_solar_rad'] = round(float(eto_hist['r_s'][-1]), 3)
+    context['current_clear_sky_rad'] = round(float(eto_hist['r_so'][-1]), 3)
+    context['current_shortwave_rad'] = round(float(eto_hist['r_ns'][-1]), 3)
+    context['current_sat_vap_pressure'] = round(float(eto_hist['e_deg_t'][-1]), 3)
+    context['current_slope_sat_vap_pressure'] = round(float(eto_hist['d'][-1]), 3)
+    context['current_actual_vapor_pressure'] = round(float(eto_hist['e_a'][-1]), 3)
+    context['psychrometric_constant'] = round(float(eto_hist['y'][-1]), 3)
+    context['net_longwave_radiation'] = round(float(eto_hist['r_n'][-1]), 3)
+    context['soil_heat_flux'] = round(float(eto_hist['g'][-1]), 3)
     context['current_gdu_sum'] = round(current_gdu_sum, 3)
-    context['current_eto_sum'] = round(sum(context['etohist']), 3)
-    context['current_rain_sum'] = round(sum(context['rains_1hhist']), 3)
+    context['current_eto_sum'] = round(totals['eto'], 3)
+    context['current_rain_sum'] = round(totals['rain'], 3)
     context['current_water_deficit'] = round((context['current_eto_sum']-context['current_rain_sum']), 3)
     context['gdu_base'] = gdu_base
     context['gdu_max'] = gdu_max
@@ -149,6 +156,262 @@ def single_location(**kwargs):
     return context
 
 
+# Chart series of the location page and how the series API downsamples each. Increments are summed per bucket so
+# totals are kept, the rest are thinned with LTTB, which keeps the first and last points of accumulated series exact.
+CHART_SERIES = {
+    'temphist': 'lttb',
+    'windhist': 'lttb',
+    'presshist': 'lttb',
+    'accum_etohist': 'lttb',
+    'accum_gduhist': 'lttb',
+    'etohist': 'sum',
+    'gdushist': 'sum',
+    'rains_1hhist': 'sum',
+}
+
+
+# Per-observation series of a single_location context that the series API can return.
+API_FIELDS = ('temphist', 'temphist_c', 'windhist', 'presshist', 'rains_1hhist', 'gdushist', 'etohist',
+              'accum_etohist', 'accum_gduhist', 'etsolarradhist', 'solradhist', 'clearskyhist', 'shortwavehist',
+              'satvaphist', 'slopesatvaphist', 'actvaphist', 'psychroconsthist', 'netlonwavehist', 'soilheatfluxhist')
+
+
+def json_values(values):
+    """ A float series as a list for a JSON response. NaN is not valid JSON, missing values are sent as null. """
+
+    values = np.asarray(values, dtype=float)
+
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+# Fields of the multi-site API, observations in metric units and derived values.
+MATRIX_FIELDS = OBS_FIELDS + ('eto', 'gdu')
+
+
+def series(request):
+    """
+    Columnar JSON of a site's history, computed by single_location. Query parameters:
+
+    site: Location name or OWM site_id
+    selectstartdate, selectenddate: range as mm/dd/yyyy, defaults to the last ten days
+    fields: comma separated names from API_FIELDS, defaults to all of them
+    gdu_base, gdu_max: custom GDU parameters
+    max_points: downsample each series to at most this many points, each series then has its own timestamps
+    """
+
+    site = request.GET.get('site')
+    fields = [f for f in request.GET.get('fields', '').split(',') if f] or list(API_FIELDS)
+    unknown = [f for f in fields if f not in API_FIELDS]
+
+    if unknown:
+        return JsonResponse({'error': 'unknown fields: {0}'.format(', '.join(unknown))}, status=400)
+
+    location = Location.objects.filter(Q(site_id=site) | Q(name=site)).values_list('name', flat=True).first()
+
+    if not site or location is None:
+        return JsonResponse({'error': 'unknown site: {0}'.format(site)}, status=404)
+
+    params = {
+        'location': location,
+        'selectstartdate': request.GET.get('selectstartdate'),
+        'selectenddate': request.GET.get('selectenddate'),
+        'gdu_base': request.GET.get('gdu_base'),
+        'gdu_max': request.GET.get('gdu_max'),
+    }
+
+    try:
+        max_points = int(request.GET['max_points']) if request.GET.get('max_points') else None
+        context = single_location(**params)
+
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    except IndexError:
+        return JsonResponse({'error': 'no observations for {0} in range'.format(location)}, status=404)
+
+    totals = ('current_gdu_sum', 'current_eto_sum', 'current_rain_sum', 'current_water_deficit')
+    data = {
+        'site': location,
+        'totals': dict(zip(totals, json_values([context[key] for key in totals]))),
+    }
+
+    if max_points is None:
+        data['timestamps'] = context['timestamps']
+        data['series'] = {field: json_values(context[field]) for field in fields}
+
+    else:
+        timestamps = np.asarray(context['timestamps'])
+        data['series'] = {}
+        for field in fields:
+            if CHART_SERIES.get(field) == 'sum':
+                indices, values = bucket_sums(context[field], max_points)
+                values = np.round(values, 3)
+
+            else:
+                indices = lttb(timestamps, context[field], max_points)
+                values = np.asarray(context[field], dtype=float)[indices]
+
+            data['series'][field] = {'timestamps': timestamps[indices].tolist(), 'values': json_values(values)}
+
+    return JsonResponse(data)
+
+
+def multi_site(request):
+    """
+    Several sites over one date range as a site x time matrix per field, read with a single query. Observations are
+    placed in thirty minute periods and missing periods are null. Query parameters:
+
+    site: Location name or OWM site_id, may be repeated or comma separated
+    selectstartdate, selectenddate: range as mm/dd/yyyy, defaults to the last ten days
+    fields: comma separated names from MATRIX_FIELDS, defaults to all of them
+    gdu_base, gdu_max: custom GDU parameters
+    """
+
+    sites = [site for value in request.GET.getlist('site') for site in value.split(',') if site]
+    fields = [f for f in request.GET.get('fields', '').split(',') if f] or list(MATRIX_FIELDS)
+    unknown = [f for f in fields if f not in MATRIX_FIELDS]
+
+    if unknown:
+        return JsonResponse({'error': 'unknown fields: {0}'.format(', '.join(unknown))}, status=400)
+
+    locations = list(Location.objects.filter(Q(site_id__in=sites) | Q(name__in=sites)).order_by('name'))
+
+    if not locations:
+        return JsonResponse({'error': 'unknown site: {0}'.format(', '.join(sites))}, status=404)
+
+    try:
+        start_stamp, end_stamp = date_range(request.GET.get('selectstartdate'), request.GET.get('selectenddate'))
+        gdu_params = {key: float(request.GET[key]) for key in ('gdu_base', 'gdu_max') if request.GET.get(key)}
+
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    if gdu_params:
+        gdu_params = {key: gdu_params.get(key, model_parameters()[key]) for key in ('gdu_base', 'gdu_max')}
+
+    obs_fields = [f for f in fields if f in OBS_FIELDS]
+    if gdu_params and 'gdu' in fields and 'temperature' not in obs_fields:
+        obs_fields.append('temperature')
+
+    timestamps, matrix = fetch_matrix(locations, start_stamp, end_stamp, fields=obs_fields,
+                                      derived_fields=[f for f in fields if f not in OBS_FIELDS],
+                                      gdu_params=gdu_params or None)
+
+    data = {
+        'sites': [location.name for location in locations],
+        'site_ids': [location.site_id for location in locations],
+        'timestamps': timestamps.tolist(),
+        'series': {field: json_values(np.round(matrix[field], 3)) for field in fields},
+    }
+
+    return JsonResponse(data)
+
+
+def export(request):
+    """
+    Stream the raw observations of one or more sites with their ETo and GDU as CSV or NDJSON. Query parameters:
+
+    site: Location name or OWM site_id, may be repeated or comma separated
+    selectstartdate, selectenddate: first and last day (inclusive) as mm/dd/yyyy, defaults to the last ten days
+    format: csv (default) or ndjson
+    gdu_base, gdu_max: custom GDU parameters
+    """
+
+    sites = [site for value in request.GET.getlist('site') for site in value.split(',') if site]
+    export_format = request.GET.get('format', 'csv')
+
+    if export_format not in FORMATS:
+        return JsonResponse({'error': 'unknown format: {0}'.format(export_format)}, status=400)
+
+    locations = list(Location.objects.filter(Q(site_id__in=sites) | Q(name__in=sites)))
+
+    if not locations:
+        return JsonResponse({'error': 'unknown site: {0}'.format(', '.join(sites))}, status=404)
+
+    selectstartdate = request.GET.get('selectstartdate')
+    selectenddate = request.GET.get('selectenddate')
+
+    params = model_parameters()
+    try:
+        # The last day is included, the same as the export_observations command.
+        if selectstartdate and selectenddate:
+            start_stamp, end_stamp = day_range(selectstartdate, selectenddate, '%m/%d/%Y')
+        else:
+            start_stamp, end_stamp = date_range(None, None)
+
+        params.update({key: float(request.GET[key]) for key in ('gdu_base', 'gdu_max') if request.GET.get(key)})
+
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    lines, content_type = FORMATS[export_format]
+    response = StreamingHttpResponse(lines(export_rows(locations, start_stamp, end_stamp, params)),
+                                     content_type=content_type)
+    response['Content-Disposition'] = 'attachment; filename="observations.{0}"'.format(export_format)
+
+    return response
+
+
+def cache_stats(request):
+    """ Hit and miss counters of the location context cache and the ETo result cache in this process. """
+
+    return JsonResponse(dict(cache_info(), eto_results=eto_result_cache.info()))
+
+
+def latest_observation_stamp(request):
+    """
+    The newest ingested observation time behind a page, from the LatestObservation table: the requested site for a
+    location page, all sites for the map. Looked up once per request.
+    """
+
+    if not hasattr(request, '_latest_observation_stamp'):
+        location = request.GET.get('location')
+
+        if location is not None:
+            stamp = LatestObservation.objects.filter(location__name=location).aggregate(Max('datetime'))
+        else:
+            stamp = Location.objects.aggregate(Max('latest_observation__datetime'), Count('pk'))
+
+        request._latest_observation_stamp = stamp
+
+    return request._latest_observation_stamp
+
+
+def page_window(request):
+    """ Start of the current thirty minute period for pages that show the last ten days, None for fixed ranges. """
+
+    if request.GET.get('selectstartdate') and request.GET.get('selectenddate'):
+        return None
+
+    return int(time.time() // 1800) * 1800
+
+
+def page_etag(request):
+    """
+    Pages are determined by the newest observation of the sites shown, the query parameters, the model parameters and
+    version, and for a location page the cache generation of the location, which changes whenever its stored values
+    are recomputed or replaced. Pages without a fixed date range cover the last ten days and also change with each
+    thirty minute period as old observations leave the window.
+    """
+
+    location = request.GET.get('location')
+    generation = location_generation(location) if location is not None else None
+
+    raw = json.dumps([latest_observation_stamp(request), sorted(request.GET.items()), page_window(request),
+                      model_parameters(), MODEL_VERSION, generation, settings.CHART_MAX_POINTS], sort_keys=True,
+                     default=str)
+
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def page_last_modified(request):
+    stamps = [value for key, value in latest_observation_stamp(request).items() if key.endswith('__max')]
+    stamps = [stamp for stamp in stamps + [page_window(request)] if stamp is not None]
+
+    return datetime.fromtimestamp(max(stamps), timezone.utc) if stamps else None
+
+
+@condition(etag_func=page_etag, last_modified_func=page_last_modified)
 def index(request):
 
     location = request.GET.get('location', None)
@@ -170,7 +433,13 @@ def index(request):
     # Single Location.
     if location is not None:
 
+        # The page is a light shell with the current values and totals. Each chart fetches its series from the series
+        # API once it is shown, the context is cached so those requests reuse this computation.
         context = single_location(**params)
+        query = dict(params, site=location, max_points=settings.CHART_MAX_POINTS)
+        del query['location']
+        context = dict(context, series_params={'url': reverse('locations:series'),
+                                               'query': {key: value for key, value in query.items() if value}})
 
         return render(request, 'locations/location.html', context)
 
@@ -178,22 +447,14 @@ def index(request):
     else:
         # Get locations from db.
         locations = Location.objects.all()
-        selectstartdate_tup = datetime.now() - timedelta(days=10)
-        selectenddate_tup = datetime.now()
-        start_stamp = time.mktime(selectstartdate_tup.timetuple())
-        end_stamp = time.mktime(selectenddate_tup.timetuple())
-
-        # Prepare current temp data for google map layer js.
-        obs_sets = []
-        for loc in locations:
-            print(loc)
-            observations = Obsset.objects.filter(location=loc).filter(datetime__gte=start_stamp). \
-                filter(datetime__lte=end_stamp).order_by('datetime')
-            observations = list(observations)
-            temps = [float(ob.temperature) for ob in observations]
-            temp = temps[-1]
-            info_dict = {'temp': temp, 'loc': loc.name}
-            obs_sets.append(info_dict)
+        start_stamp = time.mktime((datetime.now() - timedelta(days=10)).timetuple())
+
+        # Prepare current temp data for google map layer js. Sites without an observation in the last ten days are
+        # left off the map.
+        latest = LatestObservation.objects.filter(datetime__gte=start_stamp).select_related('location') \
+                                          .order_by('location_id')
+        obs_sets = [{'temp': None if ob.temperature is None else ob.temperature * (9 / 5) + 32, 'loc': ob.location.name}
+                    for ob in latest]
 
         # Prepare locations dictionary for google map layer js.
         locs_ls = []
@@ -108,6 +108,25 @@ DATABASES = {
     }
 }
 
+# Cache
+# Rendered location contexts are cached in their own cache, see locations.cache. Ingest runs in its own process
+# (manage.py runingest) and invalidates entries through this cache, so it must be shared by every process: a
+# FileBasedCache directory here, or memcached or Redis. A per-process LocMemCache would leave pages stale.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'locations': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'locations'),
+        'TIMEOUT': 30 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 256,
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
@@ -149,3 +168,40 @@ STATIC_ROOT = os.path.join(BASE_DIR, '/static/')
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static/')
 ]
+
+# Precomputed extraterrestrial radiation tables, one memory-mapped file per location.
+RADIATION_TABLE_DIR = os.path.join(BASE_DIR, 'radiation_tables')
+
+# Open Weather Map find endpoint and the region centres polled on every ingest, each returns up to 50 stations.
+OWM_FIND_URL = 'https://api.openweathermap.org/data/2.5/find'
+OWM_REGION_CENTRES = [
+    (33.577862, -101.855171),  # Lubbock
+]
+
+# Region centres planned by manage.py plan_tiles, used in place of OWM_REGION_CENTRES once saved.
+OWM_TILE_PLAN = os.path.join(BASE_DIR, 'owm_tiles.json')
+
+# Find requests allowed per minute by the OWM plan, and the seconds over which a poll's requests are spread.
+OWM_REQUESTS_PER_MINUTE = 60
+OWM_POLL_SPREAD = 0
+
+# Every raw find response is appended to a compressed file per UTC day under OWM_ARCHIVE_DIR, see
+# manage.py replay_archive. OWM_ARCHIVE_DIR = None turns the archive off, 'zstd' needs the zstandard package.
+OWM_ARCHIVE_DIR = os.path.join(BASE_DIR, 'owm_archive')
+OWM_ARCHIVE_COMPRESSION = 'gzip'
+
+# OWM APPID read by manage.py runingest.
+OWM_API_KEY_FILE = '/home/will/crop-modeling-site/metload/owm_api_key.txt'
+
+# manage.py runingest schedule: runs at multiples of INGEST_INTERVAL seconds plus up to INGEST_JITTER seconds.
+INGEST_INTERVAL = 1800
+INGEST_JITTER = 60
+
+# Held for the duration of an ingest cycle so runs never overlap.
+INGEST_LOCK_FILE = os.path.join(BASE_DIR, 'ingest.lock')
+
+# Keep the metload URL as an optional trigger for ingest alongside manage.py runingest.
+INGEST_HTTP_TRIGGER = True
+
+# Maximum number of points drawn per chart on the location page.
+CHART_MAX_POINTS = 1000
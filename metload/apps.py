@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class MetloadConfig(AppConfig):
     name = 'metload'
+
+    def ready(self):
+        from metload import checks, derived  # noqa: F401, registers the system checks and signal handlers
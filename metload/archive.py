@@ -0,0 +1,222 @@
+import gzip
+import io
+import json
+import logging
+import os
+from datetime import date, datetime, timedelta, timezone
+from itertools import groupby
+from django.conf import settings
+from django.db import transaction
+from locations.cache import invalidate_locations
+from locations.models import Location
+from metload import ingest
+from metload.fetcher import TileResult, merge_regions
+from metload.ingest import load_observations
+from metload.models import Obsset
+from metload.owm_parse import parse_stations
+from metload.rollups import rebuild_daily_rollups
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger()
+
+EXTENSIONS = {'gzip': '.jsonl.gz', 'zstd': '.jsonl.zst'}
+
+
+def archive_path(day, directory=None, compression=None):
+    """ Archive file of a UTC day, <directory>/<year>/<month>/owm-<date>.jsonl.gz (or .zst). """
+
+    directory = directory or settings.OWM_ARCHIVE_DIR
+    compression = compression or settings.OWM_ARCHIVE_COMPRESSION
+
+    return os.path.join(directory, '{0:%Y}'.format(day), '{0:%m}'.format(day),
+                        'owm-{0:%Y-%m-%d}{1}'.format(day, EXTENSIONS[compression]))
+
+
+def append_lines(path, lines, compression):
+    """
+    Append lines to a compressed file as a new gzip member or zstd frame. Both formats read back a file of several
+    members or frames as one stream, so a day's file grows one poll at a time without being rewritten.
+    """
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = ''.join(line + '\n' for line in lines).encode()
+
+    with open(path, 'ab') as f:
+        if compression == 'zstd':
+            if zstandard is None:
+                raise ImportError('zstd archives need the zstandard package')
+            f.write(zstandard.ZstdCompressor(level=10).compress(data))
+        else:
+            f.write(gzip.compress(data, compresslevel=6))
+
+
+def archive_responses(results, units, polled_at, directory=None, compression=None):
+    """
+    Append the raw responses of a poll to the archive, one JSON line per find request.
+
+    :param results: TileResult list, failed requests are left out
+    :param units: units the requests were made in
+    :param polled_at: unix timestamp of the poll, shared by all of its responses
+    :param directory: archive root, defaults to settings.OWM_ARCHIVE_DIR
+    :param compression: 'gzip' or 'zstd', defaults to settings.OWM_ARCHIVE_COMPRESSION
+    :return: number of responses archived
+    """
+
+    compression = compression or settings.OWM_ARCHIVE_COMPRESSION
+    lines = {}
+
+    for result in results:
+        if result.data is None:
+            continue
+
+        requested_at = result.request_time.timestamp() if result.request_time else polled_at
+        day = datetime.fromtimestamp(polled_at, timezone.utc).date()
+        lines.setdefault(day, []).append(json.dumps({
+            'polled_at': polled_at,
+            'requested_at': requested_at,
+            'centre': list(result.centre),
+            'units': units,
+            'response': result.data,
+        }, separators=(',', ':')))
+
+    for day, day_lines in lines.items():
+        append_lines(archive_path(day, directory, compression), day_lines, compression)
+
+    return sum(len(day_lines) for day_lines in lines.values())
+
+
+def open_lines(path):
+    if path.endswith(EXTENSIONS['zstd']):
+        if zstandard is None:
+            raise ImportError('Reading {0} needs the zstandard package'.format(path))
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True,
+                                                             closefd=True)
+        return io.TextIOWrapper(reader, encoding='utf-8')
+
+    return gzip.open(path, 'rt', encoding='utf-8')
+
+
+def read_archive(start_day, end_day, directory=None):
+    """
+    Stream archived responses of a range of UTC days in the order they were written.
+
+    :param start_day: first day, datetime.date
+    :param end_day: last day (inclusive), datetime.date
+    :param directory: archive root, defaults to settings.OWM_ARCHIVE_DIR
+    :return: generator of archive records, dictionaries with polled_at, requested_at, centre, units and response
+    """
+
+    day = start_day
+    while day <= end_day:
+        for compression in EXTENSIONS:
+            path = archive_path(day, directory, compression)
+
+            if not os.path.exists(path):
+                continue
+
+            with open_lines(path) as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+        day += timedelta(days=1)
+
+
+def archived_days(directory=None):
+    """ First and last day in the archive, or None when it is empty. """
+
+    directory = directory or settings.OWM_ARCHIVE_DIR
+    days = []
+
+    for _, _, files in os.walk(directory):
+        for name in files:
+            if name.startswith('owm-'):
+                days.append(date.fromisoformat(name[4:14]))
+
+    return (min(days), max(days)) if days else None
+
+
+def replace_stored(stations):
+    """
+    Delete the stored observations that a replayed poll holds again, along with their derived rows, so that they are
+    loaded from the archive anew.
+
+    :param stations: parsed station dictionaries of one poll
+    :return: location id of each deleted observation
+    """
+
+    keys = {(str(obs['site_id']), obs['datetime']) for obs in stations}
+
+    if not keys:
+        return []
+
+    rows = Obsset.objects.filter(site_id__in={site_id for site_id, _ in keys},
+                                 datetime__gte=min(stamp for _, stamp in keys),
+                                 datetime__lte=max(stamp for _, stamp in keys)) \
+                         .values_list('pk', 'site_id', 'datetime', 'location_id')
+    stored = [(pk, site_id, location_id) for pk, site_id, stamp, location_id in rows if (site_id, stamp) in keys]
+
+    Obsset.objects.filter(pk__in=[pk for pk, _, _ in stored]).delete()
+
+    # The ingest cache of last seen stations would otherwise skip a deleted observation that was a station's newest.
+    for _, site_id, _ in stored:
+        ingest.last_seen.pop(site_id, None)
+
+    return [location_id for _, _, location_id in stored]
+
+
+def replay(records, batch_size=8, replace=False):
+    """
+    Load archived responses through the parser and bulk loader. Responses of one poll are merged like a live cycle and
+    stored with their own ObsPoll, batch_size polls are written per transaction.
+
+    By default observations already stored are skipped, so replaying a range again, or one that overlaps live ingest,
+    only fills in what is missing. With replace the stored observations of each poll are deleted and loaded again,
+    e.g. after a parser fix, and the daily rollups of the locations involved are rebuilt once the replay is done.
+
+    :param records: archive records from read_archive, in the order they were written
+    :param batch_size: number of polls loaded per transaction
+    :param replace: reload observations that are already stored
+    :return: numbers of responses, polls, stored and replaced observations
+    """
+
+    totals = {'responses': 0, 'polls': 0, 'observations': 0, 'replaced': 0}
+    replaced_locations = set()
+    batch = []
+
+    def load_batch():
+        with transaction.atomic():
+            for polled_at, units, stations in batch:
+                if replace:
+                    deleted = replace_stored(stations)
+                    totals['replaced'] += len(deleted)
+                    replaced_locations.update(deleted)
+
+                observations, _ = load_observations(stations, units=units,
+                                                    requested_at=datetime.fromtimestamp(polled_at, timezone.utc))
+                totals['observations'] += len(observations)
+
+    for (polled_at, units), poll in groupby(records, key=lambda record: (record['polled_at'], record['units'])):
+        results = [TileResult(tuple(record['centre']), record['response'], None, None) for record in poll]
+        totals['responses'] += len(results)
+        totals['polls'] += 1
+
+        # Regions of a poll overlap, each station is kept once per poll.
+        batch.append((polled_at, units, list(merge_regions(results, parse_stations).values())))
+
+        if len(batch) >= batch_size:
+            load_batch()
+            batch = []
+
+    if batch:
+        load_batch()
+
+    for location in Location.objects.filter(pk__in=replaced_locations):
+        rebuild_daily_rollups(location.pk)
+        invalidate_locations([location.name])
+
+    return totals
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+# Backends whose entries only live in the process that wrote them.
+PROCESS_LOCAL_BACKENDS = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+@register()
+def location_cache_shared(app_configs, **kwargs):
+    """
+    Ingest commits observations in the runingest process and drops the cached location pages from there, which only
+    reaches the web workers if they share the cache.
+    """
+
+    from locations.cache import CACHE_ALIAS
+
+    backend = settings.CACHES.get(CACHE_ALIAS, {}).get('BACKEND')
+
+    if backend in PROCESS_LOCAL_BACKENDS:
+        return [Warning(
+            'The {0!r} cache uses {1}, which is not shared between processes.'.format(CACHE_ALIAS, backend),
+            hint='Location pages cached by the web workers are not invalidated by manage.py runingest. Use a shared '
+                 'backend such as FileBasedCache, memcached or Redis.',
+            id='metload.W001',
+        )]
+
+    return []
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import logging
+import math
+import threading
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from locations.cache import invalidate_locations
+from locations.models import Location
+from locations.radiation import get_radiation_table
+from metload.models import Obsset, DerivedObs
+from metload.rollups import rebuild_daily_rollups
+from ETo_py.eto_batch import EToBatch
+from ETo_py.eto_cache import eto_result_cache
+from ETo_py.gdu import gdu_calc
+
+logger = logging.getLogger()
+
+DERIVED_FIELDS = ('r_a', 'r_s', 'r_so', 'r_ns', 'e_deg_t', 'd', 'e_a', 'y', 'r_n', 'g', 'eto')
+
+# Raised whenever a change to the models alters derived values, so that rows stored before it are recomputed.
+# 2: soil heat flux split into day and night by each observation's own sunrise and sunset.
+# 3: day of year taken from each observation instead of the day the values were derived.
+# 4: solar time of the radiation terms taken from the site longitude instead of a fixed Central time meridian.
+MODEL_VERSION = 4
+
+
+def model_parameters():
+    """ ETo and GDU model parameters, FAO-56 defaults overridden by settings.ETO_MODEL_PARAMETERS. """
+
+    params = {
+        'albedo': 0.23,
+        'a_s': 0.25,
+        'b_s': 0.5,
+        'gdu_base': 15.6,
+        'gdu_max': 38.0,
+    }
+    params.update(getattr(settings, 'ETO_MODEL_PARAMETERS', {}))
+
+    return params
+
+
+def model_fingerprint(location, params=None):
+    """
+    A digest of everything that goes into the derived values for a location. Rows stored with a different
+    fingerprint are out of date and get recomputed.
+
+    :param location: Location instance
+    :param params: model parameters, defaults to model_parameters()
+    :return: hex digest
+    """
+
+    params = dict(params or model_parameters(), latitude=location.latitude, longitude=location.longitude,
+                  elevation=location.elevation, version=MODEL_VERSION)
+
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+
+def derive_columns(location, latitude, longitude, temperature, wind_speed, humidity, pressure, timestamps,
+                   params=None, sunrise=None, sunset=None):
+    """
+    Run the ETo and GDU models over column arrays of observations from a single location. ETo results are served
+    from the shared ETo_py.eto_cache where the same inputs have been evaluated before.
+
+    Readings are stored as NULL where the station did not report them, None or NaN in any column gives NaN for the
+    values that depend on it rather than failing the whole set.
+
+    :param location: Location instance, for its elevation and radiation table
+    :param latitude: station latitude in decimal degrees, defaults to the location's when None
+    :param longitude: station longitude in decimal degrees, defaults to the location's when None
+    :param temperature: air temperature [C]
+    :param wind_speed: wind speed [m s^-1]
+    :param humidity: relative humidity [%]
+    :param pressure: atmospheric pressure [hPa]
+    :param timestamps: unix timestamps of the observations
+    :param params: model parameters, defaults to model_parameters()
+    :param sunrise: stored sunrise of each observation's day, unix timestamps, computed where missing
+    :param sunset: stored sunset of each observation's day, unix timestamps, computed where missing
+    :return: dictionary of arrays keyed by DERIVED_FIELDS and gdu
+    """
+
+    params = params or model_parameters()
+    latitude = location.latitude if latitude is None else latitude
+    longitude = location.longitude if longitude is None else longitude
+    temperature, wind_speed, humidity, pressure = (np.array(column, dtype=float)
+                                                   for column in (temperature, wind_speed, humidity, pressure))
+
+    eto_batch = EToBatch(latitude=latitude, longitude=longitude, elevation=location.elevation,
+                         radiation_table=get_radiation_table(location), albedo=params['albedo'], a_s=params['a_s'],
+                         b_s=params['b_s'], period_length=30, utc_offset=0)
+    columns = eto_result_cache.estimate(
+        eto_batch,
+        air_temp=temperature,
+        wind_speed=wind_speed,
+        relative_humidity=humidity / 100,  # convert to a percentage
+        pressure=pressure * .1,  # convert millibars to kPa
+        timestamps=timestamps,
+        sunrise=None if sunrise is None else np.array(sunrise, dtype=float),
+        sunset=None if sunset is None else np.array(sunset, dtype=float),
+    )
+    columns['gdu'] = gdu_calc(temperature, gdu_base=params['gdu_base'], gdu_max=params['gdu_max'])
+
+    return columns
+
+
+def stored_value(value):
+    return None if math.isnan(value) else float(value)
+
+
+def derive_observations(observations, params=None):
+    """
+    Run the ETo and GDU models over a set of observations, which may span several locations.
+
+    :param observations: Obsset instances with their location loaded
+    :param params: model parameters, defaults to model_parameters()
+    :return: unsaved DerivedObs instances in the same order as observations
+    """
+
+    params = params or model_parameters()
+
+    by_site = {}
+    for ob in observations:
+        by_site.setdefault(ob.location_id, []).append(ob)
+
+    derived = {}
+    for site_obs in by_site.values():
+        site = site_obs[0].location
+        fingerprint = model_fingerprint(site, params)
+
+        columns = derive_columns(
+            site, site_obs[0].latitude, site_obs[0].longitude,
+            temperature=[ob.temperature for ob in site_obs],
+            wind_speed=[ob.wind_speed for ob in site_obs],
+            humidity=[ob.humidity for ob in site_obs],
+            pressure=[ob.pressure for ob in site_obs],
+            timestamps=[ob.datetime for ob in site_obs],
+            params=params,
+            sunrise=[ob.sunrise for ob in site_obs],
+            sunset=[ob.sunset for ob in site_obs],
+        )
+
+        # Values left undefined by a missing reading are stored as NULL, like the reading itself.
+        for i, ob in enumerate(site_obs):
+            values = {field: stored_value(columns[field][i]) for field in DERIVED_FIELDS + ('gdu',)}
+            derived[ob.pk] = DerivedObs(obs=ob, location_id=ob.location_id, datetime=ob.datetime,
+                                        fingerprint=fingerprint, **values)
+
+    return [derived[ob.pk] for ob in observations]
+
+
+def recompute_stale_derived(location_ids=None, chunk_size=2000):
+    """
+    Recompute derived rows whose fingerprint no longer matches the current model parameters, along with any
+    observations that were never derived. Rows that are already current are left alone, the daily rollups of any
+    location that changed are rebuilt.
+
+    :param location_ids: restrict the refresh to these locations, defaults to all
+    :param chunk_size: number of observations recomputed per transaction
+    :return: number of rows recomputed
+    """
+
+    params = model_parameters()
+    locations = Location.objects.all()
+
+    if location_ids is not None:
+        locations = locations.filter(pk__in=location_ids)
+
+    recomputed = 0
+    for site in locations:
+        fingerprint = model_fingerprint(site, params)
+        stale_ids = list(Obsset.objects.filter(location=site).exclude(derived__fingerprint=fingerprint)
+                                       .order_by('datetime').values_list('pk', flat=True))
+
+        for start in range(0, len(stale_ids), chunk_size):
+            chunk_ids = stale_ids[start:start + chunk_size]
+            observations = list(Obsset.objects.filter(pk__in=chunk_ids).order_by('datetime'))
+            for ob in observations:
+                ob.location = site
+
+            with transaction.atomic():
+                DerivedObs.objects.filter(obs_id__in=chunk_ids).delete()
+                DerivedObs.objects.bulk_create(derive_observations(observations, params))
+
+            recomputed += len(chunk_ids)
+
+        if stale_ids:
+            rebuild_daily_rollups(site.pk)
+            invalidate_locations([site.name])
+            logger.warning('[INFO] Recomputed {0} derived observations for {1}'.format(len(stale_ids), site))
+
+    return recomputed
+
+
+def recompute_in_background(location_ids=None):
+    """ Run recompute_stale_derived on a daemon thread so that the caller does not wait on it. """
+
+    def run():
+        try:
+            recompute_stale_derived(location_ids)
+
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=run, name='recompute-derived', daemon=True)
+    thread.start()
+
+    return thread
+
+
+@receiver(post_save, sender=Location)
+def location_model_inputs_changed(sender, instance, created=False, raw=False, **kwargs):
+    # The flag is set by locations.radiation when the coordinates or elevation of an existing location change.
+    if not created and not raw and getattr(instance, '_radiation_table_stale', False):
+        transaction.on_commit(lambda: recompute_in_background([instance.pk]))
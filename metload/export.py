@@ -0,0 +1,107 @@
+import calendar
+import csv
+import json
+import math
+from datetime import datetime
+from itertools import groupby, islice
+from metload.models import Obsset
+from metload.derived import derive_columns, model_parameters
+
+OBS_COLUMNS = ('site_id', 'site_name', 'datetime', 'latitude', 'longitude', 'temperature', 'pressure', 'humidity',
+               'temp_min', 'temp_max', 'wind_speed', 'wind_dir', 'wind_gust', 'rain_1h', 'rain_3h', 'snow', 'clouds')
+DERIVED_COLUMNS = ('eto', 'gdu')
+COLUMNS = OBS_COLUMNS + DERIVED_COLUMNS
+CHUNK_SIZE = 2000
+
+
+def day_range(first_day, last_day, date_format='%Y-%m-%d'):
+    """
+    Unix timestamps of an export range given as days: from UTC midnight of the first day through the last second
+    of the last day, so that both days are included. Days are UTC days like those of the daily rollups.
+
+    :param first_day: first day of the range as a string in date_format
+    :param last_day: last day of the range (inclusive) as a string in date_format
+    :param date_format: strptime format of the days
+    :return: range start and end (inclusive), unix timestamps
+    """
+
+    start_stamp = calendar.timegm(datetime.strptime(first_day, date_format).timetuple())
+    end_stamp = calendar.timegm(datetime.strptime(last_day, date_format).timetuple()) + 86400 - 1
+
+    return start_stamp, end_stamp
+
+
+class Echo:
+    """ A file-like object that returns what is written to it, so csv.writer can feed a streaming response. """
+
+    def write(self, value):
+        return value
+
+
+def export_rows(locations, start_stamp, end_stamp, params=None, chunk_size=CHUNK_SIZE):
+    """
+    Stream the observations of one or more locations with their ETo and GDU. Rows are read through a server-side
+    cursor and the models are run chunk by chunk, so memory use does not depend on the length of the range.
+
+    :param locations: Location instances
+    :param start_stamp: range start, unix timestamp
+    :param end_stamp: range end (inclusive), unix timestamp
+    :param params: model parameters, defaults to model_parameters()
+    :param chunk_size: number of rows read and derived at a time
+    :return: generator of row tuples ordered like COLUMNS
+    """
+
+    params = params or model_parameters()
+    by_id = {location.pk: location for location in locations}
+
+    rows = Obsset.objects.filter(location__in=by_id.keys(), datetime__gte=start_stamp, datetime__lte=end_stamp) \
+                         .order_by('location', 'datetime').values_list('location_id', *OBS_COLUMNS) \
+                         .iterator(chunk_size=chunk_size)
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+
+        for location_id, site_rows in groupby(chunk, key=lambda row: row[0]):
+            site_rows = [row[1:] for row in site_rows]
+            columns = dict(zip(OBS_COLUMNS, zip(*site_rows)))
+            derived = derive_columns(
+                by_id[location_id], columns['latitude'][0], columns['longitude'][0],
+                temperature=columns['temperature'],
+                wind_speed=columns['wind_speed'],
+                humidity=columns['humidity'],
+                pressure=columns['pressure'],
+                timestamps=columns['datetime'],
+                params=params,
+            )
+
+            for row, eto, gdu in zip(site_rows, derived['eto'].tolist(), derived['gdu'].tolist()):
+                yield row + (eto, gdu)
+
+
+def clean(value):
+    return None if isinstance(value, float) and math.isnan(value) else value
+
+
+def csv_lines(rows):
+    """ CSV text of export rows, one line at a time, starting with the header. """
+
+    writer = csv.writer(Echo())
+    yield writer.writerow(COLUMNS)
+
+    for row in rows:
+        yield writer.writerow(['' if value is None else value for value in map(clean, row)])
+
+
+def ndjson_lines(rows):
+    """ One JSON object per export row and line. """
+
+    for row in rows:
+        yield json.dumps(dict(zip(COLUMNS, map(clean, row)))) + '\n'
+
+
+FORMATS = {
+    'csv': (csv_lines, 'text/csv'),
+    'ndjson': (ndjson_lines, 'application/x-ndjson'),
+}
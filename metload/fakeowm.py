@@ -0,0 +1,193 @@
+import ast
+import copy
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+from metload.tiling import Station
+
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sample_region_response.json')
+FIND_PATH = '/data/2.5/find'
+
+
+def load_sample(path=SAMPLE_PATH):
+    """ The stations of a saved find response, sample_region_response.json holds the repr of the decoded JSON. """
+
+    with open(path) as f:
+        data = json.load(f)
+
+    return ast.literal_eval(data) if isinstance(data, str) else data
+
+
+class FakeOWM:
+    """
+    Stand-in for the OWM find endpoint built from a saved response. The sample stations are repeated on a grid until
+    there are as many as asked for, a find request returns the ones nearest its centre with their readings perturbed.
+    Observation times follow the wall clock, or a fixed clock that only moves when advanced so that load tests control
+    when a new observation is due.
+
+    :param stations: number of stations, the first ones are the sample stations unchanged
+    :param latency: seconds each response is delayed by
+    :param error_rate: fraction of requests answered with error_status
+    :param error_status: HTTP status of failed requests
+    :param duplicate_rate: fraction of stations served again with the observation time of their previous response
+    :param seed: random seed for readings and errors
+    :param clock: unix timestamp of the latest observations, None follows the wall clock
+    :param sample: decoded find response, defaults to sample_region_response.json
+    """
+
+    def __init__(self, stations=50, latency=0, error_rate=0, error_status=503, duplicate_rate=0, seed=None,
+                 clock=None, sample=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.duplicate_rate = duplicate_rate
+        self.clock = clock
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.last_dt = {}
+
+        base = (sample or load_sample())['list']
+        self.stations = []
+        for i in range(stations):
+            station = copy.deepcopy(base[i % len(base)])
+            copy_number = i // len(base)
+
+            if copy_number:
+                station['id'] = 90000000 + i
+                station['name'] = '{0} {1}'.format(station['name'], copy_number)
+                station['coord'] = {'lat': round(station['coord']['lat'] + 0.5 * (copy_number // 8), 4),
+                                    'lon': round(station['coord']['lon'] + 0.5 * (copy_number % 8), 4)}
+
+            # Stations report a few minutes apart.
+            station['offset'] = self.random.randrange(0, 600)
+            self.stations.append(station)
+
+        self.lat = np.array([station['coord']['lat'] for station in self.stations])
+        self.lon = np.array([station['coord']['lon'] for station in self.stations])
+
+    def now(self):
+        return int(time.time()) if self.clock is None else self.clock
+
+    def advance(self, seconds=1800):
+        with self.lock:
+            self.clock = self.now() + seconds
+
+    def station_list(self):
+        return [Station(str(s['id']), s['name'], s['coord']['lat'], s['coord']['lon']) for s in self.stations]
+
+    def observation(self, station, units):
+        st = copy.deepcopy(station)
+        offset = st.pop('offset')
+
+        with self.lock:
+            if station['id'] in self.last_dt and self.random.random() < self.duplicate_rate:
+                st['dt'] = self.last_dt[station['id']]
+            else:
+                st['dt'] = self.now() - offset
+            self.last_dt[station['id']] = st['dt']
+
+            change = self.random.uniform(-3, 3)
+            st['main']['temp'] = round(st['main']['temp'] + change, 2)
+            st['main']['temp_min'] = round(st['main']['temp_min'] + change, 2)
+            st['main']['temp_max'] = round(st['main']['temp_max'] + change, 2)
+            st['main']['humidity'] = min(100, max(1, st['main']['humidity'] + self.random.randint(-5, 5)))
+            st['wind']['speed'] = round(max(0.0, st['wind']['speed'] + self.random.uniform(-2, 2)), 2)
+
+        # The sample was saved in imperial units.
+        if units == 'metric':
+            for key in ('temp', 'feels_like', 'temp_min', 'temp_max'):
+                st['main'][key] = round((st['main'][key] - 32) * 5 / 9, 2)
+            st['wind']['speed'] = round(st['wind']['speed'] * 0.44704, 2)
+
+        return st
+
+    def find(self, lat, lon, count, units='imperial'):
+        """
+        The find response for a centre: the count stations nearest to it, at most 50 like OWM.
+
+        :return: decoded JSON response
+        """
+
+        scale = np.cos(np.radians(lat))
+        distance = np.hypot(self.lat - lat, (self.lon - lon) * scale)
+        nearest = np.argsort(distance, kind='stable')[:min(count, 50)]
+        stations = [self.observation(self.stations[i], units) for i in nearest.tolist()]
+
+        return {'message': 'accurate', 'cod': '200', 'count': len(stations), 'list': stations}
+
+    def handle(self, path, query):
+        """
+        Answer a request.
+
+        :return: HTTP status and decoded JSON body
+        """
+
+        with self.lock:
+            self.requests += 1
+            failed = self.random.random() < self.error_rate
+            self.errors += failed
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if urlparse(path).path.rstrip('/') != FIND_PATH:
+            return 404, {'cod': '404', 'message': 'Internal error'}
+
+        if failed:
+            return self.error_status, {'cod': str(self.error_status), 'message': 'Simulated error'}
+
+        try:
+            lat, lon = float(query['lat'][0]), float(query['lon'][0])
+            count = int(query.get('cnt', ['10'])[0])
+        except (KeyError, ValueError):
+            return 400, {'cod': '400', 'message': 'wrong latitude or longitude'}
+
+        return 200, self.find(lat, lon, count, query.get('units', ['imperial'])[0])
+
+
+class FindHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        status, body = self.server.owm.handle(self.path, parse_qs(urlparse(self.path).query))
+        content = json.dumps(body).encode()
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeOWMServer(ThreadingHTTPServer):
+    """ HTTP server for a FakeOWM, port 0 picks a free port. Usable as a context manager that serves in a thread. """
+
+    daemon_threads = True
+
+    def __init__(self, owm, host='127.0.0.1', port=0):
+        super().__init__((host, port), FindHandler)
+        self.owm = owm
+        self.thread = None
+
+    @property
+    def url(self):
+        return 'http://{0}:{1}{2}'.format(self.server_address[0], self.server_address[1], FIND_PATH)
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.serve_forever, name='fake-owm', daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,92 @@
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from metload.owm_get_region import FIND_URL, region_info
+
+logger = logging.getLogger()
+
+# One find request: the region centre, the number of stations asked for, and the response or the error it failed with.
+TileResult = namedtuple('TileResult', ['centre', 'data', 'request_time', 'error'])
+
+
+class RegionFetcher:
+    """
+    Fetch several OWM find regions concurrently. Requests run on a thread pool and share one requests.Session, whose
+    keep-alive connection pool is sized to the number of workers. Every request has a timeout. Connection errors,
+    where the request never reached OWM, are retried here with exponential backoff. Error responses such as 429s and
+    5xx fail the region, the PollScheduler tries it again with a token from the rate limiter for every attempt.
+    """
+
+    def __init__(self, appid, units='metric', url=FIND_URL, timeout=10, retries=3, backoff=0.5, max_workers=10):
+        self.appid = appid
+        self.units = units
+        self.url = url
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='owm-fetch')
+
+        # A request that was sent counts against the quota, only failures to connect are retried inside the session.
+        retry = Retry(total=retries, connect=retries, read=0, status=0, other=0, backoff_factor=backoff,
+                      allowed_methods=('GET',))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def fetch_tile(self, centre, city_count=50):
+        lat, lon = centre
+
+        try:
+            data, request_time = region_info(lat, lon, city_count, self.appid, self.units, session=self.session,
+                                             url=self.url, timeout=self.timeout)
+
+        except (requests.RequestException, ValueError) as e:
+            # Request URLs carry the app ID, keep it out of the log.
+            logger.warning('[INFO] Region ({0:.4f}, {1:.4f}) failed: {2}'.format(
+                lat, lon, str(e).replace(str(self.appid), '<APPID>')))
+            return TileResult(centre, None, None, e)
+
+        return TileResult(centre, data, request_time, None)
+
+    def fetch(self, centres, city_count=50):
+        """
+        Fetch every region at once, a poll takes about as long as its slowest region.
+
+        :param centres: (latitude, longitude) region centres
+        :param city_count: number of stations asked for per region, OWM returns at most 50
+        :return: TileResult for each centre, in the same order
+        """
+
+        return list(self.executor.map(lambda centre: self.fetch_tile(centre, city_count), centres))
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def merge_regions(results, parse):
+    """
+    Combine the parsed stations of several regions. Regions overlap, a station found by more than one is kept once.
+
+    :param results: TileResult list from RegionFetcher.fetch
+    :param parse: parser for a single find response, e.g. parse_stations
+    :return: parsed station dictionaries keyed by site_id
+    """
+
+    stations = {}
+    for result in results:
+        if result.data is not None:
+            for cln_obs_data in parse(result.data).values():
+                stations.setdefault(str(cln_obs_data['site_id']), cln_obs_data)
+
+    return stations
@@ -0,0 +1,290 @@
+import logging
+import math
+from django.db import connection, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from locations.cache import invalidate_locations
+from locations.models import Location
+from metload.models import Obsset, DerivedObs, LatestObservation, ObsPoll, WeatherCondition
+from metload.derived import derive_observations
+from metload.rollups import update_daily_rollups
+
+logger = logging.getLogger()
+
+# The newest observation time written for each station, keyed by site_id. OWM often repeats a station's dt on
+# consecutive polls, and those repeats are dropped before anything is written.
+last_seen = {}
+
+
+class QueryCounter:
+    """ A database execute wrapper that counts the queries, and the writes among them, run while it is installed. """
+
+    def __init__(self):
+        self.count = 0
+        self.writes = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        self.writes += sql.lstrip()[:6].upper() in ('INSERT', 'UPDATE', 'DELETE')
+        return execute(sql, params, many, context)
+
+
+def resolve_locations(cln_obs_data_all_sites):
+    """
+    Map every parsed station to its Location with a single query. Stations are matched on site_id first and fall back
+    to the name for locations that were entered without one.
+
+    :param cln_obs_data_all_sites: parsed station dictionaries from parse_stations
+    :return: dictionary of Location keyed by site_id and by name
+    """
+
+    site_ids = {str(obs['site_id']) for obs in cln_obs_data_all_sites}
+    names = {obs['site_name'] for obs in cln_obs_data_all_sites}
+
+    by_site_id = {}
+    by_name = {}
+    for loc in Location.objects.filter(Q(site_id__in=site_ids) | Q(name__in=names)):
+        if loc.site_id:
+            by_site_id.setdefault(loc.site_id, loc)
+        else:
+            # Stations now come keyed by site_id, so a name shared by several stations must not match a location
+            # that belongs to one of them.
+            by_name.setdefault(loc.name, loc)
+
+    return by_site_id, by_name
+
+
+def skip_unchanged(cln_obs_data_all_sites):
+    """
+    Drop stations whose observation time has not changed since the last poll, and repeats of the same
+    (site_id, datetime) within a batch. Stations not yet in the cache are looked up with a single query.
+
+    :param cln_obs_data_all_sites: parsed station dictionaries from parse_stations
+    :return: the stations with new observations
+    """
+
+    unknown = {str(obs['site_id']) for obs in cln_obs_data_all_sites} - last_seen.keys()
+
+    if unknown:
+        latest = dict(Obsset.objects.filter(site_id__in=unknown).order_by()
+                                    .values_list('site_id').annotate(Max('datetime')))
+        last_seen.update({site_id: latest.get(site_id) for site_id in unknown})
+
+    fresh = []
+    keys = set()
+    for obs in cln_obs_data_all_sites:
+        key = (str(obs['site_id']), obs['datetime'])
+
+        if last_seen.get(key[0]) == key[1] or key in keys:
+            continue
+
+        keys.add(key)
+        fresh.append(obs)
+
+    return fresh
+
+
+def remember_latest(observations):
+    for obs in observations:
+        if last_seen.get(obs.site_id) is None or obs.datetime > last_seen[obs.site_id]:
+            last_seen[obs.site_id] = obs.datetime
+
+
+def measurement(value, convert=None):
+    """ A parsed value as a float, with the 'NaN' placeholder from parse_met_vars stored as NULL. """
+
+    try:
+        value = float(value)
+
+    except (TypeError, ValueError):
+        return None
+
+    if math.isnan(value):
+        return None
+
+    return convert(value) if convert else value
+
+
+def fahrenheit_to_celsius(value):
+    return (value - 32) * (5 / 9)
+
+
+def mph_to_meters_per_second(value):
+    return value * 0.44704
+
+
+def precipitation(value):
+    """ OWM reports rain and snow either as a number or as a dictionary of 1h/3h volumes. """
+
+    if isinstance(value, dict):
+        value = value.get('1h', value.get('3h'))
+
+    return measurement(value) or 0
+
+
+def resolve_conditions(cln_obs_data_all_sites):
+    """
+    Map every weather condition in a polling cycle to its WeatherCondition row, creating the ones not seen before.
+    The table holds a few dozen rows, so it is read whole.
+
+    :param cln_obs_data_all_sites: parsed station dictionaries from parse_stations
+    :return: dictionary of WeatherCondition keyed by (owm_id, main, description, icon)
+    """
+
+    conditions = {(c.owm_id, c.main, c.description, c.icon): c for c in WeatherCondition.objects.all()}
+
+    missing = {}
+    for obs in cln_obs_data_all_sites:
+        key = condition_key(obs)
+        if key not in conditions:
+            missing[key] = WeatherCondition(owm_id=key[0], main=key[1], description=key[2], icon=key[3])
+
+    if missing:
+        WeatherCondition.objects.bulk_create(missing.values(), ignore_conflicts=True)
+        conditions = {(c.owm_id, c.main, c.description, c.icon): c for c in WeatherCondition.objects.all()}
+
+    return conditions
+
+
+def condition_key(cln_obs_data):
+    weather_id = measurement(cln_obs_data['weather_id'])
+
+    return (None if weather_id is None else int(weather_id), cln_obs_data['weather_main'],
+            cln_obs_data['weather_desc'], cln_obs_data['weather_icon'])
+
+
+def build_observation(cln_obs_data, location, poll=None, condition=None, units='metric'):
+    """
+    Build an unsaved Obsset from one parsed station. Values are stored in metric units, imperial input is converted.
+
+    :param cln_obs_data: parsed station dictionary from parse_stations
+    :param location: Location the station belongs to
+    :param poll: ObsPoll of the request the station came from
+    :param condition: WeatherCondition of the station
+    :param units: units the OWM request was made in, 'metric' or 'imperial'
+    :return: Obsset
+    """
+
+    temperature = fahrenheit_to_celsius if units == 'imperial' else None
+    speed = mph_to_meters_per_second if units == 'imperial' else None
+    clouds = measurement(cln_obs_data['st_clouds'])
+
+    return Obsset(
+        location=location,
+        poll=poll,
+        condition=condition,
+        datetime=cln_obs_data['datetime'],
+        site_id=str(cln_obs_data['site_id']),
+        site_name=cln_obs_data['site_name'],
+        latitude=measurement(cln_obs_data['lat']),
+        longitude=measurement(cln_obs_data['lon']),
+        sunrise=measurement(cln_obs_data['sunrise'], round),
+        sunset=measurement(cln_obs_data['sunset'], round),
+        temperature=measurement(cln_obs_data['temp'], temperature),
+        pressure=measurement(cln_obs_data['pressure']),
+        humidity=measurement(cln_obs_data['humidity']),
+        temp_min=measurement(cln_obs_data['temp_min'], temperature),
+        temp_max=measurement(cln_obs_data['temp_max'], temperature),
+        wind_speed=measurement(cln_obs_data['wind_speed'], speed),
+        wind_dir=measurement(cln_obs_data['wind_dir']),
+        wind_gust=measurement(cln_obs_data['wind_gust'], speed),
+        rain_1h=precipitation(cln_obs_data['rain_1h']),
+        rain_3h=precipitation(cln_obs_data['rain_3h']),
+        snow=precipitation(cln_obs_data['snow']),
+        clouds=None if clouds is None else int(clouds),
+    )
+
+
+def update_latest_observations(observations):
+    """
+    Move each site's LatestObservation forward to the newest of the given observations. Sites whose stored row is
+    already newer, as when older data is backfilled, are left alone.
+
+    :param observations: saved Obsset instances
+    """
+
+    newest = {}
+    for obs in observations:
+        if obs.location_id not in newest or obs.datetime > newest[obs.location_id].datetime:
+            newest[obs.location_id] = obs
+
+    if not newest:
+        return
+
+    stored = dict(LatestObservation.objects.filter(location_id__in=newest.keys())
+                                           .values_list('location_id', 'datetime'))
+    rows = [LatestObservation(location_id=location_id, obs=obs, datetime=obs.datetime, temperature=obs.temperature)
+            for location_id, obs in newest.items() if stored.get(location_id, obs.datetime) <= obs.datetime]
+
+    LatestObservation.objects.bulk_create(rows, update_conflicts=True, unique_fields=['location'],
+                                          update_fields=['obs', 'datetime', 'temperature'])
+
+
+def load_observations(cln_obs_data_all_sites, units='metric', requested_at=None):
+    """
+    Write one polling cycle of parsed observations along with their derived values and daily rollups. Locations are
+    resolved with one query, each table is written with a bulk insert and the whole cycle runs in one transaction.
+    Observations are keyed by (site_id, datetime), so repeated polls and retried cycles never write duplicates.
+
+    :param cln_obs_data_all_sites: parsed station dictionaries from parse_stations
+    :param units: units the OWM request was made in, 'metric' or 'imperial'
+    :param requested_at: time of the poll, defaults to now
+    :return: the saved observations and the number of queries the cycle used
+    """
+
+    counter = QueryCounter()
+
+    with connection.execute_wrapper(counter), transaction.atomic():
+        cln_obs_data_all_sites = skip_unchanged(list(cln_obs_data_all_sites))
+        by_site_id, by_name = resolve_locations(cln_obs_data_all_sites)
+        conditions = resolve_conditions(cln_obs_data_all_sites)
+
+        # The message, cod and count are the same for every station in a response and are stored once per poll.
+        poll = None
+        if cln_obs_data_all_sites:
+            first = cln_obs_data_all_sites[0]
+            poll = ObsPoll.objects.create(requested_at=requested_at or timezone.now(), quality_message=first['quality_message'],
+                                          cod=first['cod'], city_count=measurement(first['city_count']))
+
+        observations = []
+        for cln_obs_data in cln_obs_data_all_sites:
+            location = by_site_id.get(str(cln_obs_data['site_id'])) or by_name.get(cln_obs_data['site_name'])
+
+            if location is None:
+                logger.warning('[INFO] No location for {0} ({1}), skipping'.format(
+                    cln_obs_data['site_name'], cln_obs_data['site_id']))
+                continue
+
+            observations.append(build_observation(cln_obs_data, location, poll=poll,
+                                                  condition=conditions[condition_key(cln_obs_data)], units=units))
+
+        # Rows that already exist for a (site_id, datetime) are left alone. The ids of the rows this cycle inserted
+        # are read back as the ones that have no derived values yet. They are selected by station and time range
+        # rather than one condition per row, which would exceed SQLite's expression depth on large cycles.
+        Obsset.objects.bulk_create(observations, ignore_conflicts=True)
+        locations = {(obs.site_id, obs.datetime): obs.location for obs in observations}
+
+        inserted = Obsset.objects.none()
+        if observations:
+            inserted = Obsset.objects.filter(site_id__in={obs.site_id for obs in observations},
+                                             datetime__gte=min(obs.datetime for obs in observations),
+                                             datetime__lte=max(obs.datetime for obs in observations),
+                                             derived__isnull=True).order_by('datetime')
+
+        observations = [obs for obs in inserted if (obs.site_id, obs.datetime) in locations]
+        for obs in observations:
+            obs.location = locations[(obs.site_id, obs.datetime)]
+
+        # Derived ETo/GDU values and daily rollups are written in the same transaction as the observations.
+        for obs, derived in zip(observations, DerivedObs.objects.bulk_create(derive_observations(observations))):
+            obs.derived = derived
+
+        update_daily_rollups(observations)
+        update_latest_observations(observations)
+
+        transaction.on_commit(lambda: remember_latest(observations))
+        transaction.on_commit(lambda: invalidate_locations(obs.location.name for obs in observations))
+
+    logger.warning('[INFO] Loaded {0} observations with {1} queries'.format(len(observations), counter.count))
+
+    return observations, counter.count
@@ -0,0 +1,66 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection
+from locations.models import Location
+from metload.models import Obsset
+
+
+class Command(BaseCommand):
+    help = 'Report the on-disk size of the observation table and time the location page range query.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--location', help='Location name to query, defaults to the first location.')
+        parser.add_argument('--days', type=int, default=10, help='Length of the queried range in days.')
+        parser.add_argument('--repeat', type=int, default=20, help='Number of timed runs.')
+
+    def table_size(self):
+        table = Obsset._meta.db_table
+
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT pg_total_relation_size(%s), pg_relation_size(%s), avg(pg_column_size(t.*)) '
+                               'FROM {0} t'.format(table), [table, table])
+                return cursor.fetchone()
+
+            if connection.vendor == 'sqlite':
+                try:
+                    cursor.execute('SELECT sum(pgsize) FROM dbstat WHERE name = %s', [table])
+                    size = cursor.fetchone()[0]
+
+                except Exception:
+                    size = None  # SQLite built without the dbstat virtual table
+
+                return size, size, None
+
+        return None, None, None
+
+    def handle(self, *args, **options):
+        location = Location.objects.filter(name=options['location']).first() if options['location'] else \
+            Location.objects.order_by('pk').first()
+
+        if location is None:
+            self.stdout.write('[INFO] No locations to benchmark')
+            return
+
+        rows = Obsset.objects.count()
+        total, heap, row_size = self.table_size()
+
+        self.stdout.write('[INFO] Rows: {0}'.format(rows))
+        self.stdout.write('[INFO] Table size with indexes: {0} bytes, heap: {1} bytes'.format(total, heap))
+        if row_size is not None:
+            self.stdout.write('[INFO] Average row size: {0:.1f} bytes'.format(float(row_size)))
+
+        latest = Obsset.objects.filter(location=location).order_by('-datetime').values_list('datetime', flat=True) \
+                               .first() or time.time()
+        start_stamp = latest - options['days'] * 86400
+
+        timings = []
+        for _ in range(options['repeat']):
+            began = time.perf_counter()
+            count = len(list(Obsset.objects.filter(location__name=location.name).filter(datetime__gte=start_stamp)
+                                           .order_by('datetime').values_list('datetime', 'temperature')))
+            timings.append(time.perf_counter() - began)
+
+        timings.sort()
+        self.stdout.write('[INFO] Range query for {0}: {1} rows, median {2:.2f} ms, best {3:.2f} ms'.format(
+            location.name, count, timings[len(timings) // 2] * 1000, timings[0] * 1000))
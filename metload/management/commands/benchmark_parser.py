@@ -0,0 +1,50 @@
+import json
+import time
+from django.core.management.base import BaseCommand
+from metload.fakeowm import FakeOWM
+from metload.owm_get_region import parse_met_vars
+from metload.owm_parse import decode, orjson, parse_columns, parse_stations
+
+
+def response_body(stations, seed=0):
+    """ Encoded find response listing every station of a FakeOWM, past the 50 a real request returns. """
+
+    owm = FakeOWM(stations=stations, seed=seed)
+    data = {'message': 'accurate', 'cod': '200', 'count': stations,
+            'list': [owm.observation(station, 'metric') for station in owm.stations]}
+
+    return json.dumps(data).encode()
+
+
+PARSERS = (
+    ('parse_met_vars', lambda body: parse_met_vars(json.loads(body))),
+    ('parse_columns', lambda body: parse_columns(decode(body))),
+    ('parse_stations', lambda body: parse_stations(decode(body))),
+)
+
+
+class Command(BaseCommand):
+    help = 'Compare the decode and parse time of parse_met_vars with the columnar parser on synthetic find responses.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[50, 500, 5000],
+                            help='Numbers of stations per response.')
+        parser.add_argument('--repeat', type=int, default=20, help='Number of timed runs of each parser.')
+
+    def handle(self, *args, **options):
+        self.stdout.write('[INFO] JSON decoder: {0}'.format('orjson' if orjson is not None else 'json'))
+
+        for size in options['sizes']:
+            body = response_body(size)
+
+            for label, parse in PARSERS:
+                parsed = parse(body)
+                timings = []
+                for _ in range(options['repeat']):
+                    began = time.perf_counter()
+                    parse(body)
+                    timings.append(time.perf_counter() - began)
+
+                kept = len(parsed['site_id']) if label == 'parse_columns' else len(parsed)
+                self.stdout.write('[INFO] {0} stations, {1}: best {2:.2f} ms, {3:.0f} stations/ms, {4} kept'.format(
+                    size, label, min(timings) * 1000, size / (min(timings) * 1000), kept))
@@ -0,0 +1,63 @@
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand
+from locations.models import Location
+from metload.derived import DERIVED_FIELDS
+from metload.models import Obsset
+from metload.series import fetch_series
+
+
+def fetch_instances(location_name, start_stamp):
+    """ The location view before the columnar fetch: model instances and one list per column. """
+
+    obsn_set = list(Obsset.objects.filter(location__name=location_name).filter(datetime__gte=start_stamp)
+                                  .select_related('derived').order_by('datetime'))
+    columns = {field: [getattr(ob, field) for ob in obsn_set] for field in
+               ('datetime', 'temperature', 'wind_speed', 'humidity', 'pressure', 'rain_1h')}
+    columns.update({field: [getattr(ob.derived, field) for ob in obsn_set] for field in DERIVED_FIELDS + ('gdu',)})
+
+    return columns
+
+
+def fetch_columns(location_name, start_stamp):
+    return fetch_series(location_name, start_stamp, derived_fields=DERIVED_FIELDS + ('gdu',))
+
+
+class Command(BaseCommand):
+    help = 'Compare latency and peak memory of the model-instance and columnar fetch paths of the location view.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--location', help='Location name to query, defaults to the first location.')
+        parser.add_argument('--days', type=int, default=365, help='Length of the queried range in days.')
+        parser.add_argument('--repeat', type=int, default=5, help='Number of timed runs of each path.')
+
+    def measure(self, fetch, location_name, start_stamp, repeat):
+        timings = []
+        for _ in range(repeat):
+            began = time.perf_counter()
+            columns = fetch(location_name, start_stamp)
+            timings.append(time.perf_counter() - began)
+
+        tracemalloc.start()
+        fetch(location_name, start_stamp)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return len(columns['datetime']), min(timings), peak
+
+    def handle(self, *args, **options):
+        location = Location.objects.filter(name=options['location']).first() if options['location'] else \
+            Location.objects.order_by('pk').first()
+
+        if location is None:
+            self.stdout.write('[INFO] No locations to benchmark')
+            return
+
+        latest = Obsset.objects.filter(location=location).order_by('-datetime').values_list('datetime', flat=True) \
+                               .first() or time.time()
+        start_stamp = latest - options['days'] * 86400
+
+        for label, fetch in (('instances', fetch_instances), ('columnar', fetch_columns)):
+            rows, best, peak = self.measure(fetch, location.name, start_stamp, options['repeat'])
+            self.stdout.write('[INFO] {0}: {1} rows, best {2:.1f} ms, peak memory {3:.2f} MB'.format(
+                label, rows, best * 1000, peak / 2 ** 20))
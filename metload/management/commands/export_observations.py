@@ -0,0 +1,48 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from locations.models import Location
+from metload.derived import model_parameters
+from metload.export import CHUNK_SIZE, FORMATS, day_range, export_rows
+
+
+class Command(BaseCommand):
+    help = 'Stream raw observations with their ETo and GDU as CSV or NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--site', action='append', dest='sites', required=True,
+                            help='Location name or OWM site_id, may be repeated.')
+        parser.add_argument('--start', required=True, help='First day of the range, YYYY-MM-DD.')
+        parser.add_argument('--end', required=True, help='Last day of the range (inclusive), YYYY-MM-DD.')
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--output', help='File to write, defaults to stdout.')
+        parser.add_argument('--gdu-base', type=float)
+        parser.add_argument('--gdu-max', type=float)
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        locations = list(Location.objects.filter(Q(site_id__in=options['sites']) | Q(name__in=options['sites'])))
+
+        if not locations:
+            raise CommandError('No locations match {0}'.format(', '.join(options['sites'])))
+
+        try:
+            start_stamp, end_stamp = day_range(options['start'], options['end'])
+
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        params = model_parameters()
+        params.update({key: options[key] for key in ('gdu_base', 'gdu_max') if options[key] is not None})
+
+        lines, _ = FORMATS[options['format']]
+        rows = export_rows(locations, start_stamp, end_stamp, params, chunk_size=options['chunk_size'])
+
+        out = open(options['output'], 'w', newline='') if options['output'] else sys.stdout
+        try:
+            for line in lines(rows):
+                out.write(line)
+
+        finally:
+            if options['output']:
+                out.close()
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from metload.fakeowm import FakeOWM, FakeOWMServer
+
+
+class Command(BaseCommand):
+    help = 'Serve a local stand-in for the OWM find endpoint built from sample_region_response.json. Point ' \
+           'settings.OWM_FIND_URL at it to run ingest without the live API.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8089)
+        parser.add_argument('--stations', type=int, default=50, help='Number of stations served.')
+        parser.add_argument('--latency', type=float, default=0, help='Seconds each response is delayed by.')
+        parser.add_argument('--error-rate', type=float, default=0, help='Fraction of requests that fail.')
+        parser.add_argument('--error-status', type=int, default=503, help='HTTP status of failed requests.')
+        parser.add_argument('--duplicate-rate', type=float, default=0,
+                            help='Fraction of stations served again with their previous observation time.')
+        parser.add_argument('--seed', type=int)
+
+    def handle(self, *args, **options):
+        owm = FakeOWM(stations=options['stations'], latency=options['latency'], error_rate=options['error_rate'],
+                      error_status=options['error_status'], duplicate_rate=options['duplicate_rate'],
+                      seed=options['seed'])
+        server = FakeOWMServer(owm, host=options['host'], port=options['port'])
+        self.stdout.write('[INFO] Serving {0} stations at {1}'.format(options['stations'], server.url))
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
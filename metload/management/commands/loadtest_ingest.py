@@ -0,0 +1,97 @@
+import os
+import tempfile
+import time
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from locations.cache import CACHE_ALIAS
+from locations.models import Location
+from metload.fakeowm import FakeOWM, FakeOWMServer
+from metload.ingest import QueryCounter
+from metload.runner import run_ingest
+from metload.scheduler import TokenBucket
+from metload.tiling import plan_tiles, save_plan
+
+
+class Command(BaseCommand):
+    help = 'Run the full ingest pipeline against a local stand-in OWM server and report throughput, database ' \
+           'writes and cycle latency. Runs in a throwaway test database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stations', type=int, default=500, help='Number of stations served.')
+        parser.add_argument('--cycles', type=int, default=10, help='Number of ingest cycles to run.')
+        parser.add_argument('--latency', type=float, default=0.05, help='Seconds each response is delayed by.')
+        parser.add_argument('--error-rate', type=float, default=0, help='Fraction of requests that fail.')
+        parser.add_argument('--duplicate-rate', type=float, default=0,
+                            help='Fraction of stations served again with their previous observation time.')
+        parser.add_argument('--requests-per-minute', type=int, default=6000,
+                            help='Token bucket rate for the find requests.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+        try:
+            # The throwaway locations share primary keys with real ones, so their radiation tables and location cache
+            # entries are kept in the scratch directory as well.
+            with tempfile.TemporaryDirectory() as plan_dir, override_settings(
+                    RADIATION_TABLE_DIR=os.path.join(plan_dir, 'radiation_tables'),
+                    CACHES=dict(settings.CACHES, **{CACHE_ALIAS: {
+                        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                        'LOCATION': os.path.join(plan_dir, 'cache')}})):
+                self.run(options, plan_dir)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            # SQLite keeps an in-memory test database open through destroy_test_db, reconnect to the real one.
+            connection.close()
+
+    def run(self, options, plan_dir):
+        owm = FakeOWM(stations=options['stations'], latency=options['latency'], error_rate=options['error_rate'],
+                      duplicate_rate=options['duplicate_rate'], seed=options['seed'],
+                      clock=int(time.time()) // 1800 * 1800)
+        stations = owm.station_list()
+
+        Location.objects.bulk_create([Location(name=s.name, site_id=s.site_id, latitude=s.lat, longitude=s.lon)
+                                      for s in stations])
+        tiles = plan_tiles(stations)
+
+        plan_path = os.path.join(plan_dir, 'owm_tiles.json')
+        save_plan(plan_path, tiles)
+
+        self.stdout.write('[INFO] {0} stations in {1} tiles, {2} cycles'.format(
+            len(stations), len(tiles), options['cycles']))
+
+        latencies, stored, writes, queries = [], [], [], []
+
+        with FakeOWMServer(owm) as server, override_settings(OWM_FIND_URL=server.url, OWM_TILE_PLAN=plan_path,
+                                                             OWM_POLL_SPREAD=0,
+                                                             OWM_ARCHIVE_DIR=os.path.join(plan_dir, 'archive'),
+                                                             INGEST_LOCK_FILE=os.path.join(plan_dir, 'ingest.lock')):
+            for cycle in range(options['cycles']):
+                owm.advance(1800)
+                bucket = TokenBucket.per_minute(options['requests_per_minute'])
+                counter = QueryCounter()
+
+                began = time.perf_counter()
+                with connection.execute_wrapper(counter):
+                    observations, _, stats = run_ingest('fake', bucket=bucket)
+                latencies.append(time.perf_counter() - began)
+
+                stored.append(len(observations))
+                writes.append(counter.writes)
+                queries.append(counter.count)
+
+                self.stdout.write('[INFO] Cycle {0}: {1} observations, {2} queries ({3} writes), {4:.0f} ms, '
+                                  '{5} requeued, {6} failed'.format(cycle + 1, stored[-1], queries[-1], writes[-1],
+                                                                    latencies[-1] * 1000, stats['requeued'],
+                                                                    stats['failed']))
+
+        latencies = np.array(latencies)
+        self.stdout.write('[INFO] {0:.0f} stations/s, {1:.1f} writes and {2:.1f} queries per cycle, cycle latency '
+                          'p50 {3:.0f} ms, p99 {4:.0f} ms, {5} requests ({6} simulated errors)'.format(
+                              sum(stored) / latencies.sum(), np.mean(writes), np.mean(queries),
+                              np.percentile(latencies, 50) * 1000, np.percentile(latencies, 99) * 1000,
+                              owm.requests, owm.errors))
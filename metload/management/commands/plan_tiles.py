@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from metload.tiling import load_site_info, plan_tiles, save_plan, stations_from_locations
+
+
+class Command(BaseCommand):
+    help = 'Plan the OWM find request centres that cover every station with the fewest requests.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--site-info', help='Take the target stations from a site_info_list.txt style file '
+                                                'instead of the Location table.')
+        parser.add_argument('--universe', help='site_info_list.txt style file of every known OWM station in the '
+                                               'area, defaults to the targets.')
+        parser.add_argument('--count', type=int, default=50, help='Stations returned per find request.')
+        parser.add_argument('--output', default=getattr(settings, 'OWM_TILE_PLAN', None),
+                            help='Where to save the plan, defaults to settings.OWM_TILE_PLAN.')
+        parser.add_argument('--dry-run', action='store_true', help='Print the plan without saving it.')
+
+    def handle(self, *args, **options):
+        targets = load_site_info(options['site_info']) if options['site_info'] else stations_from_locations()
+        universe = load_site_info(options['universe']) if options['universe'] else None
+
+        tiles = plan_tiles(targets, universe=universe, k=options['count'])
+        covered = sum(len(tile.site_ids) for tile in tiles)
+
+        for tile in tiles:
+            self.stdout.write('[INFO] ({0:.4f}, {1:.4f}) covers {2} stations'.format(
+                tile.centre[0], tile.centre[1], len(tile.site_ids)))
+
+        self.stdout.write('[INFO] {0} requests cover {1} of {2} stations'.format(len(tiles), covered, len(targets)))
+
+        if not options['dry_run'] and options['output']:
+            save_plan(options['output'], tiles)
+            self.stdout.write('[INFO] Saved plan to {0}'.format(options['output']))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from locations.models import Location
+from metload.rollups import rebuild_daily_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily ETo/GDU/rain rollups from the derived observations.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--location', type=int, action='append', dest='location_ids',
+                            help='Location id to rebuild, may be repeated. Defaults to all locations.')
+
+    def handle(self, *args, **options):
+        location_ids = options['location_ids'] or Location.objects.values_list('pk', flat=True)
+
+        for location_id in location_ids:
+            days = rebuild_daily_rollups(location_id)
+            self.stdout.write('[INFO] Rebuilt {0} days for location {1}'.format(days, location_id))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from metload.derived import recompute_stale_derived
+
+
+class Command(BaseCommand):
+    help = 'Recompute derived ETo/GDU rows that are missing or were computed with different model parameters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--location', type=int, action='append', dest='location_ids',
+                            help='Location id to refresh, may be repeated. Defaults to all locations.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        recomputed = recompute_stale_derived(options['location_ids'], chunk_size=options['chunk_size'])
+        self.stdout.write('[INFO] Recomputed {0} derived observations'.format(recomputed))
@@ -0,0 +1,37 @@
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from metload.archive import archived_days, read_archive, replay
+
+
+class Command(BaseCommand):
+    help = 'Load archived raw OWM responses back through the parser and bulk loader, e.g. to backfill Obsset after a ' \
+           'parser fix. Observations already stored are left alone unless --replace is given.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help='First UTC day, YYYY-MM-DD. Defaults to the '
+                                                                     'first archived day.')
+        parser.add_argument('--end', type=date.fromisoformat, help='Last UTC day, YYYY-MM-DD. Defaults to the last '
+                                                                   'archived day.')
+        parser.add_argument('--directory', help='Archive root, defaults to settings.OWM_ARCHIVE_DIR.')
+        parser.add_argument('--batch-size', type=int, default=8, help='Polls loaded per transaction.')
+        parser.add_argument('--replace', action='store_true',
+                            help='Delete stored observations that are in the archive and load them again, then '
+                                 'rebuild the daily rollups of their locations.')
+
+    def handle(self, *args, **options):
+        days = archived_days(options['directory'])
+
+        if days is None:
+            raise CommandError('The archive is empty')
+
+        start, end = options['start'] or days[0], options['end'] or days[1]
+
+        began = time.perf_counter()
+        totals = replay(read_archive(start, end, options['directory']), batch_size=options['batch_size'],
+                        replace=options['replace'])
+        elapsed = time.perf_counter() - began
+
+        self.stdout.write('[INFO] Replayed {0} responses of {1} polls from {2} to {3}: {4} observations stored, {5} of '
+                          'them replaced, in {6:.1f} s'.format(totals['responses'], totals['polls'], start, end,
+                                                               totals['observations'], totals['replaced'], elapsed))
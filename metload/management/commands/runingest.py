@@ -0,0 +1,43 @@
+import signal
+import threading
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from metload.derived import recompute_stale_derived
+from metload.runner import IngestRunning, run_forever, run_ingest
+
+
+class Command(BaseCommand):
+    help = 'Ingest OWM observations on an aligned schedule until stopped with SIGINT or SIGTERM.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=settings.INGEST_INTERVAL,
+                            help='Seconds between runs, aligned to the clock. Defaults to settings.INGEST_INTERVAL.')
+        parser.add_argument('--jitter', type=float, default=settings.INGEST_JITTER,
+                            help='Maximum random delay after each slot in seconds. Defaults to settings.INGEST_JITTER.')
+        parser.add_argument('--once', action='store_true', help='Run a single ingest cycle now and exit.')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            try:
+                observations, query_count, _ = run_ingest()
+            except IngestRunning as e:
+                raise CommandError(str(e))
+
+            self.stdout.write('[INFO] Stored {0} observations with {1} queries'.format(len(observations), query_count))
+            return
+
+        # Derived rows written before a change of the ETo/GDU model, or never written at all, are brought up to date
+        # before the first cycle so that pages and exports read current values.
+        recomputed = recompute_stale_derived()
+        self.stdout.write('[INFO] Recomputed {0} derived observations'.format(recomputed))
+
+        stop = threading.Event()
+
+        def shutdown(signum, frame):
+            self.stdout.write('[INFO] Received signal {0}, stopping after the current cycle'.format(signum))
+            stop.set()
+
+        signal.signal(signal.SIGINT, shutdown)
+        signal.signal(signal.SIGTERM, shutdown)
+
+        run_forever(stop, options['interval'], options['jitter'])
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0002_location_elevation'),
+        ('metload', '0002_auto_20190404_1102'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DerivedObs',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('datetime', models.IntegerField(blank=True, null=True)),
+                ('fingerprint', models.CharField(db_index=True, max_length=40)),
+                ('eto', models.FloatField(blank=True, null=True)),
+                ('gdu', models.FloatField(blank=True, null=True)),
+                ('r_a', models.FloatField(blank=True, null=True)),
+                ('r_s', models.FloatField(blank=True, null=True)),
+                ('r_so', models.FloatField(blank=True, null=True)),
+                ('r_ns', models.FloatField(blank=True, null=True)),
+                ('e_deg_t', models.FloatField(blank=True, null=True)),
+                ('d', models.FloatField(blank=True, null=True)),
+                ('e_a', models.FloatField(blank=True, null=True)),
+                ('y', models.FloatField(blank=True, null=True)),
+                ('r_n', models.FloatField(blank=True, null=True)),
+                ('g', models.FloatField(blank=True, null=True)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, to='locations.location')),
+                ('obs', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='derived', to='metload.obsset')),
+            ],
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0002_location_elevation'),
+        ('metload', '0003_derivedobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyObs',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.IntegerField()),
+                ('obs_count', models.IntegerField(default=0)),
+                ('eto_sum', models.FloatField(default=0)),
+                ('gdu_sum', models.FloatField(default=0)),
+                ('rain_sum', models.FloatField(default=0)),
+                ('temp_sum', models.FloatField(default=0)),
+                ('temp_min', models.FloatField(blank=True, null=True)),
+                ('temp_max', models.FloatField(blank=True, null=True)),
+                ('cum_eto', models.FloatField(default=0)),
+                ('cum_gdu', models.FloatField(default=0)),
+                ('cum_rain', models.FloatField(default=0)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, to='locations.location')),
+            ],
+            options={
+                'unique_together': {('location', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:38
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_observations(apps, schema_editor):
+    """ Keep the first row of every (site_id, datetime) pair and rebuild the rollups of the locations affected. """
+    Obsset = apps.get_model('metload', 'Obsset')
+    DerivedObs = apps.get_model('metload', 'DerivedObs')
+    DailyObs = apps.get_model('metload', 'DailyObs')
+
+    duplicates = Obsset.objects.values('site_id', 'datetime').order_by() \
+                               .annotate(keep=Min('id'), copies=Count('id')).filter(copies__gt=1)
+
+    location_ids = set()
+    for dup in duplicates.iterator():
+        extra = Obsset.objects.filter(site_id=dup['site_id'], datetime=dup['datetime']).exclude(id=dup['keep'])
+        location_ids.update(extra.values_list('location_id', flat=True))
+        DerivedObs.objects.filter(obs__in=extra).delete()
+        extra.delete()
+
+    for location_id in location_ids:
+        days = {}
+        rows = DerivedObs.objects.filter(location_id=location_id).order_by('datetime') \
+                                 .values_list('datetime', 'eto', 'gdu', 'obs__rain_1h', 'obs__temperature')
+
+        for stamp, eto, gdu, rain, temp in rows.iterator():
+            temp_c = (float(temp) - 32) * (5 / 9)
+            day = days.setdefault(stamp // 86400, DailyObs(location_id=location_id, day=stamp // 86400))
+            day.obs_count += 1
+            day.eto_sum += eto
+            day.gdu_sum += gdu
+            day.rain_sum += float(rain or 0)
+            day.temp_sum += temp_c
+            day.temp_min = temp_c if day.temp_min is None else min(day.temp_min, temp_c)
+            day.temp_max = temp_c if day.temp_max is None else max(day.temp_max, temp_c)
+
+        cum_eto = cum_gdu = cum_rain = 0
+        for key in sorted(days):
+            cum_eto += days[key].eto_sum
+            cum_gdu += days[key].gdu_sum
+            cum_rain += days[key].rain_sum
+            days[key].cum_eto, days[key].cum_gdu, days[key].cum_rain = cum_eto, cum_gdu, cum_rain
+
+        DailyObs.objects.filter(location_id=location_id).delete()
+        DailyObs.objects.bulk_create([days[key] for key in sorted(days)])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0002_location_elevation'),
+        ('metload', '0004_dailyobs'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_observations, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='obsset',
+            constraint=models.UniqueConstraint(fields=('site_id', 'datetime'), name='obsset_unique_site_datetime'),
+        ),
+    ]
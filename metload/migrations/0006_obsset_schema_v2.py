@@ -0,0 +1,118 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0002_location_elevation'),
+        ('metload', '0005_obsset_unique_site_datetime'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ObsPoll',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('requested_at', models.DateTimeField(blank=True, null=True)),
+                ('quality_message', models.CharField(blank=True, max_length=80, null=True)),
+                ('cod', models.CharField(blank=True, max_length=50, null=True)),
+                ('city_count', models.IntegerField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WeatherCondition',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('owm_id', models.IntegerField(blank=True, null=True)),
+                ('main', models.CharField(blank=True, max_length=20, null=True)),
+                ('description', models.CharField(blank=True, max_length=40, null=True)),
+                ('icon', models.CharField(blank=True, max_length=20, null=True)),
+            ],
+            options={
+                'unique_together': {('owm_id', 'main', 'description', 'icon')},
+            },
+        ),
+        migrations.AddField(
+            model_name='obsset',
+            name='clouds',
+            field=models.SmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='obsset',
+            name='poll',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.DO_NOTHING, to='metload.obspoll'),
+        ),
+        migrations.AddField(
+            model_name='obsset',
+            name='condition',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.DO_NOTHING, to='metload.weathercondition'),
+        ),
+        migrations.AlterField(
+            model_name='obsset',
+            name='humidity',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='obsset',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='obsset',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='obsset',
+            name='pressure',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='obsset',
+            name='rain_1h',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='obsset',
+            name='rain_3h',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='obsset',
+            name='snow',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='obsset',
+            name='temp_max',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='obsset',
+            name='temp_min',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='obsset',
+            name='temperature',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='obsset',
+            name='wind_dir',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='obsset',
+            name='wind_gust',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='obsset',
+            name='wind_speed',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
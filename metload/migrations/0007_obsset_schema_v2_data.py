@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:40
+
+from django.db import migrations
+from django.db.models import F
+
+MEASUREMENTS = ('latitude', 'longitude', 'temperature', 'pressure', 'humidity', 'temp_min', 'temp_max', 'wind_speed',
+                'wind_dir', 'wind_gust', 'rain_1h', 'rain_3h', 'snow')
+
+
+def as_int(value):
+    try:
+        return int(float(value))
+
+    except (TypeError, ValueError):
+        return None
+
+
+def convert_to_schema_v2(apps, schema_editor):
+    """
+    Move existing observations to the v2 layout: imperial temperatures and wind speeds become C and m/s, missing
+    values stored as NaN become NULL, and the repeated weather and per-poll strings move to their own tables.
+    """
+    Obsset = apps.get_model('metload', 'Obsset')
+    ObsPoll = apps.get_model('metload', 'ObsPoll')
+    WeatherCondition = apps.get_model('metload', 'WeatherCondition')
+
+    for field in MEASUREMENTS:
+        Obsset.objects.filter(**{field: float('nan')}).update(**{field: None})
+
+    Obsset.objects.update(
+        temperature=(F('temperature') - 32) * 5 / 9,
+        temp_min=(F('temp_min') - 32) * 5 / 9,
+        temp_max=(F('temp_max') - 32) * 5 / 9,
+        wind_speed=F('wind_speed') * 0.44704,
+        wind_gust=F('wind_gust') * 0.44704,
+    )
+
+    conditions = Obsset.objects.values_list('weather_id', 'weather_main', 'weather_desc', 'weather_icon') \
+                               .order_by().distinct()
+    for weather_id, main, desc, icon in list(conditions):
+        condition, _ = WeatherCondition.objects.get_or_create(owm_id=weather_id, main=main, description=desc,
+                                                              icon=icon)
+        Obsset.objects.filter(weather_id=weather_id, weather_main=main, weather_desc=desc, weather_icon=icon) \
+                      .update(condition=condition)
+
+    # Rows written before v2 do not record which request they came from, they share one poll per distinct value.
+    polls = Obsset.objects.values_list('quality_message', 'cod', 'city_count').order_by().distinct()
+    for message, cod, city_count in list(polls):
+        poll = ObsPoll.objects.create(quality_message=message, cod=cod, city_count=as_int(city_count))
+        Obsset.objects.filter(quality_message=message, cod=cod, city_count=city_count).update(poll=poll)
+
+    clouds = Obsset.objects.values_list('st_clouds', flat=True).order_by().distinct()
+    for value in list(clouds):
+        Obsset.objects.filter(st_clouds=value).update(clouds=as_int(value))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metload', '0006_obsset_schema_v2'),
+    ]
+
+    operations = [
+        migrations.RunPython(convert_to_schema_v2, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+# The old columns are dropped in their own migration: PostgreSQL refuses to alter a table while the deferred foreign
+# key checks queued by the updates in 0007 are still pending in the same transaction.
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metload', '0007_obsset_schema_v2_data'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='obsset',
+            name='city_count',
+        ),
+        migrations.RemoveField(
+            model_name='obsset',
+            name='cod',
+        ),
+        migrations.RemoveField(
+            model_name='obsset',
+            name='quality_message',
+        ),
+        migrations.RemoveField(
+            model_name='obsset',
+            name='st_clouds',
+        ),
+        migrations.RemoveField(
+            model_name='obsset',
+            name='weather_desc',
+        ),
+        migrations.RemoveField(
+            model_name='obsset',
+            name='weather_icon',
+        ),
+        migrations.RemoveField(
+            model_name='obsset',
+            name='weather_id',
+        ),
+        migrations.RemoveField(
+            model_name='obsset',
+            name='weather_main',
+        ),
+        migrations.AddIndex(
+            model_name='obsset',
+            index=models.Index(fields=['location', 'datetime'], name='obsset_location_datetime'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def fill_latest_observations(apps, schema_editor):
+    Obsset = apps.get_model('metload', 'Obsset')
+    LatestObservation = apps.get_model('metload', 'LatestObservation')
+
+    latest = Obsset.objects.values('location_id').order_by().annotate(newest=Max('datetime'))
+    rows = []
+    for entry in latest:
+        ob = Obsset.objects.filter(location_id=entry['location_id'], datetime=entry['newest']).order_by('id').first()
+        rows.append(LatestObservation(location_id=ob.location_id, obs_id=ob.id, datetime=ob.datetime,
+                                      temperature=ob.temperature))
+
+    LatestObservation.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0002_location_elevation'),
+        ('metload', '0008_obsset_schema_v2_cleanup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatestObservation',
+            fields=[
+                ('location', models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='latest_observation', serialize=False, to='locations.location')),
+                ('datetime', models.IntegerField()),
+                ('temperature', models.FloatField(blank=True, null=True)),
+                ('obs', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='metload.obsset')),
+            ],
+        ),
+        migrations.RunPython(fill_latest_observations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+import numpy as np
+from django.db import migrations
+from ETo_py.solar_events import solar_day_events
+
+CHUNK_SIZE = 2000
+
+
+def fill_solar_events(apps, schema_editor):
+    """ Replace the sunrise and sunset of Lubbock stored with every observation by those of its own station and day. """
+
+    Obsset = apps.get_model('metload', 'Obsset')
+    rows = Obsset.objects.exclude(latitude=None).exclude(longitude=None).order_by('pk') \
+                         .values_list('pk', 'datetime', 'latitude', 'longitude')
+
+    last_pk = 0
+    while True:
+        chunk = list(rows.filter(pk__gt=last_pk)[:CHUNK_SIZE])
+        if not chunk:
+            break
+
+        pks, timestamps, latitude, longitude = (np.array(column) for column in zip(*chunk))
+        sunrise, sunset = solar_day_events(timestamps, latitude.astype(float), longitude.astype(float))
+
+        Obsset.objects.bulk_update([Obsset(pk=pk, sunrise=round(sunrise_at), sunset=round(sunset_at))
+                                    for pk, sunrise_at, sunset_at in zip(pks.tolist(), sunrise.tolist(), sunset.tolist())],
+                                   ['sunrise', 'sunset'])
+        last_pk = chunk[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metload', '0009_latestobservation'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_solar_events, migrations.RunPython.noop),
+    ]
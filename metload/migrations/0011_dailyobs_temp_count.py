@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:10
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_temp_count(apps, schema_editor):
+    # Rollups written so far only ever counted observations that had a temperature.
+    DailyObs = apps.get_model('metload', 'DailyObs')
+    DailyObs.objects.update(temp_count=F('obs_count'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metload', '0010_obsset_solar_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailyobs',
+            name='temp_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_temp_count, migrations.RunPython.noop),
+    ]
@@ -1,34 +1,125 @@
 from django.db import models
 from locations.models import Location
 
+class ObsPoll(models.Model):
+    """ Metadata returned once per Open Weather Map request rather than once per station. """
+    requested_at = models.DateTimeField(blank=True, null=True)
+    quality_message = models.CharField(max_length=80, blank=True, null=True)
+    cod = models.CharField(max_length=50, blank=True, null=True)
+    city_count = models.IntegerField(blank=True, null=True)
+
+    def __str__(self):
+        return '{0} {1}'.format(self.requested_at, self.quality_message)
+
+
+class WeatherCondition(models.Model):
+    """ Dictionary of the Open Weather Map weather id, main, description and icon combinations seen so far. """
+    owm_id = models.IntegerField(blank=True, null=True)
+    main = models.CharField(max_length=20, blank=True, null=True)
+    description = models.CharField(max_length=40, blank=True, null=True)
+    icon = models.CharField(max_length=20, blank=True, null=True)
+
+    class Meta:
+        unique_together = ('owm_id', 'main', 'description', 'icon')
+
+    def __str__(self):
+        return '{0} ({1})'.format(self.description, self.icon)
+
+
 class Obsset(models.Model):
+    """ One station observation. Measurements are stored in metric units: C, hPa, %, m/s, degrees and mm. """
     location = models.ForeignKey(Location, on_delete=models.DO_NOTHING)
-    quality_message = models.CharField(max_length=80, blank=True, null=True)
+    poll = models.ForeignKey(ObsPoll, on_delete=models.DO_NOTHING, blank=True, null=True)
+    condition = models.ForeignKey(WeatherCondition, on_delete=models.DO_NOTHING, blank=True, null=True)
     datetime = models.IntegerField(blank=True, null=True)
-    cod = models.CharField(max_length=50, blank=True, null=True)
-    city_count = models.CharField(max_length=20, blank=True, null=True)
     site_id = models.CharField(max_length=20, blank=True, null=True)
     site_name = models.CharField(max_length=100, blank=True, null=True)
-    latitude = models.DecimalField(max_digits=10, decimal_places=6, blank=True, null=True)
-    longitude = models.DecimalField(max_digits=10, decimal_places=6, blank=True, null=True)
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
     sunrise = models.IntegerField(blank=True, null=True)
     sunset = models.IntegerField(blank=True, null=True)
-    temperature = models.DecimalField(max_digits=6, decimal_places=2, blank=True, null=True)
-    pressure = models.DecimalField(max_digits=6, decimal_places=2, blank=True, null=True)
-    humidity = models.DecimalField(max_digits=6, decimal_places=2, blank=True, null=True)
-    temp_min = models.DecimalField(max_digits=6, decimal_places=2, blank=True, null=True)
-    temp_max = models.DecimalField(max_digits=6, decimal_places=2, blank=True, null=True)
-    wind_speed = models.DecimalField(max_digits=6, decimal_places=2, blank=True, null=True)
-    wind_dir = models.DecimalField(max_digits=6, decimal_places=2, blank=True, null=True)
-    wind_gust = models.DecimalField(max_digits=6, decimal_places=2, blank=True, null=True)
-    rain_1h = models.DecimalField(max_digits=6, decimal_places=2, blank=True, null=True)
-    rain_3h = models.DecimalField(max_digits=6, decimal_places=2, blank=True, null=True)
-    snow = models.DecimalField(max_digits=6, decimal_places=2, blank=True, null=True)
-    weather_id = models.IntegerField(blank=True, null=True)
-    weather_main = models.CharField(max_length=20, blank=True, null=True)
-    weather_desc = models.CharField(max_length=20, blank=True, null=True)
-    weather_icon = models.CharField(max_length=20, blank=True, null=True)
-    st_clouds = models.CharField(max_length=20, blank=True, null=True)
+    temperature = models.FloatField(blank=True, null=True)
+    pressure = models.FloatField(blank=True, null=True)
+    humidity = models.FloatField(blank=True, null=True)
+    temp_min = models.FloatField(blank=True, null=True)
+    temp_max = models.FloatField(blank=True, null=True)
+    wind_speed = models.FloatField(blank=True, null=True)
+    wind_dir = models.FloatField(blank=True, null=True)
+    wind_gust = models.FloatField(blank=True, null=True)
+    rain_1h = models.FloatField(blank=True, null=True)
+    rain_3h = models.FloatField(blank=True, null=True)
+    snow = models.FloatField(blank=True, null=True)
+    clouds = models.SmallIntegerField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['site_id', 'datetime'], name='obsset_unique_site_datetime'),
+        ]
+        indexes = [
+            models.Index(fields=['location', 'datetime'], name='obsset_location_datetime'),
+        ]
 
     def __str__(self):
         return self.site_name
+
+
+class DerivedObs(models.Model):
+    """ ETo, GDU and the radiation and vapor intermediates for one observation, computed once at ingest. """
+    obs = models.OneToOneField(Obsset, on_delete=models.CASCADE, related_name='derived')
+    location = models.ForeignKey(Location, on_delete=models.DO_NOTHING)
+    datetime = models.IntegerField(blank=True, null=True)
+    fingerprint = models.CharField(max_length=40, db_index=True)
+    eto = models.FloatField(blank=True, null=True)
+    gdu = models.FloatField(blank=True, null=True)
+    r_a = models.FloatField(blank=True, null=True)
+    r_s = models.FloatField(blank=True, null=True)
+    r_so = models.FloatField(blank=True, null=True)
+    r_ns = models.FloatField(blank=True, null=True)
+    e_deg_t = models.FloatField(blank=True, null=True)
+    d = models.FloatField(blank=True, null=True)
+    e_a = models.FloatField(blank=True, null=True)
+    y = models.FloatField(blank=True, null=True)
+    r_n = models.FloatField(blank=True, null=True)
+    g = models.FloatField(blank=True, null=True)
+
+    def __str__(self):
+        return '{0} {1}'.format(self.location_id, self.datetime)
+
+
+class DailyObs(models.Model):
+    """ Per-site daily totals maintained at ingest. The cum_ columns are running totals through the end of the day. """
+    location = models.ForeignKey(Location, on_delete=models.DO_NOTHING)
+    day = models.IntegerField()  # days since the unix epoch, UTC
+    obs_count = models.IntegerField(default=0)
+    eto_sum = models.FloatField(default=0)
+    gdu_sum = models.FloatField(default=0)
+    rain_sum = models.FloatField(default=0)
+    temp_count = models.IntegerField(default=0)  # observations with a temperature
+    temp_sum = models.FloatField(default=0)  # C, kept so the mean can be updated incrementally
+    temp_min = models.FloatField(blank=True, null=True)  # C
+    temp_max = models.FloatField(blank=True, null=True)  # C
+    cum_eto = models.FloatField(default=0)
+    cum_gdu = models.FloatField(default=0)
+    cum_rain = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ('location', 'day')
+
+    @property
+    def temp_mean(self):
+        return self.temp_sum / self.temp_count if self.temp_count else None
+
+    def __str__(self):
+        return '{0} {1}'.format(self.location_id, self.day)
+
+
+class LatestObservation(models.Model):
+    """ The newest observation of each site, kept current at ingest for the map landing page. """
+    location = models.OneToOneField(Location, on_delete=models.DO_NOTHING, primary_key=True,
+                                    related_name='latest_observation')
+    obs = models.ForeignKey(Obsset, on_delete=models.CASCADE, related_name='+')
+    datetime = models.IntegerField()
+    temperature = models.FloatField(blank=True, null=True)  # C
+
+    def __str__(self):
+        return '{0} {1}'.format(self.location_id, self.datetime)
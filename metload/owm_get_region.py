@@ -1,8 +1,11 @@
 import requests
 from datetime import datetime as dt
-from metload.sunrise_sunset import sun_rise_set
+from ETo_py.solar_events import sun_rise_set
+from metload.owm_parse import decode
 
-def region_info(lat, lon, city_count, APPID, units):
+FIND_URL = 'https://api.openweathermap.org/data/2.5/find'
+
+def region_info(lat, lon, city_count, APPID, units, session=None, url=FIND_URL, timeout=None):
     """ Return current weather observation data for a number of cities about an origin.
 
     :param lat: Center latitude.
@@ -10,6 +13,9 @@ def region_info(lat, lon, city_count, APPID, units):
     :param city_count: Number of cities around the center that should be returned. Max is 50.
     :param APPID: Open Weather Map app ID from developer registration.
     :param units: Observation value units, 'metric', 'imperial'.
+    :param session: requests.Session to send the request through, a one-off connection is used when None.
+    :param url: find endpoint, overridden to point at a local stand-in server.
+    :param timeout: request timeout in seconds.
     :return: JSON from Open Weather Map request.
     """
 
@@ -23,8 +29,9 @@ def region_info(lat, lon, city_count, APPID, units):
 
     request_time = dt.now()
 
-    data = requests.get('https://api.openweathermap.org/data/2.5/find', params=payload)
-    data = data.json()
+    data = (session or requests).get(url, params=payload, timeout=timeout)
+    data.raise_for_status()
+    data = decode(data.content)
 
     return (data, request_time)
 
@@ -0,0 +1,144 @@
+import json
+import numpy as np
+from ETo_py.solar_events import solar_day_events
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Measurements as (column, section of the station object, key in the section). Missing values are NaN.
+NUMERIC_FIELDS = (
+    ('lat', 'coord', 'lat'),
+    ('lon', 'coord', 'lon'),
+    ('temp', 'main', 'temp'),
+    ('pressure', 'main', 'pressure'),
+    ('humidity', 'main', 'humidity'),
+    ('temp_min', 'main', 'temp_min'),
+    ('temp_max', 'main', 'temp_max'),
+    ('wind_speed', 'wind', 'speed'),
+    ('wind_dir', 'wind', 'deg'),
+    ('wind_gust', 'wind', 'gust'),
+    ('st_clouds', 'clouds', 'all'),
+)
+
+# Precipitation volumes as (column, section, keys tried in order). OWM leaves the section out when nothing fell and
+# reports snow either as a number or by period.
+PRECIPITATION_FIELDS = (
+    ('rain_1h', 'rain', ('1h',)),
+    ('rain_3h', 'rain', ('3h',)),
+    ('snow', 'snow', ('1h', '3h')),
+)
+
+# Fields of the first weather condition as (column, key).
+WEATHER_FIELDS = (
+    ('weather_id', 'id'),
+    ('weather_main', 'main'),
+    ('weather_desc', 'description'),
+    ('weather_icon', 'icon'),
+)
+
+
+def decode(content):
+    """ Decode a JSON response body, with orjson when it is installed. """
+
+    if orjson is not None:
+        return orjson.loads(content)
+
+    return json.loads(content)
+
+
+def volume(section, keys):
+    if isinstance(section, dict):
+        for key in keys:
+            if section.get(key) is not None:
+                return section[key]
+        return None
+
+    return section
+
+
+def parse_columns(owm_data):
+    """
+    Extract the stations of a find response into one column per field, driven by the field tables above. Stations are
+    keyed by site_id: a station listed twice is kept once, and stations sharing a name are all kept.
+
+    :param owm_data: decoded find response
+    :return: dictionary of columns, int64 arrays for site_id and datetime, float arrays for measurements with NaN where
+        missing, sunrise and sunset as unix timestamps and lists for names and weather text, plus the message, cod and
+        count of the response
+    """
+
+    met = owm_data.get('list') or []
+
+    ids = [st['id'] for st in met]
+    if len(set(ids)) < len(ids):
+        first = {}
+        for i, site_id in enumerate(ids):
+            first.setdefault(site_id, i)
+        met = [met[i] for i in sorted(first.values())]
+        ids = [st['id'] for st in met]
+
+    # Each section of every station is looked up once, missing values become NaN in the float arrays.
+    sections = {section: [st.get(section) or {} for st in met]
+                for section in {field[1] for field in NUMERIC_FIELDS + PRECIPITATION_FIELDS}}
+    conditions = [(st.get('weather') or [{}])[0] for st in met]
+
+    columns = {
+        'message': owm_data.get('message'),
+        'cod': owm_data.get('cod'),
+        'count': owm_data.get('count'),
+        'site_id': np.array(ids, dtype=np.int64),
+        'site_name': [st.get('name') for st in met],
+        'datetime': np.array([st['dt'] for st in met], dtype=np.int64),
+    }
+
+    for column, section, key in NUMERIC_FIELDS:
+        columns[column] = np.array([values.get(key) for values in sections[section]], dtype=float)
+
+    for column, section, keys in PRECIPITATION_FIELDS:
+        columns[column] = np.nan_to_num(np.array([volume(values, keys) for values in sections[section]], dtype=float))
+
+    # The condition id is numeric, the rest is text.
+    for column, key in WEATHER_FIELDS:
+        values = [condition.get(key) for condition in conditions]
+        columns[column] = np.array(values, dtype=float) if key == 'id' else \
+            ['NaN' if value is None else value for value in values]
+
+    # Sunrise and sunset of each station's own day and position, stored with the observation.
+    columns['sunrise'], columns['sunset'] = solar_day_events(columns['datetime'], columns['lat'], columns['lon'])
+
+    return columns
+
+
+STATION_FIELDS = ('site_id', 'site_name', 'datetime') + tuple(f[0] for f in NUMERIC_FIELDS) + \
+                 tuple(f[0] for f in PRECIPITATION_FIELDS) + tuple(f[0] for f in WEATHER_FIELDS) + ('sunrise', 'sunset')
+
+
+def parse_stations(owm_data):
+    """
+    Parse a find response into the station dictionaries load_observations takes, keyed by site_id. A drop-in for
+    parse_met_vars, which keys stations by name and gives all of them the sunrise and sunset of Lubbock.
+
+    :param owm_data: decoded find response
+    :return: dictionary of station dictionaries keyed by site_id
+    """
+
+    columns = parse_columns(owm_data)
+
+    common = {
+        'quality_message': columns['message'] or 'NaN',
+        'cod': columns['cod'] or 'NaN',
+        'city_count': columns['count'] or 'NaN',
+    }
+
+    values = [columns[field].tolist() if isinstance(columns[field], np.ndarray) else columns[field]
+              for field in STATION_FIELDS]
+
+    stations = {}
+    for row in zip(*values):
+        station = dict(zip(STATION_FIELDS, row))
+        station.update(common)
+        stations[str(row[0])] = station
+
+    return stations
@@ -0,0 +1,213 @@
+import math
+import numpy as np
+from django.db import transaction
+from django.db.models import F, Max, Q
+from metload.models import Obsset, DailyObs
+
+SECONDS_PER_DAY = 86400
+CUMULATIVE_FIELDS = (('eto_sum', 'cum_eto'), ('gdu_sum', 'cum_gdu'), ('rain_sum', 'cum_rain'))
+
+
+def day_of(timestamp):
+    """ Day of a unix timestamp as DailyObs.day, days since the epoch. Days are UTC days whatever the site. """
+
+    return int(timestamp) // SECONDS_PER_DAY
+
+
+def present(value):
+    return value is not None and not math.isnan(value)
+
+
+def obs_values(ob):
+    """
+    The values an observation contributes to its daily rollup, the derived row must be attached. Missing readings
+    are stored as NULL and derive to NaN, they add nothing to the sums and the temperature is left out.
+    """
+
+    return {
+        'eto': ob.derived.eto if present(ob.derived.eto) else 0,
+        'gdu': ob.derived.gdu if present(ob.derived.gdu) else 0,
+        'rain': ob.rain_1h if present(ob.rain_1h) else 0,
+        'temp_c': ob.temperature if present(ob.temperature) else None,
+    }
+
+
+def add_to_day(row, values):
+    row.obs_count += 1
+    row.eto_sum += values['eto']
+    row.gdu_sum += values['gdu']
+    row.rain_sum += values['rain']
+
+    if values['temp_c'] is not None:
+        row.temp_count += 1
+        row.temp_sum += values['temp_c']
+        row.temp_min = values['temp_c'] if row.temp_min is None else min(row.temp_min, values['temp_c'])
+        row.temp_max = values['temp_c'] if row.temp_max is None else max(row.temp_max, values['temp_c'])
+
+
+def update_daily_rollups(observations):
+    """
+    Fold newly derived observations into the daily rollups. Call inside the ingest transaction.
+
+    In the usual case an observation falls on the latest stored day of its location or after it, and all such
+    locations are applied together with a fixed number of queries. Locations with an observation on an earlier day
+    are handled one day at a time, shifting the running totals of every later day by the same amount.
+
+    :param observations: saved Obsset instances with their DerivedObs attached as .derived
+    """
+
+    groups = {}
+    for ob in observations:
+        groups.setdefault((ob.location_id, day_of(ob.datetime)), []).append(obs_values(ob))
+
+    if not groups:
+        return
+
+    location_ids = {location_id for location_id, _ in groups}
+    latest_day = dict(DailyObs.objects.filter(location_id__in=location_ids).order_by()
+                                      .values_list('location_id').annotate(Max('day')))
+
+    backfill = {site for site, day in groups if day < latest_day.get(site, day)}
+    for (location_id, day), group in sorted(groups.items()):
+        if location_id in backfill:
+            update_daily_rollup(location_id, day, group)
+
+    groups = {key: group for key, group in groups.items() if key[0] not in backfill}
+
+    latest_rows = Q(pk__in=[])
+    for location_id, day in latest_day.items():
+        if location_id in backfill:
+            continue
+        latest_rows |= Q(location_id=location_id, day=day)
+
+    tails = {row.location_id: row for row in DailyObs.objects.select_for_update().filter(latest_rows)}
+    updated = []
+    created = []
+
+    for (location_id, day), group in sorted(groups.items()):
+        tail = tails.get(location_id)
+
+        if tail is not None and tail.day == day:
+            row = tail
+            updated.append(row)
+
+        else:
+            previous = {cum: getattr(tail, cum) for _, cum in CUMULATIVE_FIELDS} if tail is not None else {}
+            row = DailyObs(location_id=location_id, day=day, **previous)
+            created.append(row)
+
+        apply_to_day(row, group)
+        tails[location_id] = row
+
+    fields = [field.name for field in DailyObs._meta.concrete_fields if not field.primary_key]
+    DailyObs.objects.bulk_update(updated, fields)
+    DailyObs.objects.bulk_create(created)
+
+
+def apply_to_day(row, group):
+    """ Add a group of observation values to a day and carry the change into its running totals. """
+
+    before = {total: getattr(row, total) for total, _ in CUMULATIVE_FIELDS}
+    for values in group:
+        add_to_day(row, values)
+
+    deltas = {cum: getattr(row, total) - before[total] for total, cum in CUMULATIVE_FIELDS}
+    for cum, delta in deltas.items():
+        setattr(row, cum, getattr(row, cum) + delta)
+
+    return deltas
+
+
+def update_daily_rollup(location_id, day, group):
+    """ Add a group of observation values to one day, shifting the running totals of any later days. """
+
+    row = DailyObs.objects.select_for_update().filter(location_id=location_id, day=day).first()
+
+    if row is None:
+        previous = DailyObs.objects.filter(location_id=location_id, day__lt=day).order_by('-day') \
+                                   .values('cum_eto', 'cum_gdu', 'cum_rain').first()
+        row = DailyObs(location_id=location_id, day=day, **(previous or {}))
+
+    deltas = apply_to_day(row, group)
+    row.save()
+
+    DailyObs.objects.filter(location_id=location_id, day__gt=day) \
+                    .update(**{cum: F(cum) + delta for cum, delta in deltas.items()})
+
+
+def rebuild_daily_rollups(location_id):
+    """
+    Rebuild every daily rollup for a location from its derived observations.
+
+    :param location_id: Location primary key
+    :return: number of days written
+    """
+
+    days = {}
+    observations = Obsset.objects.filter(location_id=location_id, derived__isnull=False) \
+                                 .select_related('derived').order_by('datetime')
+
+    for ob in observations.iterator(chunk_size=2000):
+        day = day_of(ob.datetime)
+        if day not in days:
+            days[day] = DailyObs(location_id=location_id, day=day)
+        add_to_day(days[day], obs_values(ob))
+
+    running = {cum: 0 for _, cum in CUMULATIVE_FIELDS}
+    for day in sorted(days):
+        for total, cum in CUMULATIVE_FIELDS:
+            running[cum] += getattr(days[day], total)
+            setattr(days[day], cum, running[cum])
+
+    with transaction.atomic():
+        DailyObs.objects.filter(location_id=location_id).delete()
+        DailyObs.objects.bulk_create([days[day] for day in sorted(days)])
+
+    return len(days)
+
+
+def running_totals(location_id, day):
+    """ Running totals through the end of the given day, taken from the latest rollup on or before it. """
+
+    totals = DailyObs.objects.filter(location_id=location_id, day__lte=day).order_by('-day') \
+                             .values('cum_eto', 'cum_gdu', 'cum_rain').first()
+
+    return totals or {'cum_eto': 0.0, 'cum_gdu': 0.0, 'cum_rain': 0.0}
+
+
+def range_totals(location_id, start_stamp, end_stamp, series):
+    """
+    ETo, GDU and rain totals over [start_stamp, end_stamp]. Whole days come from the difference of two running
+    totals in the daily rollups, only the partial days at either edge of the range are summed from observations.
+    Days are UTC days as in day_of: a range from locations.views.date_range or metload.export.day_range starts at
+    UTC midnight, anything else is split at the UTC midnights inside it.
+
+    :param location_id: Location primary key
+    :param start_stamp: range start, unix timestamp
+    :param end_stamp: range end (inclusive), unix timestamp
+    :param series: column arrays of the observations in the range from metload.series.fetch_series, with datetime,
+                   eto, gdu and rain_1h columns
+    :return: dictionary of eto, gdu and rain totals
+    """
+
+    first_full_day = -(-int(start_stamp) // SECONDS_PER_DAY)
+    last_full_day = (int(end_stamp) + 1) // SECONDS_PER_DAY - 1
+
+    totals = {'eto': 0.0, 'gdu': 0.0, 'rain': 0.0}
+    columns = {'eto': series['eto'], 'gdu': series['gdu'], 'rain': series['rain_1h']}
+    edges = [slice(None)]
+
+    if first_full_day <= last_full_day:
+        before = running_totals(location_id, first_full_day - 1)
+        through = running_totals(location_id, last_full_day)
+        totals = {key: through['cum_' + key] - before['cum_' + key] for key in totals}
+
+        # Observations are ordered, so the partial days are a slice at either end.
+        full_start, full_end = np.searchsorted(series['datetime'], [first_full_day * SECONDS_PER_DAY,
+                                                                    (last_full_day + 1) * SECONDS_PER_DAY])
+        edges = [slice(None, full_start), slice(full_end, None)]
+
+    for key, column in columns.items():
+        totals[key] += float(sum(np.nansum(column[edge]) for edge in edges))
+
+    return totals
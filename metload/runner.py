@@ -0,0 +1,140 @@
+import fcntl
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from django.conf import settings
+from metload.archive import archive_responses
+from metload.fetcher import RegionFetcher, merge_regions
+from metload.ingest import load_observations
+from metload.owm_parse import parse_stations
+from metload.scheduler import PollScheduler, owm_bucket
+from metload.tiling import region_tiles
+
+logger = logging.getLogger()
+
+
+class IngestRunning(Exception):
+    """ Raised when another process holds the ingest lock. """
+
+
+@contextmanager
+def ingest_lock(path=None):
+    """
+    Single-flight lock around an ingest cycle, shared by runingest and the HTTP trigger. An advisory lock on a file is
+    released by the kernel when its holder exits, so a crashed run never leaves it stuck.
+
+    :param path: lock file, defaults to settings.INGEST_LOCK_FILE
+    :raises IngestRunning: when another ingest cycle is in progress
+    """
+
+    path = path or settings.INGEST_LOCK_FILE
+
+    with open(path, 'a') as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise IngestRunning('Another ingest cycle holds {0}'.format(path))
+
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def read_api_key(path=None):
+    with open(path or settings.OWM_API_KEY_FILE) as f:
+        return f.read().splitlines()[0]  # strip newlines
+
+
+def run_ingest(api_key=None, bucket=owm_bucket):
+    """
+    One ingest cycle: poll every region through the scheduler and store the observations. Holds the ingest lock
+    for the whole cycle.
+
+    :param api_key: OWM APPID, defaults to the contents of settings.OWM_API_KEY_FILE
+    :param bucket: TokenBucket the find requests are paced by
+    :raises IngestRunning: when another ingest cycle is in progress
+    :return: stored observations, number of queries used to store them and the poll scheduler stats
+    """
+
+    api_key = api_key or read_api_key()
+
+    with ingest_lock():
+        logger.warning('[INFO] Getting met data from OWM')
+
+        polled_at = time.time()
+
+        with RegionFetcher(api_key, units='metric', url=settings.OWM_FIND_URL) as fetcher:
+            scheduler = PollScheduler(fetcher, bucket, spread=settings.OWM_POLL_SPREAD)
+            results = scheduler.poll(region_tiles(), city_count=50)
+
+        stats = scheduler.stats()
+        logger.warning('[INFO] Poll scheduler: {0}'.format(stats))
+
+        for result in results:
+            if result.data is not None:
+                logger.warning('[INFO] Region {0}: {1} {2} {3} stations'.format(
+                    result.centre, result.data['message'], result.data['cod'], result.data['count']))
+
+        # Raw responses are kept before parsing, so a parser bug never loses data that replay_archive cannot restore.
+        if settings.OWM_ARCHIVE_DIR:
+            try:
+                archive_responses(results, fetcher.units, polled_at)
+            except (OSError, ImportError):
+                logger.exception('[INFO] Could not archive the raw responses')
+
+        cln_obs_data_all_sites = merge_regions(results, parse_stations)
+        observations, query_count = load_observations(cln_obs_data_all_sites.values(), units=fetcher.units,
+                                                      requested_at=datetime.fromtimestamp(polled_at, timezone.utc))
+
+    return observations, query_count, stats
+
+
+def next_run(now, interval, jitter=0):
+    """
+    Start of the next schedule slot. Slots are aligned to multiples of interval since the epoch (:00 and :30 for
+    half hourly runs) so restarts do not shift the schedule, plus up to jitter seconds of random delay.
+
+    :param now: unix timestamp
+    :param interval: seconds between runs
+    :param jitter: maximum random delay in seconds
+    :return: unix timestamp
+    """
+
+    return (now // interval + 1) * interval + random.uniform(0, jitter)
+
+
+def run_forever(stop, interval, jitter=0, run=run_ingest):
+    """
+    Run an ingest cycle at every schedule slot until stop is set. A cycle in progress is always finished, stop only
+    ends the wait between cycles.
+
+    :param stop: threading.Event
+    :param interval: seconds between runs
+    :param jitter: maximum random delay in seconds
+    :param run: the ingest cycle
+    """
+
+    while not stop.is_set():
+        due = next_run(time.time(), interval, jitter)
+        logger.warning('[INFO] Next ingest at {0}'.format(time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(due))))
+
+        if stop.wait(max(0.0, due - time.time())):
+            break
+
+        started = time.monotonic()
+        try:
+            observations, query_count, _ = run()
+            logger.warning('[INFO] Stored {0} observations with {1} queries in {2:.1f} s'.format(
+                len(observations), query_count, time.monotonic() - started))
+
+        except IngestRunning as e:
+            logger.warning('[INFO] Skipping ingest: {0}'.format(e))
+
+        except Exception:
+            logger.exception('[INFO] Ingest failed, retrying at the next slot')
+
+    logger.warning('[INFO] Ingest scheduler stopped (pid {0})'.format(os.getpid()))
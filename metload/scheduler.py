@@ -0,0 +1,191 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from django.conf import settings
+from metload.models import LatestObservation
+
+logger = logging.getLogger()
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter. Tokens refill continuously at rate per second up to capacity, each request takes one.
+    The clock and sleep functions can be replaced, e.g. by a simulated clock in tests.
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, requests_per_minute, burst=None):
+        return cls(requests_per_minute / 60, burst or requests_per_minute)
+
+    def refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """
+        Take a token, sleeping until one is available.
+
+        :return: seconds spent waiting
+        """
+
+        waited = 0.0
+        while True:
+            with self.lock:
+                self.refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+
+            self.sleep(delay)
+            waited += delay
+
+    def available(self):
+        with self.lock:
+            self.refill()
+            return self.tokens
+
+
+def tile_staleness(tiles, now=None):
+    """
+    Age in seconds of the stalest station of each tile, from LatestObservation. Stations never seen count as
+    infinitely stale, tiles without a station list get 0.
+
+    :param tiles: metload.tiling.Tile list
+    :return: list of ages in the order of tiles
+    """
+
+    now = now or time.time()
+    site_ids = {site_id for tile in tiles for site_id in tile.site_ids}
+    latest = dict(LatestObservation.objects.filter(location__site_id__in=site_ids)
+                                           .values_list('location__site_id', 'datetime'))
+
+    return [max((now - latest[site_id] if site_id in latest else float('inf') for site_id in tile.site_ids),
+                default=0) for tile in tiles]
+
+
+class PollScheduler:
+    """
+    Send a poll's find requests through a token bucket, spread evenly over a window rather than all at once, stalest
+    tiles first. A tile whose request fails, including a 429 or 5xx response, is put back in the queue and tried
+    again later in the same poll, every attempt takes a token. Queue depth and wait times are kept for monitoring,
+    see stats.
+    """
+
+    def __init__(self, fetcher, bucket, spread=0, max_attempts=3):
+        self.fetcher = fetcher
+        self.bucket = bucket
+        self.spread = spread
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.queue_depth = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.requeued = 0
+        self.wait_time_last = 0.0
+        self.wait_time_max = 0.0
+        self.wait_time_total = 0.0
+
+    def poll(self, tiles, city_count=50):
+        """
+        Fetch every tile of a poll.
+
+        :param tiles: metload.tiling.Tile list
+        :param city_count: stations asked for per tile
+        :return: TileResult for each tile, in the same order, failed tiles keep their last error
+        """
+
+        staleness = tile_staleness(tiles)
+        interval = self.spread / len(tiles) if tiles else 0
+        order = itertools.count()
+
+        started = time.monotonic()
+
+        # Most stale first, the position in the original list breaks ties.
+        queue = [(-staleness[i], next(order), i, 1, started) for i in range(len(tiles))]
+        heapq.heapify(queue)
+
+        results = [None] * len(tiles)
+        pending = {}
+        sent = 0
+
+        while queue or pending:
+            due = started + sent * interval
+
+            if queue and time.monotonic() >= due:
+                _, _, i, attempt, queued_at = heapq.heappop(queue)
+                self.bucket.acquire()
+                self.record_wait(time.monotonic() - queued_at, len(queue))
+
+                future = self.fetcher.executor.submit(self.fetcher.fetch_tile, tiles[i].centre, city_count)
+                pending[future] = (i, attempt)
+                sent += 1
+                continue
+
+            timeout = max(0.0, due - time.monotonic()) if queue else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                i, attempt = pending.pop(future)
+                results[i] = future.result()
+
+                with self.lock:
+                    self.in_flight -= 1
+
+                    if results[i].error is None:
+                        self.completed += 1
+
+                    elif attempt < self.max_attempts:
+                        self.requeued += 1
+                        heapq.heappush(queue, (-staleness[i], next(order), i, attempt + 1, time.monotonic()))
+
+                    else:
+                        self.failed += 1
+                        logger.warning('[INFO] Giving up on region {0} after {1} attempts'.format(
+                            tiles[i].centre, attempt))
+
+                    self.queue_depth = len(queue)
+
+        return results
+
+    def record_wait(self, waited, queue_depth):
+        with self.lock:
+            self.in_flight += 1
+            self.queue_depth = queue_depth
+            self.wait_time_last = waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+            self.wait_time_total += waited
+
+    def stats(self):
+        with self.lock:
+            sent = self.completed + self.failed + self.requeued + self.in_flight
+
+            return {
+                'queue_depth': self.queue_depth,
+                'in_flight': self.in_flight,
+                'completed': self.completed,
+                'failed': self.failed,
+                'requeued': self.requeued,
+                'wait_time_last': self.wait_time_last,
+                'wait_time_max': self.wait_time_max,
+                'wait_time_mean': self.wait_time_total / sent if sent else 0.0,
+                'tokens': self.bucket.available(),
+            }
+
+
+# Shared by every poll in the process, so back-to-back polls cannot exceed the plan's quota together.
+owm_bucket = TokenBucket.per_minute(getattr(settings, 'OWM_REQUESTS_PER_MINUTE', 60))
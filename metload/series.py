@@ -0,0 +1,137 @@
+import logging
+from itertools import islice
+import numpy as np
+from metload.models import Obsset
+from ETo_py.gdu import gdu_calc
+
+OBS_FIELDS = ('temperature', 'wind_speed', 'humidity', 'pressure', 'rain_1h')
+CHUNK_SIZE = 2000
+
+logger = logging.getLogger()
+
+
+def observations_in_range(location_name, start_stamp, end_stamp=None):
+    """ Observations of a location from start_stamp through end_stamp (inclusive), served by the composite index. """
+
+    observations = Obsset.objects.filter(location__name=location_name, datetime__gte=start_stamp)
+
+    if end_stamp is not None:
+        observations = observations.filter(datetime__lte=end_stamp)
+
+    return observations
+
+
+def check_underived(location_ids, start_stamp, end_stamp=None):
+    """
+    Look for observations in the range that have no derived values, those ingested before derived values were stored
+    at ingest. Page views only read, the backfill is left to the recompute_derived command. Usually this is a single
+    query that finds nothing.
+
+    :param location_ids: Location primary keys
+    :param start_stamp: range start, unix timestamp
+    :param end_stamp: range end (inclusive), unix timestamp
+    :return: number of observations without derived values
+    """
+
+    underived = Obsset.objects.filter(location__in=location_ids, datetime__gte=start_stamp, derived__isnull=True)
+
+    if end_stamp is not None:
+        underived = underived.filter(datetime__lte=end_stamp)
+
+    count = underived.count()
+    if count:
+        logger.warning('[INFO] {0} observations of locations {1} have no derived values, run manage.py '
+                       'recompute_derived'.format(count, list(location_ids)))
+
+    return count
+
+
+def fetch_series(location_name, start_stamp, end_stamp=None, fields=OBS_FIELDS, derived_fields=()):
+    """
+    Fetch a location's observations as one contiguous array per column rather than as model instances. Rows are
+    streamed from the database in chunks (a server-side cursor where the backend supports one), missing values come
+    back as NaN.
+
+    :param location_name: Location name
+    :param start_stamp: range start, unix timestamp
+    :param end_stamp: range end (inclusive), unix timestamp, defaults to open ended
+    :param fields: Obsset columns to fetch
+    :param derived_fields: DerivedObs columns to fetch, e.g. ('eto', 'gdu')
+    :return: dictionary of float arrays keyed by field name plus an int64 'datetime' array, ordered by datetime
+    """
+
+    columns = list(fields) + ['derived__' + field for field in derived_fields]
+    rows = observations_in_range(location_name, start_stamp, end_stamp).order_by('datetime') \
+        .values_list('datetime', *columns).iterator(chunk_size=CHUNK_SIZE)
+
+    chunks = []
+    while True:
+        chunk = list(islice(rows, CHUNK_SIZE))
+        if not chunk:
+            break
+        chunks.append(np.array(chunk, dtype=float).reshape(-1, len(columns) + 1))
+
+    data = np.concatenate(chunks) if chunks else np.empty((0, len(columns) + 1))
+
+    series = {'datetime': data[:, 0].astype(np.int64)}
+    for i, field in enumerate(list(fields) + list(derived_fields)):
+        series[field] = np.ascontiguousarray(data[:, i + 1])
+
+    return series
+
+
+def fetch_matrix(locations, start_stamp, end_stamp, fields=OBS_FIELDS, derived_fields=('eto', 'gdu'), gdu_params=None,
+                 period=1800):
+    """
+    Fetch several locations at once as a site x time matrix per field. All sites are read with a single query ordered
+    by (location, datetime). Observations are placed in the period they fall in, a later observation in the same
+    period replaces an earlier one, and periods without an observation are NaN.
+
+    :param locations: Location instances
+    :param start_stamp: range start, unix timestamp
+    :param end_stamp: range end (inclusive), unix timestamp
+    :param fields: Obsset columns to fetch
+    :param derived_fields: DerivedObs columns to fetch
+    :param gdu_params: gdu_base and gdu_max, when given GDU is recomputed for every site in one vectorized pass
+    :param period: length of the time slots in seconds
+    :return: period start timestamps [int64 array] and a dictionary of (site, time) float arrays keyed by field
+    """
+
+    location_ids = [location.pk for location in locations]
+
+    check_underived(location_ids, start_stamp, end_stamp)
+
+    names = list(fields) + list(derived_fields)
+    columns = ['location_id', 'datetime'] + list(fields) + ['derived__' + field for field in derived_fields]
+    rows = Obsset.objects.filter(location__in=location_ids, datetime__gte=start_stamp, datetime__lte=end_stamp) \
+                         .order_by('location', 'datetime').values_list(*columns).iterator(chunk_size=CHUNK_SIZE)
+
+    chunks = []
+    while True:
+        chunk = list(islice(rows, CHUNK_SIZE))
+        if not chunk:
+            break
+        chunks.append(np.array(chunk, dtype=float).reshape(-1, len(columns)))
+
+    data = np.concatenate(chunks) if chunks else np.empty((0, len(columns)))
+
+    if gdu_params and 'gdu' in names and 'temperature' in names:
+        data[:, 2 + names.index('gdu')] = gdu_calc(data[:, 2 + names.index('temperature')], **gdu_params)
+
+    ids = np.array(location_ids, dtype=float)
+    order = np.argsort(ids)
+    sites = order[np.searchsorted(ids[order], data[:, 0])]
+    slots = (data[:, 1].astype(np.int64) // period) * period
+    timestamps, times = np.unique(slots, return_inverse=True)
+
+    # Rows are ordered by site and time, so the last row of each (site, slot) run is the one kept.
+    keep = np.ones(len(data), dtype=bool)
+    keep[:-1] = (sites[:-1] != sites[1:]) | (times[:-1] != times[1:])
+
+    matrix = {}
+    for i, field in enumerate(names):
+        values = np.full((len(location_ids), len(timestamps)), np.nan)
+        values[sites[keep], times[keep]] = data[keep, 2 + i]
+        matrix[field] = values
+
+    return timestamps, matrix
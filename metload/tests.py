@@ -1,3 +1,736 @@
-from django.test import TestCase
+import calendar
+import copy
+import math
+import os
+import tempfile
+import time
+from datetime import date, datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import numpy as np
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from locations.models import Location
+from locations.views import date_range
+from metload import ingest
+from metload.fakeowm import FakeOWM, FakeOWMServer, load_sample
+from metload.fetcher import RegionFetcher, TileResult, merge_regions
+from metload.ingest import load_observations
+from metload.archive import archive_responses, read_archive, replay
+from metload.models import Obsset, DailyObs, DerivedObs, LatestObservation, ObsPoll
+from metload.owm_get_region import parse_met_vars
+from metload.owm_parse import STATION_FIELDS, parse_stations
+from metload.runner import IngestRunning, ingest_lock, next_run
+from metload.scheduler import PollScheduler, TokenBucket
+from metload.tiling import GridIndex, Station, Tile, plan_tiles
+from metload.derived import derive_columns
+from metload.export import day_range
+from metload.rollups import SECONDS_PER_DAY, range_totals, rebuild_daily_rollups
+from metload.series import check_underived, fetch_series
+from ETo_py.eto import EToEstimator
+from ETo_py.eto_batch import EToBatch
+from ETo_py.eto_cache import eto_result_cache
 
-# Create your tests here.
+
+class IngestTestCase(TestCase):
+    """ Radiation tables are written to a scratch directory and the ingest cache of last seen stations is emptied. """
+
+    def setUp(self):
+        scratch = tempfile.TemporaryDirectory()
+        self.addCleanup(scratch.cleanup)
+        settings_override = override_settings(RADIATION_TABLE_DIR=scratch.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        ingest.last_seen.clear()
+        self.addCleanup(ingest.last_seen.clear)
+
+        self.sample = load_sample()
+
+    def add_locations(self, stations):
+        return [Location.objects.create(name=st['name'], site_id=str(st['id']), latitude=st['coord']['lat'],
+                                        longitude=st['coord']['lon']) for st in stations]
+
+    def response(self, stations):
+        return {'message': 'accurate', 'cod': '200', 'count': len(stations), 'list': stations}
+
+
+class MissingReadingsTests(IngestTestCase):
+
+    def test_missing_readings_are_stored_as_null(self):
+        stations = copy.deepcopy(self.sample['list'][:3])
+        del stations[0]['main']['humidity']
+        del stations[1]['main']['temp']
+        self.add_locations(stations)
+
+        stored, _ = load_observations(parse_stations(self.response(stations)).values(), units='imperial')
+
+        self.assertEqual(len(stored), 3)
+        by_site = {ob.site_id: ob for ob in Obsset.objects.select_related('derived')}
+        self.assertIsNone(by_site[str(stations[0]['id'])].humidity)
+        self.assertIsNone(by_site[str(stations[1]['id'])].temperature)
+        self.assertIsNone(by_site[str(stations[0]['id'])].derived.eto)
+        self.assertIsNotNone(by_site[str(stations[2]['id'])].derived.eto)
+
+        day = DailyObs.objects.get(location__site_id=str(stations[1]['id']))
+        self.assertEqual((day.obs_count, day.temp_count), (1, 0))
+        self.assertIsNone(day.temp_mean)
+
+
+class UnderivedObservationsTests(IngestTestCase):
+
+    def test_page_views_do_not_write(self):
+        stations = self.sample['list'][:3]
+        self.add_locations(stations)
+        stored, _ = load_observations(parse_stations(self.response(stations)).values(), units='imperial')
+        DerivedObs.objects.all().delete()
+        rollups = list(DailyObs.objects.values_list('location_id', 'day', 'obs_count', 'eto_sum'))
+
+        location_ids = [ob.location_id for ob in stored]
+        self.assertEqual(check_underived(location_ids, 0), len(stored))
+        self.assertEqual(check_underived(location_ids[:1], 0), 1)
+        self.assertEqual(DerivedObs.objects.count(), 0)
+        self.assertEqual(list(DailyObs.objects.values_list('location_id', 'day', 'obs_count', 'eto_sum')), rollups)
+
+
+class ArchiveReplayTests(IngestTestCase):
+    """ Responses written with archive_responses, read back with read_archive and loaded with replay. """
+
+    first_poll = 1718928000
+
+    def setUp(self):
+        super().setUp()
+        scratch = tempfile.TemporaryDirectory()
+        self.addCleanup(scratch.cleanup)
+        self.directory = scratch.name
+
+        self.owm = FakeOWM(stations=30, clock=self.first_poll, seed=0)
+        for station in self.owm.station_list():
+            Location.objects.create(name=station.name, site_id=station.site_id, latitude=station.lat,
+                                    longitude=station.lon)
+
+        # Three polls of two overlapping regions each.
+        centres = [(s.lat, s.lon) for s in self.owm.station_list()[:2]]
+        for poll in range(3):
+            results = [TileResult(centre, self.owm.find(centre[0], centre[1], 20, units='metric'), None, None)
+                       for centre in centres]
+            archive_responses(results, 'metric', self.owm.now(), directory=self.directory, compression='gzip')
+            self.owm.advance(1800)
+
+    def replay(self, **kwargs):
+        day = date(2024, 6, 21)
+        return replay(read_archive(day, day, directory=self.directory), **kwargs)
+
+    def stored(self):
+        return list(Obsset.objects.order_by('site_id', 'datetime')
+                                  .values_list('site_id', 'datetime', 'temperature', 'derived__eto'))
+
+    def test_round_trip(self):
+        totals = self.replay(batch_size=2)
+
+        self.assertEqual((totals['responses'], totals['polls']), (6, 3))
+        self.assertEqual(totals['observations'], Obsset.objects.count())
+        self.assertEqual(Obsset.objects.filter(derived__isnull=True).count(), 0)
+        # One ObsPoll per archived poll, each holding the stations of both of its regions.
+        self.assertEqual(ObsPoll.objects.count(), 3)
+        self.assertEqual(len({ob.poll_id for ob in Obsset.objects.all()}), 3)
+
+        ingest.last_seen.clear()
+        self.assertEqual(self.replay()['observations'], 0)
+
+    def test_replace_corrects_stored_observations(self):
+        self.replay()
+        loaded = self.stored()
+        rollups = list(DailyObs.objects.order_by('location_id', 'day')
+                                       .values_list('location_id', 'day', 'obs_count', 'temp_sum', 'eto_sum'))
+
+        # Stand-in for rows written by a parser that has since been fixed.
+        Obsset.objects.update(temperature=-40)
+        ingest.last_seen.clear()
+
+        self.assertEqual(self.replay()['observations'], 0)
+        self.assertTrue(all(row[2] == -40 for row in self.stored()))
+
+        ingest.last_seen.clear()
+        totals = self.replay(replace=True)
+
+        self.assertEqual(totals['replaced'], len(loaded))
+        self.assertEqual(self.stored(), loaded)
+        self.assertEqual(list(DailyObs.objects.order_by('location_id', 'day')
+                                              .values_list('location_id', 'day', 'obs_count', 'temp_sum', 'eto_sum')),
+                         rollups)
+        self.assertEqual(LatestObservation.objects.count(), len({row[0] for row in loaded}))
+
+
+class ParseStationsTests(SimpleTestCase):
+
+    def setUp(self):
+        self.sample = load_sample()
+
+    def missing(self, value):
+        return value in ('NaN', 'Nan') or (isinstance(value, float) and math.isnan(value))
+
+    def test_matches_parse_met_vars(self):
+        by_name = parse_met_vars(self.sample)
+        stations = parse_stations(self.sample)
+
+        # parse_met_vars keeps the last station listed under a name, and gives every station Lubbock's sunrise and
+        # sunset rather than their own.
+        fields = set(STATION_FIELDS) - {'sunrise', 'sunset'}
+        for name, old in by_name.items():
+            new = stations[str(old['site_id'])]
+            self.assertEqual(new.keys(), old.keys())
+
+            for field in fields | {'quality_message', 'cod', 'city_count'}:
+                if self.missing(old[field]):
+                    self.assertTrue(self.missing(new[field]), '{0} {1}'.format(name, field))
+                else:
+                    self.assertEqual(new[field], old[field], '{0} {1}'.format(name, field))
+
+    def test_stations_sharing_a_name_are_kept(self):
+        lubbock = [str(st['id']) for st in self.sample['list'] if st['name'] == 'Lubbock']
+        stations = parse_stations(self.sample)
+
+        self.assertEqual(len(lubbock), 2)
+        self.assertEqual(len(stations), len({st['id'] for st in self.sample['list']}))
+        for site_id in lubbock:
+            self.assertEqual(stations[site_id]['site_name'], 'Lubbock')
+        self.assertEqual(len(parse_met_vars(self.sample)), len(stations) - 1)
+
+    def test_repeated_station_is_kept_once(self):
+        sample = copy.deepcopy(self.sample)
+        sample['list'].append(copy.deepcopy(sample['list'][3]))
+
+        self.assertEqual(parse_stations(sample).keys(), parse_stations(self.sample).keys())
+
+
+class IdempotentIngestTests(IngestTestCase):
+
+    def daily_sums(self):
+        return list(DailyObs.objects.order_by('location_id', 'day')
+                                    .values_list('location_id', 'day', 'obs_count', 'eto_sum', 'gdu_sum', 'rain_sum',
+                                                 'cum_eto', 'cum_gdu', 'cum_rain'))
+
+    def load_twice(self):
+        stations = self.sample['list'][:10]
+        self.add_locations(stations)
+
+        first, _ = load_observations(parse_stations(self.response(stations)).values(), units='imperial')
+        rows, sums = Obsset.objects.count(), self.daily_sums()
+        second, _ = load_observations(parse_stations(self.response(stations)).values(), units='imperial')
+
+        self.assertEqual(len(first), 10)
+        self.assertEqual(second, [])
+        self.assertEqual(Obsset.objects.count(), rows)
+        self.assertEqual(self.daily_sums(), sums)
+
+    def test_repeated_cycle_is_skipped(self):
+        self.load_twice()
+
+    def test_repeated_cycle_is_ignored_by_the_unique_constraint(self):
+        # Without the last seen check every row of the second cycle reaches the insert and conflicts.
+        with mock.patch('metload.ingest.skip_unchanged', side_effect=lambda stations: list(stations)):
+            self.load_twice()
+
+
+class DailyRollupTests(IngestTestCase):
+    """ Daily rollups kept at ingest, checked against a rebuild from the stored observations. """
+
+    first_day = 19800
+
+    def setUp(self):
+        super().setUp()
+        self.station = copy.deepcopy(self.sample['list'][0])
+        self.location = self.add_locations([self.station])[0]
+
+    def load_at(self, stamps):
+        # One cycle per observation, a find response lists each station once.
+        for i, stamp in enumerate(stamps):
+            station = copy.deepcopy(self.station)
+            station['dt'] = int(stamp)
+            station['main']['temp'] += i % 7
+            station['rain'] = {'1h': 0.25 * (i % 3)}
+            load_observations(parse_stations(self.response([station])).values(), units='imperial')
+
+    def day_stamps(self, day, count=6):
+        return [(self.first_day + day) * SECONDS_PER_DAY + k * 14400 + 600 for k in range(count)]
+
+    def rollups(self):
+        return list(DailyObs.objects.filter(location=self.location).order_by('day')
+                                    .values_list('day', 'obs_count', 'eto_sum', 'gdu_sum', 'rain_sum', 'cum_eto',
+                                                 'cum_gdu', 'cum_rain'))
+
+    def assertMatchesRebuild(self):
+        kept = self.rollups()
+        rebuild_daily_rollups(self.location.pk)
+        rebuilt = self.rollups()
+
+        self.assertEqual(len(kept), len(rebuilt))
+        for kept_day, rebuilt_day in zip(kept, rebuilt):
+            self.assertEqual(kept_day[:2], rebuilt_day[:2])
+            for kept_value, rebuilt_value in zip(kept_day[2:], rebuilt_day[2:]):
+                self.assertAlmostEqual(kept_value, rebuilt_value, places=9)
+
+    def test_running_totals(self):
+        self.load_at(self.day_stamps(0) + self.day_stamps(1) + self.day_stamps(2))
+
+        rollups = self.rollups()
+        self.assertEqual([row[0] for row in rollups], [self.first_day, self.first_day + 1, self.first_day + 2])
+        for column, cumulative in ((2, 5), (3, 6), (4, 7)):
+            running = np.cumsum([row[column] for row in rollups])
+            for row, expected in zip(rollups, running.tolist()):
+                self.assertAlmostEqual(row[cumulative], expected, places=9)
+        self.assertMatchesRebuild()
+
+    def test_backfill_shifts_later_days(self):
+        self.load_at(self.day_stamps(0) + self.day_stamps(2))
+        later_before = self.rollups()[-1]
+
+        self.load_at(self.day_stamps(1, count=3))
+
+        rollups = self.rollups()
+        self.assertEqual(len(rollups), 3)
+        self.assertEqual(rollups[-1][1:5], later_before[1:5])
+        self.assertAlmostEqual(rollups[-1][5] - later_before[5], rollups[1][2])
+        self.assertAlmostEqual(rollups[-1][7] - later_before[7], rollups[1][4])
+        self.assertMatchesRebuild()
+
+    def test_range_totals_with_partial_edge_days(self):
+        self.load_at(self.day_stamps(0) + self.day_stamps(1) + self.day_stamps(2) + self.day_stamps(3))
+
+        start_stamp = (self.first_day + 0.5) * SECONDS_PER_DAY
+        end_stamp = (self.first_day + 3.5) * SECONDS_PER_DAY
+        for start, end in ((start_stamp, end_stamp), (start_stamp, start_stamp + 3600 * 8),
+                           (self.first_day * SECONDS_PER_DAY, (self.first_day + 4) * SECONDS_PER_DAY - 1)):
+            series = fetch_series(self.location.name, start, end, derived_fields=('eto', 'gdu'))
+            totals = range_totals(self.location.pk, start, end, series)
+
+            self.assertAlmostEqual(totals['eto'], float(np.nansum(series['eto'])), places=9)
+            self.assertAlmostEqual(totals['gdu'], float(np.nansum(series['gdu'])), places=9)
+            self.assertAlmostEqual(totals['rain'], float(np.nansum(series['rain_1h'])), places=9)
+
+
+    @override_settings(TIME_ZONE='America/Chicago')
+    def test_selected_days_are_rollup_days(self):
+        self.load_at(self.day_stamps(0) + self.day_stamps(1) + self.day_stamps(2) + self.day_stamps(3))
+        first, last = (datetime.fromtimestamp((self.first_day + day) * SECONDS_PER_DAY, timezone.utc).date()
+                       for day in (1, 2))
+
+        start, end = day_range(first.isoformat(), last.isoformat())
+        self.assertEqual((start, end), ((self.first_day + 1) * SECONDS_PER_DAY,
+                                        (self.first_day + 3) * SECONDS_PER_DAY - 1))
+        self.assertEqual(date_range(first.strftime('%m/%d/%Y'), last.strftime('%m/%d/%Y'))[0], start)
+
+        # Both days are whole rollup days, no observation is summed at the edges.
+        series = fetch_series(self.location.name, start, end, derived_fields=('eto', 'gdu'))
+        with mock.patch('metload.rollups.np.nansum', side_effect=np.nansum) as nansum:
+            totals = range_totals(self.location.pk, start, end, series)
+        self.assertEqual([len(edge) for (edge,), _ in nansum.call_args_list], [0] * 6)
+
+        days = DailyObs.objects.filter(location=self.location, day__in=[self.first_day + 1, self.first_day + 2])
+        self.assertAlmostEqual(totals['eto'], sum(day.eto_sum for day in days), places=9)
+        self.assertAlmostEqual(totals['rain'], float(np.nansum(series['rain_1h'])), places=9)
+
+class ExportRangeTests(IngestTestCase):
+
+    def test_web_export_matches_the_command(self):
+        station = copy.deepcopy(self.sample['list'][0])
+        self.add_locations([station])
+        days = [date(2024, 6, 20), date(2024, 6, 21), date(2024, 6, 22)]
+        for day in days:
+            for hour in (0, 12, 23):
+                station['dt'] = calendar.timegm(day.timetuple()) + hour * 3600 + 600
+                load_observations(parse_stations(self.response([station])).values(), units='imperial')
+
+        response = self.client.get('/locations/api/export', {'site': station['name'], 'selectstartdate': '06/20/2024',
+                                                              'selectenddate': '06/21/2024'})
+        web = b''.join(response.streaming_content).decode()
+        with tempfile.NamedTemporaryFile('r', newline='', suffix='.csv') as out:
+            call_command('export_observations', '--site', station['name'], '--start', '2024-06-20', '--end',
+                         '2024-06-21', '--output', out.name)
+            command = out.read()
+
+        self.assertEqual(web, command)
+        # Header and the observations of both days, the last one included.
+        self.assertEqual(len(web.splitlines()), 1 + 6)
+
+
+class FailingOWM(FakeOWM):
+    """ FakeOWM that answers the first requests for some region centres with a 503. """
+
+    def __init__(self, failures, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = dict(failures)
+
+    def handle(self, path, query):
+        centre = (float(query['lat'][0]), float(query['lon'][0]))
+
+        with self.lock:
+            failed = self.failures.get(centre, 0) > 0
+            if failed:
+                self.failures[centre] -= 1
+                self.requests += 1
+                self.errors += 1
+
+        if failed:
+            return 503, {'cod': '503', 'message': 'Simulated error'}
+
+        return super().handle(path, query)
+
+
+class RegionFetcherTests(SimpleTestCase):
+    """ RegionFetcher against the local stand-in OWM server. """
+
+    appid = 'secret-app-id'
+
+    def setUp(self):
+        self.owm = FakeOWM(stations=200, clock=1718928000, seed=0)
+        self.centres = [(s.lat, s.lon) for s in self.owm.station_list()[:200:40]]
+
+    def serve(self, owm):
+        server = FakeOWMServer(owm).__enter__()
+        self.addCleanup(server.__exit__)
+        fetcher = RegionFetcher(self.appid, url=server.url)
+        self.addCleanup(fetcher.close)
+
+        return fetcher
+
+    def test_regions_are_fetched_concurrently(self):
+        self.owm.latency = 0.2
+        fetcher = self.serve(self.owm)
+
+        began = time.perf_counter()
+        results = fetcher.fetch(self.centres, city_count=10)
+        elapsed = time.perf_counter() - began
+
+        self.assertEqual([result.centre for result in results], self.centres)
+        self.assertTrue(all(result.error is None and result.data['count'] == 10 for result in results))
+        # Five regions one after another would take a second.
+        self.assertLess(elapsed, 0.2 * len(self.centres) / 2)
+
+    def test_failed_region_does_not_stop_the_others(self):
+        owm = FailingOWM({self.centres[2]: 100}, stations=200, clock=1718928000, seed=0)
+        fetcher = self.serve(owm)
+
+        with self.assertLogs(level='WARNING') as logs:
+            results = fetcher.fetch(self.centres, city_count=10)
+
+        self.assertIsNotNone(results[2].error)
+        self.assertIsNone(results[2].data)
+        self.assertTrue(all(result.error is None for i, result in enumerate(results) if i != 2))
+        self.assertGreater(len(merge_regions(results, parse_stations)), 10)
+
+        # The failed request's URL carries the app ID, the log does not.
+        output = '\n'.join(logs.output)
+        self.assertIn('<APPID>', output)
+        self.assertNotIn(self.appid, output)
+
+    def test_error_response_is_not_retried_by_the_session(self):
+        owm = FailingOWM({self.centres[0]: 1}, stations=200, clock=1718928000, seed=0)
+        fetcher = self.serve(owm)
+
+        with self.assertLogs(level='WARNING'):
+            result = fetcher.fetch_tile(self.centres[0], city_count=10)
+
+        self.assertIsNotNone(result.error)
+        self.assertEqual(owm.requests, 1)
+
+
+class PollRetryTests(TestCase):
+
+    def test_503_is_retried_by_the_scheduler_and_succeeds(self):
+        owm = FailingOWM({}, stations=200, clock=1718928000, seed=0)
+        centres = [(s.lat, s.lon) for s in owm.station_list()[:200:40]]
+        owm.failures = {centres[1]: 1}
+        tiles = [Tile(centre, []) for centre in centres]
+        bucket = TokenBucket(rate=1e-6, capacity=100)
+
+        with FakeOWMServer(owm) as server, RegionFetcher('secret-app-id', url=server.url) as fetcher:
+            scheduler = PollScheduler(fetcher, bucket)
+            with self.assertLogs(level='WARNING'):
+                results = scheduler.poll(tiles, city_count=10)
+
+        self.assertTrue(all(result.error is None for result in results))
+        self.assertEqual(scheduler.stats()['requeued'], 1)
+        # Every request, the failed one included, took a token.
+        self.assertEqual(owm.requests, len(tiles) + 1)
+        self.assertAlmostEqual(bucket.available(), 100 - owm.requests, places=3)
+
+
+class TilingTests(SimpleTestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.lat = rng.uniform(30, 37, 2000)
+        self.lon = rng.uniform(-106, -98, 2000)
+        self.queries = np.column_stack([rng.uniform(29, 38, 50), rng.uniform(-107, -97, 50)])
+
+    def brute_force(self, lat, lon, k):
+        distance = np.hypot(self.lat - lat, (self.lon - lon) * np.cos(np.radians(lat)))
+        return np.argsort(distance, kind='stable')[:k]
+
+    def test_nearest_matches_brute_force(self):
+        index = GridIndex(self.lat, self.lon)
+
+        for lat, lon in self.queries.tolist():
+            for k in (1, 10, 50):
+                np.testing.assert_array_equal(index.nearest(lat, lon, k), self.brute_force(lat, lon, k))
+
+    def test_every_target_is_among_the_nearest_of_a_centre(self):
+        universe = [Station(str(i), 'Station {0}'.format(i), lat, lon)
+                    for i, (lat, lon) in enumerate(zip(self.lat.tolist(), self.lon.tolist()))]
+        targets = universe[::7]
+
+        tiles = plan_tiles(targets, universe)
+
+        covered = set()
+        for tile in tiles:
+            nearest = {str(i) for i in self.brute_force(tile.centre[0], tile.centre[1], 50).tolist()}
+            self.assertLessEqual(set(tile.site_ids), nearest)
+            covered |= set(tile.site_ids)
+        self.assertEqual(covered, {station.site_id for station in targets})
+        self.assertLess(len(tiles), len(targets))
+
+
+class FakeClock:
+    """ A monotonic clock that only moves when slept on or advanced. """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TokenBucketTests(SimpleTestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        # 60 requests a minute with bursts of 5.
+        self.bucket = TokenBucket(rate=1, capacity=5, clock=self.clock, sleep=self.clock.sleep)
+
+    def test_burst_then_paced(self):
+        waits = [self.bucket.acquire() for _ in range(8)]
+
+        self.assertEqual(waits[:5], [0] * 5)
+        for waited in waits[5:]:
+            self.assertAlmostEqual(waited, 1.0)
+        self.assertAlmostEqual(self.clock.now, 1003.0)
+
+    def test_refill_up_to_capacity(self):
+        for _ in range(5):
+            self.bucket.acquire()
+        self.assertAlmostEqual(self.bucket.available(), 0)
+
+        self.clock.now += 2.5
+        self.assertAlmostEqual(self.bucket.available(), 2.5)
+
+        self.clock.now += 3600
+        self.assertEqual(self.bucket.available(), 5)
+
+
+class RecordingFetcher:
+    """ Stands in for RegionFetcher, records the order of the requests and fails the centres it is told to. """
+
+    def __init__(self, failing=()):
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.failing = set(failing)
+        self.requests = []
+
+    def fetch_tile(self, centre, city_count=50):
+        self.requests.append(centre)
+        if centre in self.failing:
+            return TileResult(centre, None, None, ValueError('failed'))
+        return TileResult(centre, {'list': []}, None, None)
+
+
+class PollSchedulerTests(IngestTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.fetcher = RecordingFetcher()
+        self.addCleanup(self.fetcher.executor.shutdown)
+        self.bucket = TokenBucket(rate=1e-6, capacity=100)
+
+    def test_stalest_tiles_first(self):
+        stations = copy.deepcopy(self.sample['list'][:4])
+        self.add_locations(stations)
+        for station, age in zip(stations, (3600, 600, 7200)):
+            station['dt'] = int(time.time()) - age
+        load_observations(parse_stations(self.response(stations[:3])).values(), units='imperial')
+
+        # The fourth station has no observation yet.
+        tiles = [Tile((float(i), 0.0), [str(station['id'])]) for i, station in enumerate(stations)]
+        PollScheduler(self.fetcher, self.bucket).poll(tiles)
+
+        self.assertEqual(self.fetcher.requests, [(3.0, 0.0), (2.0, 0.0), (0.0, 0.0), (1.0, 0.0)])
+
+    def test_failed_tile_is_requeued_once(self):
+        tiles = [Tile((float(i), 0.0), []) for i in range(3)]
+        self.fetcher.failing = {(1.0, 0.0)}
+        scheduler = PollScheduler(self.fetcher, self.bucket, max_attempts=2)
+
+        with self.assertLogs(level='WARNING'):
+            results = scheduler.poll(tiles)
+
+        self.assertEqual(self.fetcher.requests.count((1.0, 0.0)), 2)
+        self.assertEqual(len(self.fetcher.requests), 4)
+        self.assertIsNotNone(results[1].error)
+        stats = scheduler.stats()
+        self.assertEqual((stats['completed'], stats['requeued'], stats['failed']), (2, 1, 1))
+
+
+class RunnerTests(SimpleTestCase):
+
+    def test_next_run_is_aligned_to_the_slot(self):
+        for now in (1718928000, 1718928001, 1718929799.5, 1718929800):
+            due = next_run(now, 1800)
+
+            self.assertEqual(due % 1800, 0)
+            self.assertGreater(due, now)
+            self.assertLessEqual(due - now, 1800)
+
+    def test_jitter_stays_within_bounds(self):
+        for _ in range(200):
+            due = next_run(1718928600, 1800, jitter=90)
+
+            self.assertGreaterEqual(due, 1718929800)
+            self.assertLessEqual(due, 1718929800 + 90)
+
+    def test_second_lock_fails_while_the_first_is_held(self):
+        with tempfile.TemporaryDirectory() as scratch:
+            path = os.path.join(scratch, 'ingest.lock')
+
+            with ingest_lock(path):
+                with self.assertRaises(IngestRunning):
+                    with ingest_lock(path):
+                        pass
+
+            # Released with the first holder.
+            with ingest_lock(path):
+                pass
+
+
+class EToResultCacheTests(IngestTestCase):
+    """ The shared ETo result cache, exercised through derive_columns. """
+
+    first_day = 19800
+
+    def setUp(self):
+        super().setUp()
+        self.location = self.add_locations(self.sample['list'][:1])[0]
+        eto_result_cache.clear()
+        self.addCleanup(eto_result_cache.clear)
+        self.start = eto_result_cache.info()
+
+        rng = np.random.default_rng(0)
+        count = 48 * 6
+        self.timestamps = self.first_day * 86400 + np.arange(count) * 1800
+        self.columns = {'temperature': rng.uniform(5, 38, count), 'wind_speed': rng.uniform(0, 9, count),
+                        'humidity': rng.uniform(10, 90, count), 'pressure': rng.uniform(880, 920, count)}
+
+    def derive(self, rows):
+        return derive_columns(self.location, None, None, timestamps=self.timestamps[rows],
+                              **{name: values[rows] for name, values in self.columns.items()})
+
+    def counts(self):
+        info = eto_result_cache.info()
+        return info['hits'] - self.start['hits'], info['misses'] - self.start['misses']
+
+    def test_repeated_range_hits(self):
+        first = self.derive(slice(0, 96))
+        self.assertEqual(self.counts(), (0, 2))
+
+        second = self.derive(slice(0, 96))
+        self.assertEqual(self.counts(), (2, 2))
+        np.testing.assert_array_equal(second['eto'], first['eto'])
+
+    def test_overlapping_ranges_share_whole_days(self):
+        self.derive(slice(0, 48 * 4))
+        self.assertEqual(self.counts(), (0, 4))
+
+        # Part of day 1 and days 2 to 5: days 2 and 3 hit, the partial day and days 4 and 5 are evaluated.
+        overlapping = self.derive(slice(48 + 12, 48 * 6))
+        self.assertEqual(self.counts(), (2, 7))
+
+        eto_result_cache.clear()
+        fresh = self.derive(slice(48 + 12, 48 * 6))
+        for field in ('eto', 'r_a', 'r_n', 'g'):
+            np.testing.assert_array_equal(overlapping[field], fresh[field])
+
+    def test_evicts_to_its_bound(self):
+        self.addCleanup(setattr, eto_result_cache, 'maxsize', eto_result_cache.maxsize)
+        eto_result_cache.maxsize = 96
+
+        self.derive(slice(0, 48 * 4))
+
+        self.assertLessEqual(eto_result_cache.info()['size'], 96)
+        self.derive(slice(48 * 2, 48 * 4))
+        self.assertEqual(self.counts(), (2, 4))
+
+
+class EToBatchTests(SimpleTestCase):
+    """ EToBatch against the scalar EToEstimator it vectorizes. """
+
+    latitude = 33.5779
+    longitude = -101.8552
+
+    def observations(self, count, start=1718928000, step=1800):
+        rng = np.random.default_rng(0)
+        return {
+            'air_temp': rng.uniform(5, 38, count),
+            'wind_speed': rng.uniform(0, 9, count),
+            'relative_humidity': rng.uniform(0.1, 0.9, count),
+            'pressure': rng.uniform(88, 92, count),
+            'timestamps': np.arange(start, start + count * step, step),
+        }
+
+    def test_matches_scalar_estimator(self):
+        for utc_offset in (0, 6):
+            obs = self.observations(32, step=2700)
+            batch = EToBatch(latitude=self.latitude, longitude=self.longitude, utc_offset=utc_offset).estimate(**obs)
+
+            for i, stamp in enumerate(obs['timestamps'].tolist()):
+                scalar = EToEstimator(latitude=self.latitude, longitude=self.longitude, air_temp=obs['air_temp'][i],
+                                      air_temp_min=obs['air_temp'][i], air_temp_max=obs['air_temp'][i],
+                                      wind_speed=obs['wind_speed'][i], relative_humidity=obs['relative_humidity'][i],
+                                      pressure=obs['pressure'][i], period_length=30, utc_offset=utc_offset,
+                                      time_now=stamp)
+                scalar.estimate_eto()
+
+                for field in ('r_a', 'r_so', 'r_n', 'g', 'eto'):
+                    self.assertAlmostEqual(batch[field][i], getattr(scalar, field), places=12,
+                                           msg='{0} at {1}, offset {2}'.format(field, stamp, utc_offset))
+
+
+    def test_numpy_timestamp_is_an_observation_time(self):
+        obs = {name: values[0] for name, values in self.observations(1, step=2700).items()}
+        estimates = []
+
+        for stamp in (int(obs['timestamps']), obs['timestamps']):
+            scalar = EToEstimator(latitude=self.latitude, longitude=self.longitude, air_temp=obs['air_temp'],
+                                  air_temp_min=obs['air_temp'], air_temp_max=obs['air_temp'],
+                                  wind_speed=obs['wind_speed'], relative_humidity=obs['relative_humidity'],
+                                  pressure=obs['pressure'], period_length=30, utc_offset=0, time_now=stamp)
+            scalar.estimate_eto()
+            estimates.append(scalar)
+
+        self.assertIsInstance(obs['timestamps'], np.int64)
+        self.assertEqual(estimates[1].observed_at, estimates[0].observed_at)
+        for field in ('r_a', 'r_so', 'r_n', 'eto'):
+            self.assertEqual(getattr(estimates[1], field), getattr(estimates[0], field))
+    def test_extraterrestrial_radiation_peaks_at_solar_noon(self):
+        # 2024-06-21 in Lubbock, solar noon is about 18:47 UTC or 12:47 CST.
+        solar_noon = 12 - self.longitude / 15
+        obs = self.observations(48)
+
+        for utc_offset in (0, 6):
+            r_a = EToBatch(latitude=self.latitude, longitude=self.longitude, utc_offset=utc_offset) \
+                .estimate(**obs)['r_a']
+            peak = (obs['timestamps'][np.argmax(r_a)] % 86400) / 3600 + 0.25
+
+            self.assertLess(abs(peak - solar_noon), 0.5)
+            self.assertGreater(r_a.max(), 0)
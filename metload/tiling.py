@@ -0,0 +1,164 @@
+import json
+import math
+import os
+from collections import namedtuple
+import numpy as np
+from django.conf import settings
+from locations.models import Location
+
+Station = namedtuple('Station', ['site_id', 'name', 'lat', 'lon'])
+
+# A planned find request: its centre and the target stations it is expected to return.
+Tile = namedtuple('Tile', ['centre', 'site_ids'])
+
+
+def load_site_info(path):
+    """
+    Read stations from a site_info_list.txt style file, blocks of 'Name:', 'ID:', 'lat:' and 'lon:' lines separated
+    by blank lines.
+
+    :param path: path to the file
+    :return: list of Station
+    """
+
+    stations = []
+    fields = {}
+
+    with open(path) as f:
+        for line in f.read().splitlines() + ['']:
+            if not line.strip():
+                if {'name', 'id', 'lat', 'lon'} <= fields.keys():
+                    stations.append(Station(fields['id'], fields['name'], float(fields['lat']), float(fields['lon'])))
+                fields = {}
+                continue
+
+            key, _, value = line.partition(':')
+            fields[key.strip().lower()] = value.strip()
+
+    return stations
+
+
+def stations_from_locations():
+    return [Station(site_id, name, lat, lon) for site_id, name, lat, lon in
+            Location.objects.exclude(latitude=None).values_list('site_id', 'name', 'latitude', 'longitude')]
+
+
+class GridIndex:
+    """
+    A uniform latitude/longitude grid over a set of points for nearest neighbour queries. Distances are
+    equirectangular, which ranks neighbours correctly over the few hundred kilometres a find request spans.
+    """
+
+    def __init__(self, lat, lon, cell_size=0.5):
+        self.lat = np.asarray(lat, dtype=float)
+        self.lon = np.asarray(lon, dtype=float)
+        self.cell_size = cell_size
+        self.cells = {}
+
+        rows = np.floor(self.lat / cell_size).astype(int)
+        cols = np.floor(self.lon / cell_size).astype(int)
+        for i, cell in enumerate(zip(rows.tolist(), cols.tolist())):
+            self.cells.setdefault(cell, []).append(i)
+
+        self.max_ring = max(np.ptp(rows), np.ptp(cols)) + 1 if len(rows) else 0
+
+    def distances(self, lat, lon, indices):
+        scale = math.cos(math.radians(lat))
+
+        return np.hypot(self.lat[indices] - lat, (self.lon[indices] - lon) * scale) * 111.2  # km
+
+    def nearest(self, lat, lon, k):
+        """
+        The k points nearest to (lat, lon). Rings of cells around the query are searched until k points are found
+        and no unsearched cell can hold a nearer one.
+
+        :return: point indices ordered by distance
+        """
+
+        row, col = math.floor(lat / self.cell_size), math.floor(lon / self.cell_size)
+        found = []
+
+        for ring in range(self.max_ring + 2):
+            for r in range(row - ring, row + ring + 1):
+                for c in range(col - ring, col + ring + 1):
+                    if max(abs(r - row), abs(c - col)) == ring:
+                        found.extend(self.cells.get((r, c), ()))
+
+            if len(found) >= k:
+                indices = np.array(found)
+                dist = self.distances(lat, lon, indices)
+                kth = np.partition(dist, k - 1)[k - 1]
+
+                # Anything outside the searched rings is at least this far away.
+                reach = ring * self.cell_size * 111.2 * math.cos(math.radians(lat))
+                if kth <= reach:
+                    return indices[np.argsort(dist, kind='stable')[:k]]
+
+        indices = np.array(found, dtype=int)
+
+        return indices[np.argsort(self.distances(lat, lon, indices), kind='stable')[:k]]
+
+
+def plan_tiles(targets, universe=None, k=50, candidates=None):
+    """
+    Choose find request centres so that every target station is among the k nearest stations of at least one
+    request, using greedy set cover. OWM answers a find request with its k nearest stations, so coverage is judged
+    against the universe of known OWM stations.
+
+    :param targets: Station list that must be covered
+    :param universe: every known OWM station in the area, defaults to the targets
+    :param k: stations returned per request, 50 for OWM
+    :param candidates: (lat, lon) centres to choose from, defaults to the universe station positions
+    :return: list of Tile in the order chosen
+    """
+
+    universe = list(universe or targets)
+    known = {str(station.site_id) for station in universe}
+    universe += [station for station in targets if str(station.site_id) not in known]
+    ids = [str(station.site_id) for station in universe]
+
+    index = GridIndex([s.lat for s in universe], [s.lon for s in universe])
+    candidates = candidates or [(s.lat, s.lon) for s in universe]
+
+    uncovered = {str(station.site_id) for station in targets}
+    covers = []
+    for centre in candidates:
+        covers.append(uncovered & {ids[i] for i in index.nearest(centre[0], centre[1], k)})
+
+    tiles = []
+    while uncovered:
+        best = max(range(len(candidates)), key=lambda i: len(covers[i] & uncovered))
+        covered = covers[best] & uncovered
+
+        if not covered:
+            break  # the remaining targets are not returned by any candidate centre
+
+        tiles.append(Tile(candidates[best], sorted(covered)))
+        uncovered -= covered
+
+    return tiles
+
+
+def save_plan(path, tiles):
+    tmp_path = path + '.tmp'
+
+    with open(tmp_path, 'w') as f:
+        json.dump([{'centre': list(tile.centre), 'site_ids': tile.site_ids} for tile in tiles], f, indent=2)
+
+    os.replace(tmp_path, path)
+
+
+def region_tiles():
+    """ Tiles to poll: the saved tile plan when there is one, settings.OWM_REGION_CENTRES otherwise. """
+
+    path = getattr(settings, 'OWM_TILE_PLAN', None)
+
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return [Tile(tuple(tile['centre']), tile['site_ids']) for tile in json.load(f)]
+
+    return [Tile(tuple(centre), []) for centre in settings.OWM_REGION_CENTRES]
+
+
+def region_centres():
+    return [tile.centre for tile in region_tiles()]
@@ -1,6 +1,6 @@
 import requests
 from datetime import datetime as dt
-from metload.sunrise_sunset import sun_rise_set
+from ETo_py.solar_events import sun_rise_set
 
 def region_info(lat, lon, city_count, APPID, units):
     """ Return current weather observation data for a number of cities about an origin.
@@ -1,16 +1,5 @@
 /*Dashboard2 Init*/
 
-// Django template tag creates the json allsites object
-var datetimehist = JSON.parse(document.getElementById('datetimehist').textContent);
-var temphist = JSON.parse(document.getElementById('temphist').textContent);
-var windhist = JSON.parse(document.getElementById('windhist').textContent);
-var presshist = JSON.parse(document.getElementById('presshist').textContent);
-var etohist = JSON.parse(document.getElementById('etohist').textContent);
-var accum_etohist = JSON.parse(document.getElementById('accum_etohist').textContent);
-var rains_1hhist = JSON.parse(document.getElementById('rains_1hhist').textContent);
-var gduhist = JSON.parse(document.getElementById('gdushist').textContent);
-var accum_gduhist = JSON.parse(document.getElementById('accum_gduhist').textContent);
-
 "use strict"; 
 $(document).ready(function() {
 
@@ -38,7 +27,7 @@ $(document).ready(function() {
             xAxis: {
                 type: 'category',
                 boundaryGap: false,
-                data: datetimehist,
+                data: [],
             },
             yAxis: {
                 type: 'value',
@@ -58,7 +47,7 @@ $(document).ready(function() {
                     itemStyle: {
                         color: '#233c46',
                     },
-                    data: accum_gduhist
+                    data: []
                 }
             ]
         };
@@ -91,7 +80,7 @@ $(document).ready(function() {
             xAxis: {
                 type: 'category',
                 boundaryGap: false,
-                data: datetimehist,
+                data: [],
             },
             yAxis: {
                 type: 'value',
@@ -111,7 +100,7 @@ $(document).ready(function() {
                     itemStyle: {
                         color: '#233c46',
                     },
-                    data: gduhist
+                    data: []
                 }
             ]
         };
@@ -144,7 +133,7 @@ $(document).ready(function() {
             xAxis: {
                 type: 'category',
                 boundaryGap: false,
-                data: datetimehist,
+                data: [],
             },
             yAxis: {
                 type: 'value',
@@ -166,7 +155,7 @@ $(document).ready(function() {
                     itemStyle: {
                         color: '#233c46',
                     },
-                    data: etohist
+                    data: []
                 }
             ]
         };
@@ -199,7 +188,7 @@ $(document).ready(function() {
             xAxis: {
                 type: 'category',
                 boundaryGap: false,
-                data: datetimehist,
+                data: [],
             },
             yAxis: {
                 type: 'value',
@@ -221,7 +210,7 @@ $(document).ready(function() {
                     itemStyle: {
                         color: '#233c46',
                     },
-                    data: accum_etohist,
+                    data: [],
                 }
             ]
         };
@@ -254,7 +243,7 @@ $(document).ready(function() {
             xAxis: {
                 type: 'category',
                 boundaryGap: false,
-                data: datetimehist,
+                data: [],
             },
             yAxis: {
                 type: 'value',
@@ -274,7 +263,7 @@ $(document).ready(function() {
                     itemStyle: {
                         color: '#233c46',
                     },
-                    data: rains_1hhist,
+                    data: [],
                 }
             ]
         };
@@ -307,7 +296,7 @@ $(document).ready(function() {
             xAxis: {
                 type: 'category',
                 boundaryGap: false,
-                data: datetimehist,
+                data: [],
             },
             yAxis: {
                 type: 'value',
@@ -329,7 +318,7 @@ $(document).ready(function() {
                     itemStyle: {
                         color: '#233c46',
                     },
-                    data: temphist
+                    data: []
                 }
             ]
         };
@@ -362,7 +351,7 @@ $(document).ready(function() {
             xAxis: {
                 type: 'category',
                 boundaryGap: false,
-                data: datetimehist
+                data: []
             },
             yAxis: {
                 type: 'value',
@@ -384,7 +373,7 @@ $(document).ready(function() {
                     itemStyle: {
                         color: '#233c46',
                     },
-                    data: windhist
+                    data: []
                 }
             ]
         };
@@ -417,7 +406,7 @@ $(document).ready(function() {
             xAxis: {
                 type: 'category',
                 boundaryGap: false,
-                data: datetimehist
+                data: []
             },
             yAxis: {
                 type: 'value',
@@ -439,7 +428,7 @@ $(document).ready(function() {
                     itemStyle: {
                         color: '#233c46',
                     },
-                    data: presshist
+                    data: []
                 }
             ]
         };
@@ -448,6 +437,50 @@ $(document).ready(function() {
     // use configuration item and data specified to show chart
     myChart3.setOption(option3);
 
+    // The page is rendered without its history. Each chart fetches its own series from the series API once it
+    // scrolls into view, downsampled on the server, and labels the points in the browser's time zone.
+    var series_params = JSON.parse(document.getElementById('series_params').textContent);
+    var charts = [
+        [myChart_accum_gdu, 'accum_gduhist'],
+        [myChart_gdu, 'gdushist'],
+        [myChart_eto, 'etohist'],
+        [myChart_accum_eto, 'accum_etohist'],
+        [myChart_rain_1h, 'rains_1hhist'],
+        [myChart, 'temphist'],
+        [myChart2, 'windhist'],
+        [myChart3, 'presshist']
+    ];
+
+    function loadSeries(chart, field) {
+        chart.showLoading();
+        $.getJSON(series_params.url, $.extend({}, series_params.query, {fields: field}), function(data) {
+            var hist = data.series[field];
+            chart.setOption({
+                xAxis: {
+                    data: hist.timestamps.map(function(stamp) { return moment.unix(stamp).format('MM-DD HH:mm'); })
+                },
+                series: [{data: hist.values}]
+            });
+        }).always(function() {
+            chart.hideLoading();
+        });
+    }
+
+    charts.forEach(function(entry) {
+        if (!('IntersectionObserver' in window)) {
+            loadSeries(entry[0], entry[1]);
+            return;
+        }
+
+        var observer = new IntersectionObserver(function(entries) {
+            if (entries[0].isIntersecting) {
+                observer.disconnect();
+                loadSeries(entry[0], entry[1]);
+            }
+        }, {rootMargin: '200px'});
+        observer.observe(entry[0].getDom());
+    });
+
     window.onresize = function() {
         myChart_accum_gdu.resize();
         myChart_eto.resize();